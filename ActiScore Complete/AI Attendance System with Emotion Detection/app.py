@@ -10,12 +10,16 @@ import os
 
 from config import config
 from models.facial_recognition import FaceRecognizer
-from utils.database import DatabaseManager
+from utils.database import DatabaseManager, STUDENT_COLUMNS
 from utils.helpers import get_time_ranges, prepare_chart_data
+from setup_database import migrate_database
 
 app = Flask(__name__)
 app.config.from_object(config)
 
+# Bring an existing database up to date before the recognizer reads it
+migrate_database()
+
 # Global variables
 camera = None
 face_recognizer = FaceRecognizer()
@@ -156,7 +160,18 @@ def register_student():
                     app.logger.error(f'Error saving photo: {e}')
                     return jsonify({'success': False, 'message': f'Error saving photo: {e}'})
 
-            success = db_manager.add_student(name, student_id, email, photo_path)
+            # Compute the face embedding once, at registration
+            embedding = None
+            if photo_path:
+                embedding = face_recognizer.compute_embedding(photo_path)
+                if embedding is None:
+                    app.logger.warning(f'No face embedding for {student_id}, student will not be recognized')
+
+            # The model is stored even without an embedding, so the photo isn't retried on every reload
+            success = db_manager.add_student(
+                name, student_id, email, photo_path,
+                embedding, face_recognizer.model_name if photo_path else None
+            )
             if success:
                 app.logger.info(f'Student {student_id} registered successfully')
                 face_recognizer.load_known_faces()
@@ -180,6 +195,7 @@ def manage_students():
 def delete_student(student_id):
     """Delete a student"""
     db_manager.delete_student(student_id)
+    face_recognizer.load_known_faces()
     flash('Student deleted successfully!', 'success')
     return redirect(url_for('manage_students'))
 
@@ -231,7 +247,7 @@ def api_dashboard_data():
 def api_students():
     """API endpoint for student list"""
     conn = db_manager.get_connection()
-    students = pd.read_sql_query('SELECT * FROM students', conn)
+    students = pd.read_sql_query(f'SELECT {STUDENT_COLUMNS} FROM students', conn)
     conn.close()
     
     return jsonify(students.to_dict('records'))
@@ -8,7 +8,8 @@ class Config:
     
     # DeepFace configuration
     DETECTOR_BACKEND = 'opencv'
-    MODEL_NAME = 'VGG-Face'
+    MODEL_NAME = 'ArcFace'  # 512-d embeddings keep gallery matching fast
+    RECOGNITION_THRESHOLD = 0.35  # Minimum cosine similarity to a registered face
     
     # Camera configuration
     CAMERA_SOURCE = 0  # 0 for default webcam
@@ -4,30 +4,73 @@ from deepface import DeepFace
 from datetime import datetime
 import os
 
+from config import config
+
 class FaceRecognizer:
     def __init__(self):
+        self.model_name = config.MODEL_NAME
+        self.detector_backend = config.DETECTOR_BACKEND
+        self.threshold = config.RECOGNITION_THRESHOLD
         self.known_faces = {}
+        self.student_ids = []
+        # One L2-normalized float32 row per student with an embedding
+        self.gallery = np.empty((0, 0), dtype=np.float32)
         self.load_known_faces()
     
+    def compute_embedding(self, image, detector_backend=None):
+        """Compute the L2-normalized face embedding of an image path or BGR array"""
+        try:
+            representation = DeepFace.represent(
+                image,
+                model_name=self.model_name,
+                enforce_detection=False,
+                detector_backend=detector_backend or self.detector_backend
+            )
+        except Exception as e:
+            print(f"Face embedding error: {e}")
+            return None
+        
+        # Newer DeepFace versions return one dict per detected face
+        if representation and isinstance(representation[0], dict):
+            representation = representation[0]['embedding']
+        embedding = np.asarray(representation, dtype=np.float32)
+        norm = np.linalg.norm(embedding)
+        if not embedding.size or norm == 0:
+            return None
+        return embedding / norm
+    
     def load_known_faces(self):
-        """Load known faces from the database"""
+        """Load known faces and their embeddings from the database"""
         from utils.database import DatabaseManager
         db = DatabaseManager()
-        conn = db.get_connection()
         
-        cursor = conn.cursor()
-        cursor.execute('SELECT student_id, name FROM students')
-        students = cursor.fetchall()
+        known_faces = {}
+        student_ids = []
+        embeddings = []
+        for student_id, name, photo_path, embedding, model in db.get_student_embeddings():
+            # Embeddings from another model cannot be compared, and students
+            # registered before embeddings were stored have none yet
+            if model != self.model_name:
+                embedding = None
+                if photo_path and os.path.exists(photo_path):
+                    embedding = self.compute_embedding(photo_path)
+                    # A photo without a usable face is recorded with no
+                    # embedding, so later reloads don't try it again
+                    db.set_student_embedding(student_id, embedding, self.model_name)
+            
+            known_faces[student_id] = {'name': name, 'embedding': embedding}
+            if embedding is not None:
+                student_ids.append(student_id)
+                embeddings.append(embedding)
         
-        # In a real implementation, you would have face embeddings stored
-        # For this demo, we'll use a simplified approach
-        for student_id, name in students:
-            self.known_faces[student_id] = {
-                'name': name,
-                'embeddings': []  # This would contain pre-computed embeddings
-            }
+        if embeddings:
+            gallery = np.ascontiguousarray(np.stack(embeddings), dtype=np.float32)
+            gallery /= np.maximum(np.linalg.norm(gallery, axis=1, keepdims=True), 1e-12)
+        else:
+            gallery = np.empty((0, 0), dtype=np.float32)
         
-        conn.close()
+        # Swap in the new gallery at once; the camera thread may be matching
+        self.known_faces, self.student_ids, self.gallery = known_faces, student_ids, gallery
     
     def recognize_face(self, frame):
         """Recognize faces in the frame and return results"""
@@ -37,17 +80,17 @@ class FaceRecognizer:
                 frame, 
                 actions=['emotion'], 
                 enforce_detection=False,
-                detector_backend='opencv'
+                detector_backend=self.detector_backend
             )
             
             results = []
             
             if isinstance(analysis, list):
-                for face in analysis:
-                    # For recognition, we would compare with known faces
-                    # This is a simplified version - in production, you'd use face recognition
-                    recognized_student = self.simple_face_recognition(face)
-                    
+                # Embed every detected face, then match them all at once
+                embeddings = [self.face_embedding(frame, face['region']) for face in analysis]
+                recognized = self.match_faces(embeddings)
+                
+                for face, recognized_student in zip(analysis, recognized):
                     results.append({
                         'region': face['region'],
                         'emotion': face['dominant_emotion'],
@@ -61,22 +104,37 @@ class FaceRecognizer:
             print(f"Face analysis error: {e}")
             return []
     
-    def simple_face_recognition(self, face_analysis):
-        """Simplified face recognition for demo purposes"""
-        # In a real implementation, this would compare embeddings
-        # For demo, we'll return a mock recognition
-        import random
+    def face_embedding(self, frame, region):
+        """Embedding of the face in `region` of the frame, already detected"""
+        x, y, w, h = region['x'], region['y'], region['w'], region['h']
+        face = frame[max(y, 0):y + h, max(x, 0):x + w]
+        if face.size == 0:
+            return None
+        return self.compute_embedding(face, detector_backend='skip')
+    
+    def match_faces(self, embeddings):
+        """Match face embeddings against the gallery with one cosine-similarity product"""
+        student_ids, gallery = self.student_ids, self.gallery
+        matches = [None] * len(embeddings)
+        rows = [i for i, e in enumerate(embeddings) if e is not None and len(e) == gallery.shape[1]]
+        if not rows or not len(gallery):
+            return matches
         
-        # 70% chance of recognition for demo
-        if random.random() > 0.3 and self.known_faces:
-            student_id = random.choice(list(self.known_faces.keys()))
-            return {
-                'student_id': student_id,
-                'name': self.known_faces[student_id]['name'],
-                'confidence': random.uniform(0.7, 0.95)
-            }
+        # Rows are normalized, so the dot product is the cosine similarity;
+        # the gallery on the left keeps the product over its contiguous rows
+        similarities = gallery @ np.stack([embeddings[i] for i in rows]).astype(np.float32).T
+        best = similarities.argmax(axis=0)
+        scores = similarities[best, np.arange(len(rows))]
         
-        return None
+        for i, index, score in zip(rows, best, scores):
+            if score >= self.threshold:
+                student_id = student_ids[index]
+                matches[i] = {
+                    'student_id': student_id,
+                    'name': self.known_faces[student_id]['name'],
+                    'confidence': float(score)
+                }
+        return matches
     
     def draw_detections(self, frame, detections):
         """Draw bounding boxes and labels on the frame"""
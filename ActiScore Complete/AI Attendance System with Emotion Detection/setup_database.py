@@ -2,6 +2,22 @@ import sqlite3
 import os
 from config import config
 
+def migrate_students(cursor):
+    """Add the students columns that older databases lack"""
+    # photo_path, then face embeddings (float32 vector and the model that computed it)
+    for column in ('photo_path TEXT', 'embedding BLOB', 'embedding_model TEXT'):
+        try:
+            cursor.execute(f'ALTER TABLE students ADD COLUMN {column}')
+        except sqlite3.OperationalError:
+            pass  # Column already exists, or no database yet
+
+def migrate_database():
+    """Run the migrations once at startup, before anything reads students"""
+    conn = sqlite3.connect(config.DATABASE_PATH)
+    migrate_students(conn.cursor())
+    conn.commit()
+    conn.close()
+
 def init_database():
     """Initialize the SQLite database with required tables"""
     
@@ -19,15 +35,14 @@ def init_database():
             student_id TEXT UNIQUE NOT NULL,
             email TEXT,
             photo_path TEXT,
+            embedding BLOB,
+            embedding_model TEXT,
             created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
         )
     ''')
 
-    # Add photo_path column if it doesn't exist
-    try:
-        cursor.execute('ALTER TABLE students ADD COLUMN photo_path TEXT')
-    except sqlite3.OperationalError:
-        pass  # Column already exists
+    # Bring databases created by older versions up to date
+    migrate_students(cursor)
 
     # Create attendance table
     cursor.execute('''
@@ -1,8 +1,12 @@
 import sqlite3
+import numpy as np
 import pandas as pd
 from datetime import datetime, date
 from config import config
 
+# Student columns shown in pages and the API (face embeddings stay internal)
+STUDENT_COLUMNS = 'id, name, student_id, email, photo_path, created_at'
+
 class DatabaseManager:
     def __init__(self):
         self.db_path = config.DATABASE_PATH
@@ -106,7 +110,7 @@ class DatabaseManager:
     def get_all_students(self):
         """Get all students from the database"""
         conn = self.get_connection()
-        query = 'SELECT * FROM students ORDER BY name'
+        query = f'SELECT {STUDENT_COLUMNS} FROM students ORDER BY name'
         df = pd.read_sql_query(query, conn)
         conn.close()
         return df
@@ -119,16 +123,16 @@ class DatabaseManager:
         conn.commit()
         conn.close()
 
-    def add_student(self, name, student_id, email, photo_path=None):
+    def add_student(self, name, student_id, email, photo_path=None, embedding=None, embedding_model=None):
         """Add a new student to the database"""
         conn = self.get_connection()
         cursor = conn.cursor()
         
         try:
             cursor.execute('''
-                INSERT INTO students (name, student_id, email, photo_path)
-                VALUES (?, ?, ?, ?)
-            ''', (name, student_id, email, photo_path))
+                INSERT INTO students (name, student_id, email, photo_path, embedding, embedding_model)
+                VALUES (?, ?, ?, ?, ?, ?)
+            ''', (name, student_id, email, photo_path, embedding_to_blob(embedding), embedding_model))
             conn.commit()
             return True
         except sqlite3.IntegrityError:
@@ -157,9 +161,44 @@ class DatabaseManager:
     def get_student_by_id(self, student_id):
         """Get a single student's details by student_id"""
         conn = self.get_connection()
-        query = 'SELECT * FROM students WHERE student_id = ?'
+        query = f'SELECT {STUDENT_COLUMNS} FROM students WHERE student_id = ?'
         df = pd.read_sql_query(query, conn, params=[student_id])
         conn.close()
         if not df.empty:
             return df.iloc[0].to_dict()
-        return None
\ No newline at end of file
+        return None
+
+    def get_student_embeddings(self):
+        """Get (student_id, name, photo_path, embedding, embedding_model) for every student"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        cursor.execute('SELECT student_id, name, photo_path, embedding, embedding_model FROM students ORDER BY id')
+        students = [
+            (student_id, name, photo_path, blob_to_embedding(blob), model)
+            for student_id, name, photo_path, blob, model in cursor.fetchall()
+        ]
+        conn.close()
+        return students
+
+    def set_student_embedding(self, student_id, embedding, embedding_model):
+        """Store the face embedding of a student and the model that computed it"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        cursor.execute(
+            'UPDATE students SET embedding = ?, embedding_model = ? WHERE student_id = ?',
+            (embedding_to_blob(embedding), embedding_model, student_id)
+        )
+        conn.commit()
+        conn.close()
+
+def embedding_to_blob(embedding):
+    """Serialize a face embedding as raw float32 bytes"""
+    if embedding is None:
+        return None
+    return np.asarray(embedding, dtype=np.float32).tobytes()
+
+def blob_to_embedding(blob):
+    """Read back an embedding stored by embedding_to_blob"""
+    if blob is None:
+        return None
+    return np.frombuffer(blob, dtype=np.float32)
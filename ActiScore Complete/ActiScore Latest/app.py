@@ -1,45 +1,177 @@
 import os
-from flask import Flask, render_template, request, jsonify, redirect, url_for, flash, session
+from flask import Flask, Response, render_template, request, jsonify, redirect, url_for, flash, session
 from flask_login import LoginManager, login_user, logout_user, login_required, current_user
 from flask_socketio import SocketIO, emit
 from werkzeug.utils import secure_filename
+from sqlalchemy import func
+from sqlalchemy.orm import defer
 from datetime import datetime
-import json
 
 # Import models and utilities
-from models.fer_model import FERModel
-from models.ser_model import SERModel
-from models.fusion_model import FusionModel
-from database.db import db, User, Analysis
+from models.registry import get_models
+from database.db import db, User, Analysis, EmotionRollup, MediaRef
+from database.engine import configure_database, migrate_schema
 from utils.auth import bcrypt
+from utils.timeline import TimelineBuilder, timeline_path
+from utils.rollups import record_analysis, rebuild_rollups
+from utils.realtime import create_client_manager, InferenceOffloader, disconnect_handlers
+from utils.streams import StreamScheduler
+from utils.report_jobs import ReportJobManager
+from utils.charts import ChartService
+from utils.batch import BatchAnalyzer
+from utils.metrics import metrics, stage, register_metrics, metrics_authorized
+from utils.serialization import dumps, init_serialization, socketio_options
+from utils.user_cache import UserCache
+from utils.warmup import ModelWarmup
+from utils.embedding_index import EmbeddingIndex
+from utils.storage import create_media_store
+from utils.retention import RetentionSweeper, backfill_media_refs
 
 # Initialize Flask app
 app = Flask(__name__)
 app.config['SECRET_KEY'] = os.environ.get('SECRET_KEY', 'actiscore-secret-key')
 app.config['SQLALCHEMY_DATABASE_URI'] = os.environ.get('DATABASE_URL', 'sqlite:///actiscore.db')
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+app.config['SQLITE_BUSY_TIMEOUT_MS'] = int(os.environ.get('SQLITE_BUSY_TIMEOUT_MS', 15000))
+app.config['DATABASE_POOL_SIZE'] = int(os.environ.get('DATABASE_POOL_SIZE', 10))
 app.config['UPLOAD_FOLDER'] = os.path.join(os.getcwd(), 'uploads')
-app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # 16MB max upload
+app.config['TIMELINE_FOLDER'] = os.path.join(os.getcwd(), 'timelines')
+app.config['REPORT_FOLDER'] = os.path.join(os.getcwd(), 'reports_cache')
+app.config['REPORT_WORKERS'] = int(os.environ.get('REPORT_WORKERS', 2))
+app.config['CHART_FOLDER'] = os.path.join(os.getcwd(), 'chart_cache')
+app.config['MAX_CONTENT_LENGTH'] = int(os.environ.get('MAX_CONTENT_LENGTH', 16 * 1024 * 1024))  # 16MB max upload by default
 
-# Ensure upload directory exists
+# Batch analysis (/api/v1/analyze/batch). Batch uploads count against
+# MAX_CONTENT_LENGTH, so import jobs usually need it raised.
+app.config['BATCH_WORKERS'] = int(os.environ.get('BATCH_WORKERS', 4))
+app.config['BATCH_MAX_FILES'] = int(os.environ.get('BATCH_MAX_FILES', 50))
+
+# Real-time settings. A message queue (redis://, amqp:// or fakeredis:// in
+# tests) lets Socket.IO rooms and broadcasts span several worker processes.
+app.config['SOCKETIO_MESSAGE_QUEUE'] = os.environ.get('SOCKETIO_MESSAGE_QUEUE')
+app.config['SOCKETIO_ASYNC_MODE'] = os.environ.get('SOCKETIO_ASYNC_MODE', 'threading')  # 'threading', 'eventlet' or 'gevent'
+app.config['INFERENCE_WORKERS'] = int(os.environ.get('INFERENCE_WORKERS', 2))
+
+# Face detector backend: 'haar' (default), 'ssd' or 'yunet'. The DNN
+# backends load their model files from FACE_DETECTOR_MODEL_DIR, see
+# `python -m models.face_detectors`. FACE_DETECTOR_DOWNSCALE < 1 runs Haar
+# on a smaller frame.
+app.config['FACE_DETECTOR'] = os.environ.get('FACE_DETECTOR', 'haar')
+app.config['FACE_DETECTOR_MODEL_DIR'] = os.environ.get('FACE_DETECTOR_MODEL_DIR')
+app.config['FACE_DETECTOR_CONFIDENCE'] = os.environ.get('FACE_DETECTOR_CONFIDENCE')
+app.config['FACE_DETECTOR_DOWNSCALE'] = float(os.environ.get('FACE_DETECTOR_DOWNSCALE', 1.0))
+
+# Video decoding runs on a background thread ahead of detection. Frames
+# wider than VIDEO_DECODE_MAX_WIDTH (0 = no limit) are downscaled as they
+# are decoded and at most VIDEO_DECODE_QUEUE of them wait for inference.
+# VIDEO_HW_ACCELERATION=1 lets OpenCV use a hardware decoder if available.
+app.config['VIDEO_DECODE_MAX_WIDTH'] = int(os.environ.get('VIDEO_DECODE_MAX_WIDTH', 1280))
+app.config['VIDEO_DECODE_QUEUE'] = int(os.environ.get('VIDEO_DECODE_QUEUE', 24))
+app.config['VIDEO_HW_ACCELERATION'] = os.environ.get('VIDEO_HW_ACCELERATION', '0') == '1'
+
+# Users allowed to see operational endpoints such as stream metrics
+app.config['ADMIN_EMAILS'] = [e.strip() for e in os.environ.get('ADMIN_EMAILS', '').split(',') if e.strip()]
+
+# Latency metrics. /metrics accepts METRICS_TOKEN as a bearer token for
+# Prometheus scrapers; API_TIMINGS=1 attaches a per-stage timing breakdown to
+# every response instead of only those requested with ?timings=1.
+app.config['METRICS_TOKEN'] = os.environ.get('METRICS_TOKEN')
+app.config['API_TIMINGS'] = os.environ.get('API_TIMINGS', '0') == '1'
+
+# Serialization. JSON_FLOAT_PRECISION rounds floats in API responses and
+# socket events to that many decimals (stored results keep full precision).
+# SOCKETIO_SERIALIZER='msgpack' sends binary events, which browser clients
+# must decode with socket.io-msgpack-parser.
+app.config['JSON_FLOAT_PRECISION'] = os.environ.get('JSON_FLOAT_PRECISION')
+app.config['SOCKETIO_SERIALIZER'] = os.environ.get('SOCKETIO_SERIALIZER', 'json')
+
+# Logged-in users are cached per process. Profile changes made by another
+# worker become visible after USER_CACHE_TTL seconds.
+app.config['USER_CACHE_SIZE'] = int(os.environ.get('USER_CACHE_SIZE', 1024))
+app.config['USER_CACHE_TTL'] = float(os.environ.get('USER_CACHE_TTL', 60))
+
+# Model warm-up at startup: 'background' (default), 'blocking' or 'off'.
+# /healthz/ready answers 503 until every model has run each batch size.
+app.config['WARMUP'] = os.environ.get('WARMUP', 'background')
+app.config['WARMUP_BATCH_SIZES'] = [int(n) for n in os.environ.get('WARMUP_BATCH_SIZES', '1,2,4,8').split(',') if n.strip()]
+
+# Face track similarity search keeps the embeddings of this many users and
+# teams in memory, loading others from their timelines on demand
+app.config['EMBEDDING_INDEX_SCOPES'] = int(os.environ.get('EMBEDDING_INDEX_SCOPES', 64))
+
+# Analyzed media is moved into content-addressed storage: 'local' (under
+# MEDIA_FOLDER) or 's3' (MEDIA_S3_BUCKET, optionally on an S3-compatible
+# MEDIA_S3_ENDPOINT_URL). With MEDIA_RETENTION_DAYS set, media older than
+# that is deleted in the background, keeping results and timelines; 0
+# deletes it at the first sweep after analysis. Unset keeps media forever.
+app.config['MEDIA_STORAGE'] = os.environ.get('MEDIA_STORAGE', 'local')
+app.config['MEDIA_FOLDER'] = os.environ.get('MEDIA_FOLDER', os.path.join(app.config['UPLOAD_FOLDER'], 'media'))
+app.config['MEDIA_S3_BUCKET'] = os.environ.get('MEDIA_S3_BUCKET')
+app.config['MEDIA_S3_PREFIX'] = os.environ.get('MEDIA_S3_PREFIX', 'media/')
+app.config['MEDIA_S3_ENDPOINT_URL'] = os.environ.get('MEDIA_S3_ENDPOINT_URL')
+app.config['MEDIA_RETENTION_DAYS'] = os.environ.get('MEDIA_RETENTION_DAYS')
+app.config['RETENTION_SWEEP_INTERVAL'] = float(os.environ.get('RETENTION_SWEEP_INTERVAL', 300))
+app.config['RETENTION_SWEEP_BATCH'] = int(os.environ.get('RETENTION_SWEEP_BATCH', 200))
+
+# Ensure upload and timeline directories exist
 os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
+os.makedirs(app.config['TIMELINE_FOLDER'], exist_ok=True)
 
 # Initialize extensions
-socketio = SocketIO(app)
+init_serialization(app)
+socketio = SocketIO(
+    app,
+    async_mode=app.config['SOCKETIO_ASYNC_MODE'],
+    client_manager=create_client_manager(app.config['SOCKETIO_MESSAGE_QUEUE']),
+    **socketio_options(app)
+)
+inference = InferenceOffloader(app.config['SOCKETIO_ASYNC_MODE'], max_workers=app.config['INFERENCE_WORKERS'])
+stream_scheduler = StreamScheduler(socketio, inference)
+app.extensions['stream_scheduler'] = stream_scheduler
+app.extensions['report_jobs'] = ReportJobManager(app.config['REPORT_FOLDER'], max_workers=app.config['REPORT_WORKERS'])
+app.extensions['charts'] = ChartService(app.config['CHART_FOLDER'], app.config['TIMELINE_FOLDER'])
+app.extensions['batch_analyzer'] = BatchAnalyzer(app.config['BATCH_WORKERS'])
+embedding_index = EmbeddingIndex(app.config['TIMELINE_FOLDER'], app.config['EMBEDDING_INDEX_SCOPES'])
+app.extensions['embedding_index'] = embedding_index
+user_cache = UserCache(app.config['USER_CACHE_SIZE'], app.config['USER_CACHE_TTL']).watch()
+app.extensions['user_cache'] = user_cache
+media_store = create_media_store(app.config)
+app.extensions['media_store'] = media_store
+disconnect_handlers.append(stream_scheduler.close)
+disconnect_handlers.append(user_cache.unbind)
+register_metrics(app)
+configure_database(app)
 db.init_app(app)
 with app.app_context():
-    db.create_all()
+    # Creates missing tables and the indexes the hot queries rely on
+    migrate_schema()
+    # Backfill the dashboard rollups for databases created before they existed
+    if EmotionRollup.query.first() is None and Analysis.query.first() is not None:
+        rebuild_rollups()
+    # Index stored media for the retention sweeper's shared-blob check
+    if MediaRef.query.first() is None and Analysis.query.filter(Analysis.file_path.isnot(None)).first() is not None:
+        backfill_media_refs()
+if app.config['MEDIA_RETENTION_DAYS'] is not None:
+    app.extensions['retention'] = RetentionSweeper(
+        app, media_store, float(app.config['MEDIA_RETENTION_DAYS']),
+        interval=app.config['RETENTION_SWEEP_INTERVAL'],
+        batch_size=app.config['RETENTION_SWEEP_BATCH']
+    ).start()
 login_manager = LoginManager(app)
 login_manager.login_view = 'login'
 
-# Initialize models
-fer_model = FERModel()
-ser_model = SERModel()
-fusion_model = FusionModel()
+# Initialize models, shared with the API blueprint
+models = get_models(app.config)
+fer_model = models.fer
+ser_model = models.ser
+fusion_model = models.fusion
+warmup = ModelWarmup(models, app.config['WARMUP_BATCH_SIZES'], run=inference.run)
+app.extensions['warmup'] = warmup.start(app.config['WARMUP'])
 
 @login_manager.user_loader
 def load_user(user_id):
-    return User.query.get(int(user_id))
+    # Socket.IO events carry the connection's sid and reuse the user bound at connect
+    return user_cache.load(int(user_id), getattr(request, 'sid', None))
 
 # Routes
 @app.route('/')
@@ -104,9 +236,29 @@ def logout():
 @app.route('/dashboard')
 @login_required
 def dashboard():
-    # Get user's previous analyses
-    analyses = Analysis.query.filter_by(user_id=current_user.id).order_by(Analysis.created_at.desc()).limit(5).all()
-    return render_template('dashboard.html', analyses=analyses)
+    # Get user's previous analyses without loading their results
+    analyses = Analysis.query.options(defer(Analysis.results)).filter_by(user_id=current_user.id).order_by(Analysis.created_at.desc(), Analysis.id.desc()).limit(5).all()
+    
+    # Count analyses per type in the database instead of loading the history
+    analysis_counts = dict(db.session.query(Analysis.analysis_type, func.count(Analysis.id)).filter_by(user_id=current_user.id).group_by(Analysis.analysis_type).all())
+    return render_template('dashboard.html', analyses=analyses, analysis_counts=analysis_counts)
+
+@app.route('/metrics')
+def prometheus_metrics():
+    """Latency histograms in the Prometheus text format"""
+    if not metrics_authorized():
+        return jsonify({'error': 'Access denied'}), 403
+    return Response(metrics.render_prometheus(), mimetype='text/plain; version=0.0.4')
+
+@app.route('/healthz/live')
+def healthz_live():
+    """The process is up and serving requests"""
+    return jsonify({'status': 'live'})
+
+@app.route('/healthz/ready')
+def healthz_ready():
+    """Ready for traffic once the models are warmed up"""
+    return jsonify(warmup.status()), 200 if warmup.ready else 503
 
 @app.route('/analyze')
 @login_required
@@ -126,20 +278,37 @@ def analyze_video():
     if file:
         filename = secure_filename(file.filename)
         filepath = os.path.join(app.config['UPLOAD_FOLDER'], filename)
-        file.save(filepath)
+        with stage('upload.save'):
+            file.save(filepath)
         
         # Process video with FER model
-        results = fer_model.predict(filepath)
+        timeline = TimelineBuilder(fer_model.emotions)
+        results = fer_model.predict(filepath, timeline=timeline)
+        
+        # Move the upload into media storage
+        with stage('media.store'):
+            filepath = media_store.put(filepath)
         
         # Save analysis to database
-        analysis = Analysis(
-            user_id=current_user.id,
-            analysis_type='video',
-            file_path=filepath,
-            results=json.dumps(results)
-        )
-        db.session.add(analysis)
-        db.session.commit()
+        with stage('serialize'):
+            results_json = dumps(results)
+        with stage('db.write'):
+            analysis = Analysis(
+                user_id=current_user.id,
+                analysis_type='video',
+                results=results_json
+            )
+            analysis.attach_media(filepath)
+            db.session.add(analysis)
+            record_analysis(analysis, results)
+            db.session.commit()
+        
+        # Keep the full-resolution timeline next to the summary
+        with stage('timeline.save'):
+            built = timeline.build()
+            built.save(timeline_path(app.config['TIMELINE_FOLDER'], analysis.id))
+        # Make its face tracks searchable right away
+        embedding_index.add(analysis, built.tracks)
         
         return jsonify(results)
 
@@ -156,20 +325,29 @@ def analyze_audio():
     if file:
         filename = secure_filename(file.filename)
         filepath = os.path.join(app.config['UPLOAD_FOLDER'], filename)
-        file.save(filepath)
+        with stage('upload.save'):
+            file.save(filepath)
         
         # Process audio with SER model
         results = ser_model.predict(filepath)
         
+        # Move the upload into media storage
+        with stage('media.store'):
+            filepath = media_store.put(filepath)
+        
         # Save analysis to database
-        analysis = Analysis(
-            user_id=current_user.id,
-            analysis_type='audio',
-            file_path=filepath,
-            results=json.dumps(results)
-        )
-        db.session.add(analysis)
-        db.session.commit()
+        with stage('serialize'):
+            results_json = dumps(results)
+        with stage('db.write'):
+            analysis = Analysis(
+                user_id=current_user.id,
+                analysis_type='audio',
+                results=results_json
+            )
+            analysis.attach_media(filepath)
+            db.session.add(analysis)
+            record_analysis(analysis, results)
+            db.session.commit()
         
         return jsonify(results)
 
@@ -192,21 +370,39 @@ def analyze_fusion():
         video_filepath = os.path.join(app.config['UPLOAD_FOLDER'], video_filename)
         audio_filepath = os.path.join(app.config['UPLOAD_FOLDER'], audio_filename)
         
-        video_file.save(video_filepath)
-        audio_file.save(audio_filepath)
+        with stage('upload.save'):
+            video_file.save(video_filepath)
+            audio_file.save(audio_filepath)
         
         # Process with fusion model
-        results = fusion_model.predict(video_filepath, audio_filepath)
+        timeline = TimelineBuilder(fusion_model.fer_model.emotions)
+        results = fusion_model.predict(video_filepath, audio_filepath, timeline=timeline)
+        
+        # Move the uploads into media storage
+        with stage('media.store'):
+            video_filepath = media_store.put(video_filepath)
+            audio_filepath = media_store.put(audio_filepath)
         
         # Save analysis to database
-        analysis = Analysis(
-            user_id=current_user.id,
-            analysis_type='fusion',
-            file_path=f"{video_filepath},{audio_filepath}",
-            results=json.dumps(results)
-        )
-        db.session.add(analysis)
-        db.session.commit()
+        with stage('serialize'):
+            results_json = dumps(results)
+        with stage('db.write'):
+            analysis = Analysis(
+                user_id=current_user.id,
+                analysis_type='fusion',
+                results=results_json
+            )
+            analysis.attach_media(video_filepath, audio_filepath)
+            db.session.add(analysis)
+            record_analysis(analysis, results)
+            db.session.commit()
+        
+        # Keep the full-resolution timeline next to the summary
+        with stage('timeline.save'):
+            built = timeline.build()
+            built.save(timeline_path(app.config['TIMELINE_FOLDER'], analysis.id))
+        # Make its face tracks searchable right away
+        embedding_index.add(analysis, built.tracks)
         
         return jsonify(results)
 
@@ -217,27 +413,29 @@ def handle_connect():
         return False
     emit('connected', {'status': 'connected'})
 
+@socketio.on('disconnect')
+def handle_disconnect():
+    for handler in disconnect_handlers:
+        handler(request.sid)
+
+# Stream messages are processed latest-wins: stale frames are dropped
+# instead of queueing behind slow inference. The handler's return value is
+# the Socket.IO ack, and a stream_ack event follows each processed message.
 @socketio.on('stream_video')
 def handle_stream_video(data):
     # Process video frame with FER model
-    frame_data = data['frame']
-    results = fer_model.predict_frame(frame_data)
-    emit('video_results', results)
+    return stream_scheduler.submit(request.sid, 'video', data.get('seq'), data['frame'], fer_model.predict_frame, 'video_results')
 
 @socketio.on('stream_audio')
 def handle_stream_audio(data):
     # Process audio chunk with SER model
-    audio_data = data['audio']
-    results = ser_model.predict_chunk(audio_data)
-    emit('audio_results', results)
+    return stream_scheduler.submit(request.sid, 'audio', data.get('seq'), data['audio'], ser_model.predict_chunk, 'audio_results')
 
 @socketio.on('stream_fusion')
 def handle_stream_fusion(data):
     # Process both video and audio with fusion model
-    frame_data = data['frame']
-    audio_data = data['audio']
-    results = fusion_model.predict_realtime(frame_data, audio_data)
-    emit('fusion_results', results)
+    payload = (data['frame'], data['audio'])
+    return stream_scheduler.submit(request.sid, 'fusion', data.get('seq'), payload, lambda p: fusion_model.predict_realtime(*p), 'fusion_results')
 
 # Add this import at the top with other imports
 from routes.reports import reports
@@ -253,6 +451,13 @@ app.register_blueprint(api, url_prefix='/api')
 register_socketio_events(socketio)
 
 if __name__ == '__main__':
-    with app.app_context():
-        db.create_all()
-    socketio.run(app, debug=True, host='127.0.0.1', port=5000)
\ No newline at end of file
+    # Development server. For several workers run e.g.
+    #   SOCKETIO_ASYNC_MODE=eventlet SOCKETIO_MESSAGE_QUEUE=redis://localhost:6379/0 \
+    #   gunicorn -k eventlet -w 1 -b :5000 app:app
+    # once per port behind a load balancer with sticky sessions.
+    socketio.run(
+        app,
+        debug=os.environ.get('FLASK_DEBUG', '0') == '1',
+        host=os.environ.get('HOST', '127.0.0.1'),
+        port=int(os.environ.get('PORT', 5000))
+    )
\ No newline at end of file
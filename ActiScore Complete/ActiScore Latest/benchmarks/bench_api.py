@@ -0,0 +1,106 @@
+"""End-to-end throughput of the analyze API and the Socket.IO streams.
+
+Runs the real application in-process through the Flask and Socket.IO test
+clients, against a throwaway SQLite database in a temporary folder.
+"""
+import io
+import os
+import time
+
+from synthetic import audio_data_url, face_frame, frame_data_url
+from timing import measure, summarize
+
+STREAM_EVENTS = {
+    'stream_video': 'video_results',
+    'stream_audio': 'audio_results',
+    'stream_fusion': 'fusion_results'
+}
+
+
+def load_app(workdir):
+    """Import app.py with its database, uploads and caches under `workdir`"""
+    os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(workdir, 'benchmark.db')
+    os.environ['SOCKETIO_ASYNC_MODE'] = 'threading'
+    os.environ.pop('SOCKETIO_MESSAGE_QUEUE', None)
+    # Requests are measured against warm models
+    os.environ['WARMUP'] = 'blocking'
+    os.chdir(workdir)
+    import app as actiscore
+    return actiscore
+
+
+def login(actiscore):
+    from database.db import db, User
+    from utils.auth import bcrypt
+
+    with actiscore.app.app_context():
+        if User.query.filter_by(email='benchmark@example.com').first() is None:
+            password = bcrypt.generate_password_hash('benchmark').decode('utf-8')
+            db.session.add(User(username='benchmark', email='benchmark@example.com', password=password))
+            db.session.commit()
+
+    client = actiscore.app.test_client()
+    client.post('/login', data={'email': 'benchmark@example.com', 'password': 'benchmark'})
+    return client
+
+
+def bench_analyze(client, media, repeat):
+    with open(media['video'], 'rb') as f:
+        video = f.read()
+    with open(media['audio'], 'rb') as f:
+        audio = f.read()
+
+    def post(path, **files):
+        data = {name: (io.BytesIO(content), filename) for name, (content, filename) in files.items()}
+        response = client.post(path, data=data, content_type='multipart/form-data')
+        if response.status_code != 200:
+            raise RuntimeError(f'{path} returned {response.status_code}: {response.get_data(as_text=True)[:200]}')
+
+    repeat = max(1, repeat // 5)
+    return {
+        'video': measure(lambda: post('/api/v1/analyze/video', file=(video, 'synthetic.avi')), repeat=repeat, warmup=1),
+        'audio': measure(lambda: post('/api/v1/analyze/audio', file=(audio, 'synthetic.wav')), repeat=repeat, warmup=1),
+        'fusion': measure(lambda: post('/api/v1/analyze/fusion', video=(video, 'synthetic.avi'), audio=(audio, 'synthetic.wav')), repeat=repeat, warmup=1)
+    }
+
+
+def bench_stream(actiscore, client, event, payload, messages, timeout=30.0):
+    """Send messages one at a time and wait for each result"""
+    socket = actiscore.socketio.test_client(actiscore.app, flask_test_client=client)
+    if not socket.is_connected():
+        raise RuntimeError('Socket.IO connection was refused')
+
+    latencies = []
+    started = time.perf_counter()
+    for seq in range(messages):
+        sent_at = time.perf_counter()
+        socket.emit(event, dict(payload, seq=seq))
+        deadline = sent_at + timeout
+        while time.perf_counter() < deadline:
+            received = socket.get_received()
+            if any(p['name'] == STREAM_EVENTS[event] and p['args'][0].get('seq') == seq for p in received):
+                latencies.append((time.perf_counter() - sent_at) * 1000)
+                break
+            time.sleep(0.001)
+    elapsed = time.perf_counter() - started
+    socket.disconnect()
+
+    result = summarize(latencies, len(latencies), elapsed)
+    result['timeouts'] = messages - len(latencies)
+    return result
+
+
+def run(media, workdir, repeat=20):
+    actiscore = load_app(workdir)
+    client = login(actiscore)
+
+    frame = frame_data_url(face_frame())
+    audio = audio_data_url()
+    return {
+        'analyze': bench_analyze(client, media, repeat),
+        'stream': {
+            'video': bench_stream(actiscore, client, 'stream_video', {'frame': frame}, repeat),
+            'audio': bench_stream(actiscore, client, 'stream_audio', {'audio': audio}, repeat),
+            'fusion': bench_stream(actiscore, client, 'stream_fusion', {'frame': frame, 'audio': audio}, repeat)
+        }
+    }
@@ -0,0 +1,73 @@
+"""Throughput and latency of the FER, SER and Fusion models.
+
+Raw inference is measured at several batch sizes; end-to-end numbers run
+the models' own predict methods over synthetic media.
+"""
+import numpy as np
+
+from synthetic import audio_data_url, face_frame, frame_data_url
+from timing import measure
+
+
+def bench_fer(fer_model, media, batch_sizes, repeat):
+    rng = np.random.default_rng(0)
+    faces = [fer_model.preprocess_face(face_frame(96, 96, seed=i)) for i in range(max(batch_sizes))]
+    results = {'inference': {}}
+
+    for batch_size in batch_sizes:
+        batch = np.concatenate(faces[:batch_size])
+        results['inference'][f'batch_{batch_size}'] = measure(
+            lambda: fer_model.model.predict(batch, batch_size=batch_size, verbose=0),
+            items=batch_size, repeat=repeat
+        )
+
+    frame_url = frame_data_url(face_frame(seed=int(rng.integers(1000))))
+    results['predict_frame'] = measure(lambda: fer_model.predict_frame(frame_url), repeat=repeat)
+
+    frames = media.get('video_frames', 1)
+    results['predict_video'] = measure(lambda: fer_model.predict(media['video']), items=frames, repeat=max(1, repeat // 10), warmup=1)
+    return results
+
+
+def bench_ser(ser_model, media, batch_sizes, repeat):
+    features = ser_model.extract_features(media['audio'])
+    results = {'inference': {}}
+
+    for batch_size in batch_sizes:
+        batch = np.repeat(features.reshape(1, features.shape[0], 1), batch_size, axis=0)
+        results['inference'][f'batch_{batch_size}'] = measure(
+            lambda: ser_model.model.predict(batch, batch_size=batch_size, verbose=0),
+            items=batch_size, repeat=repeat
+        )
+
+    results['extract_features'] = measure(lambda: ser_model.extract_features(media['audio']), repeat=repeat)
+    results['predict_audio'] = measure(lambda: ser_model.predict(media['audio']), repeat=max(1, repeat // 4), warmup=1)
+
+    chunk_url = audio_data_url()
+    results['predict_chunk'] = measure(lambda: ser_model.predict_chunk(chunk_url), repeat=repeat)
+    return results
+
+
+def bench_fusion(fusion_model, media, repeat):
+    frame_url = frame_data_url(face_frame())
+    chunk_url = audio_data_url()
+    return {
+        'predict_realtime': measure(lambda: fusion_model.predict_realtime(frame_url, chunk_url), repeat=repeat),
+        'predict': measure(lambda: fusion_model.predict(media['video'], media['audio']), repeat=max(1, repeat // 10), warmup=1)
+    }
+
+
+def run(media, batch_sizes=(1, 8, 32), repeat=20):
+    from models.fer_model import FERModel
+    from models.ser_model import SERModel
+    from models.fusion_model import FusionModel
+
+    fer_model = FERModel()
+    ser_model = SERModel()
+    fusion_model = FusionModel(fer_model=fer_model, ser_model=ser_model)
+
+    return {
+        'fer': bench_fer(fer_model, media, batch_sizes, repeat),
+        'ser': bench_ser(ser_model, media, batch_sizes, repeat),
+        'fusion': bench_fusion(fusion_model, media, repeat)
+    }
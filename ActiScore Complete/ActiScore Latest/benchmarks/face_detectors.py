@@ -0,0 +1,119 @@
+"""Speed and recall of the face detector backends.
+
+Runs every available backend over the same frames, one frame at a time and
+through detect_batch. Recall is measured against ground-truth boxes: the
+synthetic faces by default, or a folder of images with a boxes.json file
+mapping image names to lists of [x, y, width, height].
+
+    python benchmarks/face_detectors.py --frames 200 --batch-size 8
+    python benchmarks/face_detectors.py --images path/to/labelled/frames
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+import cv2
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from models.face_detectors import DEFAULT_MODEL_DIR, HaarDetector, SSDDetector, YuNetDetector
+from synthetic import face_box, face_frame
+
+
+def backends(model_dir):
+    yield 'haar', lambda: HaarDetector()
+    yield 'haar_downscale_0.5', lambda: HaarDetector(downscale=0.5)
+    yield 'ssd', lambda: SSDDetector(model_dir)
+    yield 'yunet', lambda: YuNetDetector(model_dir)
+
+
+def synthetic_frames(count, width=640, height=480):
+    for i in range(count):
+        shift = int(80 * np.sin(i / 15))
+        yield face_frame(width, height, seed=i, shift=shift), [face_box(width, height, shift)]
+
+
+def labelled_frames(folder):
+    with open(os.path.join(folder, 'boxes.json')) as f:
+        labels = json.load(f)
+    for name, boxes in sorted(labels.items()):
+        frame = cv2.imread(os.path.join(folder, name))
+        if frame is not None:
+            yield frame, boxes
+
+
+def iou(a, b):
+    ax, ay, aw, ah = a
+    bx, by, bw, bh = b
+    w = max(0, min(ax + aw, bx + bw) - max(ax, bx))
+    h = max(0, min(ay + ah, by + bh) - max(ay, by))
+    inter = w * h
+    union = aw * ah + bw * bh - inter
+    return inter / union if union else 0.0
+
+
+def recall(detections, truths, threshold):
+    found = total = 0
+    for boxes, expected in zip(detections, truths):
+        total += len(expected)
+        found += sum(1 for truth in expected if any(iou(truth, box) >= threshold for box in boxes))
+    return found / total if total else None
+
+
+def bench(detector, frames, truths, batch_size, iou_threshold):
+    grays = [cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY) for frame in frames]
+    detector.detect(frames[0], grays[0])
+
+    started = time.perf_counter()
+    single = [detector.detect(frame, gray) for frame, gray in zip(frames, grays)]
+    single_elapsed = time.perf_counter() - started
+
+    started = time.perf_counter()
+    batched = []
+    for i in range(0, len(frames), batch_size):
+        batched.extend(detector.detect_batch(frames[i:i + batch_size], grays[i:i + batch_size]))
+    batch_elapsed = time.perf_counter() - started
+
+    return {
+        'single_ms_per_frame': single_elapsed / len(frames) * 1000,
+        'batch_ms_per_frame': batch_elapsed / len(frames) * 1000,
+        'recall': recall(single, truths, iou_threshold),
+        'detections': int(sum(len(boxes) for boxes in single)),
+        'false_positives': int(sum(max(0, len(boxes) - len(expected)) for boxes, expected in zip(single, truths)))
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--frames', type=int, default=100, help='synthetic frames when --images is not given')
+    parser.add_argument('--images', help='folder of frames with a boxes.json of ground-truth faces')
+    parser.add_argument('--batch-size', type=int, default=8)
+    parser.add_argument('--iou', type=float, default=0.3, help='overlap that counts as a detected face')
+    parser.add_argument('--model-dir', default=os.environ.get('FACE_DETECTOR_MODEL_DIR') or DEFAULT_MODEL_DIR)
+    parser.add_argument('--output', help='write the summary as JSON to this file')
+    args = parser.parse_args()
+
+    samples = list(labelled_frames(args.images) if args.images else synthetic_frames(args.frames))
+    frames = [frame for frame, _ in samples]
+    truths = [boxes for _, boxes in samples]
+
+    summary = {'frames': len(frames), 'source': args.images or 'synthetic', 'backends': {}}
+    for name, factory in backends(args.model_dir):
+        try:
+            detector = factory()
+        except (FileNotFoundError, AttributeError, cv2.error) as e:
+            summary['backends'][name] = {'skipped': str(e)}
+            continue
+        summary['backends'][name] = bench(detector, frames, truths, args.batch_size, args.iou)
+
+    print(json.dumps(summary, indent=2))
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(summary, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
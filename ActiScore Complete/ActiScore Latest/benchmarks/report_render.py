@@ -0,0 +1,78 @@
+"""Render-time benchmark for the PDF, Excel and PowerPoint report formats.
+
+Builds one ReportModel over N synthetic analyses, as in a real report
+job, and times each output format against it. Charts are rendered while
+the formats that draw them (PDF, PowerPoint) are laid out.
+
+    python benchmarks/report_render.py --analyses 1000 --template detailed
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.charts import ChartService
+from utils.report_model import REPORT_TEMPLATES, ReportEntry, ReportModel
+from utils.report_renderers import RENDERERS
+
+EMOTIONS = ['angry', 'disgust', 'fear', 'happy', 'sad', 'surprise', 'neutral']
+
+
+def synthetic_entries(count, seed=0):
+    rng = np.random.default_rng(seed)
+    start = datetime(2024, 1, 1)
+    for i in range(count):
+        scores = rng.dirichlet(np.ones(len(EMOTIONS)))
+        emotions = {e: round(float(s), 4) for e, s in zip(EMOTIONS, scores)}
+        yield ReportEntry(i + 1, start + timedelta(hours=i), rng.choice(['video', 'audio', 'fusion']), {
+            'duration': float(rng.uniform(5, 600)),
+            'dominant_emotion': max(emotions, key=emotions.get),
+            'emotions': emotions
+        })
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--analyses', type=int, default=200)
+    parser.add_argument('--template', choices=sorted(REPORT_TEMPLATES), default='default')
+    parser.add_argument('--formats', nargs='+', choices=sorted(RENDERERS), default=sorted(RENDERERS))
+    parser.add_argument('--output', help='write the summary as JSON to this file')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as folder:
+        charts = ChartService(os.path.join(folder, 'charts'))
+
+        started = time.perf_counter()
+        model = ReportModel(lambda: synthetic_entries(args.analyses), args.template, 'benchmark', charts)
+        summary = {
+            'analyses': args.analyses,
+            'template': args.template,
+            'model_seconds': round(time.perf_counter() - started, 3),
+            'formats': {}
+        }
+
+        for report_type in args.formats:
+            path = os.path.join(folder, f'report.{report_type}')
+            started = time.perf_counter()
+            with open(path, 'wb') as out:
+                RENDERERS[report_type](model, out)
+            summary['formats'][report_type] = {
+                'seconds': round(time.perf_counter() - started, 3),
+                'bytes': os.path.getsize(path)
+            }
+
+    print(json.dumps(summary, indent=2))
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(summary, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,114 @@
+"""Run the ActiScore benchmark suite and flag regressions against a baseline.
+
+    python benchmarks/run.py --output results.json
+    python benchmarks/run.py --suite models --batch-sizes 1 8 32 \
+        --baseline results.json --threshold 0.15
+
+Results are written as JSON. With --baseline, every throughput that
+dropped or p95 latency that rose by more than the threshold is listed
+under "regressions" and the exit status is 1.
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import bench_api
+import bench_models
+from synthetic import media_set
+
+SUITES = ('models', 'api')
+
+
+def environment():
+    try:
+        commit = subprocess.check_output(['git', 'rev-parse', 'HEAD'], cwd=ROOT, stderr=subprocess.DEVNULL).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'commit': commit,
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count()
+    }
+
+
+def flatten(results, prefix=''):
+    """Map 'suite.group.case' to each measurement that has a throughput"""
+    flat = {}
+    for key, value in results.items():
+        name = f'{prefix}.{key}' if prefix else key
+        if isinstance(value, dict) and 'throughput_per_s' in value:
+            flat[name] = value
+        elif isinstance(value, dict):
+            flat.update(flatten(value, name))
+    return flat
+
+
+def compare(results, baseline, threshold):
+    current, previous = flatten(results), flatten(baseline)
+    regressions = []
+    for name, old in previous.items():
+        new = current.get(name)
+        if new is None:
+            continue
+        if old['throughput_per_s'] and new['throughput_per_s'] < old['throughput_per_s'] * (1 - threshold):
+            regressions.append({'case': name, 'metric': 'throughput_per_s', 'baseline': old['throughput_per_s'], 'current': new['throughput_per_s']})
+        old_p95, new_p95 = old['latency_ms'].get('p95'), new['latency_ms'].get('p95')
+        if old_p95 and new_p95 and new_p95 > old_p95 * (1 + threshold):
+            regressions.append({'case': name, 'metric': 'latency_ms.p95', 'baseline': old_p95, 'current': new_p95})
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--suite', choices=SUITES + ('all',), default='all')
+    parser.add_argument('--batch-sizes', type=int, nargs='+', default=[1, 8, 32])
+    parser.add_argument('--repeat', type=int, default=20, help='timed calls per case')
+    parser.add_argument('--video-frames', type=int, default=90)
+    parser.add_argument('--audio-seconds', type=float, default=3.0)
+    parser.add_argument('--output', help='write the results as JSON to this file')
+    parser.add_argument('--baseline', help='earlier results to compare against')
+    parser.add_argument('--threshold', type=float, default=0.10, help='allowed relative slowdown')
+    args = parser.parse_args()
+
+    # The API suite changes into its working folder
+    output = os.path.abspath(args.output) if args.output else None
+    baseline_path = os.path.abspath(args.baseline) if args.baseline else None
+
+    suites = SUITES if args.suite == 'all' else (args.suite,)
+    workdir = tempfile.mkdtemp(prefix='actiscore-bench-')
+    media = media_set(os.path.join(workdir, 'media'), args.video_frames, args.audio_seconds)
+    media['video_frames'] = args.video_frames
+
+    report = {'environment': environment(), 'config': vars(args), 'results': {}}
+    if 'models' in suites:
+        report['results']['models'] = bench_models.run(media, args.batch_sizes, args.repeat)
+    if 'api' in suites:
+        report['results']['api'] = bench_api.run(media, workdir, args.repeat)
+
+    if baseline_path:
+        with open(baseline_path) as f:
+            baseline = json.load(f)
+        report['baseline'] = {'file': args.baseline, 'environment': baseline.get('environment')}
+        report['regressions'] = compare(report['results'], baseline.get('results', {}), args.threshold)
+
+    print(json.dumps(report, indent=2))
+    if output:
+        with open(output, 'w') as f:
+            json.dump(report, f, indent=2)
+
+    if report.get('regressions'):
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,72 @@
+"""Encode speed and payload size of analysis results: stdlib json vs utils.serialization.
+
+Results are shaped like FERModel.predict output: per-frame emotion dicts
+built with float(p) from NumPy probabilities.
+
+    python benchmarks/serialization.py --frames 900 --precision 4
+"""
+import argparse
+import json
+import os
+import sys
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils import serialization
+from timing import measure
+
+EMOTIONS = ['angry', 'disgust', 'fear', 'happy', 'sad', 'surprise', 'neutral']
+
+
+def synthetic_results(frames, seed=0):
+    rng = np.random.default_rng(seed)
+    probabilities = rng.dirichlet(np.ones(len(EMOTIONS)), size=frames)
+    return {
+        'frames': [
+            {'frame': i, 'emotions': {e: float(p) for e, p in zip(EMOTIONS, row)}}
+            for i, row in enumerate(probabilities)
+        ],
+        'average': {e: float(p) for e, p in zip(EMOTIONS, probabilities.mean(axis=0))},
+        'dominant_emotion': EMOTIONS[int(probabilities.mean(axis=0).argmax())]
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--frames', type=int, default=900)
+    parser.add_argument('--precision', type=int, default=4)
+    parser.add_argument('--repeat', type=int, default=50)
+    parser.add_argument('--output', help='write the summary as JSON to this file')
+    args = parser.parse_args()
+
+    results = synthetic_results(args.frames)
+    encoded = json.dumps(results)
+    cases = {
+        'stdlib_dumps': lambda: json.dumps(results),
+        'dumps': lambda: serialization.dumps(results),
+        'dumps_rounded': lambda: serialization.dumps(results, args.precision),
+        'stdlib_loads': lambda: json.loads(encoded),
+        'loads': lambda: serialization.loads(encoded)
+    }
+
+    summary = {
+        'frames': args.frames,
+        'encoder': 'orjson' if serialization.orjson is not None else 'json',
+        'bytes': {
+            'stdlib': len(encoded.encode()),
+            'full_precision': len(serialization.dumps_bytes(results)),
+            f'precision_{args.precision}': len(serialization.dumps_bytes(results, args.precision))
+        },
+        'cases': {name: measure(fn, repeat=args.repeat) for name, fn in cases.items()}
+    }
+
+    print(json.dumps(summary, indent=2))
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(summary, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,129 @@
+"""Load test for the real-time streaming Socket.IO events.
+
+Opens N concurrent clients that log in over HTTP, connect to Socket.IO
+and send frames at a fixed rate, then reports throughput and round-trip
+latency percentiles.
+
+    python benchmarks/stream_load.py --url http://127.0.0.1:5000 \
+        --email user@example.com --password secret --clients 50 --duration 30
+"""
+import argparse
+import json
+import threading
+import time
+
+import numpy as np
+import requests
+import socketio
+
+from synthetic import audio_data_url, face_frame, frame_data_url
+
+RESULT_EVENTS = {
+    'stream_video': 'video_results',
+    'stream_audio': 'audio_results',
+    'stream_fusion': 'fusion_results'
+}
+
+
+class StreamClient:
+    def __init__(self, url, email, password, event, payload):
+        self.url = url
+        self.event = event
+        self.payload = payload
+        self.latencies = []
+        self.sent = 0
+        self.errors = 0
+        self.dropped = 0
+        self._sent_at = {}
+        self._lock = threading.Lock()
+
+        session = requests.Session()
+        session.post(f'{url}/login', data={'email': email, 'password': password})
+        self.cookie = '; '.join(f'{k}={v}' for k, v in session.cookies.items())
+
+        self.sio = socketio.Client(reconnection=False)
+        self.sio.on(RESULT_EVENTS[event], self._on_result)
+
+    def _on_result(self, data):
+        now = time.perf_counter()
+        seq = data.get('seq') if isinstance(data, dict) else None
+        with self._lock:
+            if seq not in self._sent_at:
+                return
+            self.latencies.append(now - self._sent_at.pop(seq))
+            # The server drops stale frames, so older sends never get a result
+            for stale in [s for s in self._sent_at if s < seq]:
+                del self._sent_at[stale]
+                self.dropped += 1
+
+    def run(self, duration, rate):
+        try:
+            self.sio.connect(self.url, headers={'Cookie': self.cookie}, transports=['websocket'])
+        except socketio.exceptions.ConnectionError:
+            self.errors += 1
+            return
+
+        interval = 1.0 / rate
+        deadline = time.perf_counter() + duration
+        while time.perf_counter() < deadline:
+            with self._lock:
+                self._sent_at[self.sent] = time.perf_counter()
+            self.sio.emit(self.event, dict(self.payload, seq=self.sent))
+            self.sent += 1
+            time.sleep(interval)
+
+        # Give in-flight results a moment to arrive
+        time.sleep(min(2.0, duration))
+        self.sio.disconnect()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--url', default='http://127.0.0.1:5000')
+    parser.add_argument('--email', required=True)
+    parser.add_argument('--password', required=True)
+    parser.add_argument('--clients', type=int, default=10)
+    parser.add_argument('--duration', type=float, default=10.0, help='seconds per client')
+    parser.add_argument('--rate', type=float, default=5.0, help='messages per second per client')
+    parser.add_argument('--event', choices=sorted(RESULT_EVENTS), default='stream_video')
+    parser.add_argument('--output', help='write the summary as JSON to this file')
+    args = parser.parse_args()
+
+    payload = {}
+    if args.event in ('stream_video', 'stream_fusion'):
+        payload['frame'] = frame_data_url(face_frame())
+    if args.event in ('stream_audio', 'stream_fusion'):
+        payload['audio'] = audio_data_url()
+
+    clients = [StreamClient(args.url, args.email, args.password, args.event, payload) for _ in range(args.clients)]
+    threads = [threading.Thread(target=client.run, args=(args.duration, args.rate)) for client in clients]
+
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    latencies = np.array([l for client in clients for l in client.latencies]) * 1000
+    summary = {
+        'event': args.event,
+        'clients': args.clients,
+        'sent': sum(client.sent for client in clients),
+        'received': int(latencies.size),
+        'dropped': sum(client.dropped for client in clients),
+        'connect_errors': sum(client.errors for client in clients),
+        'throughput_per_s': latencies.size / elapsed if elapsed else 0.0,
+        'latency_ms': {
+            f'p{p}': float(np.percentile(latencies, p)) for p in (50, 95, 99)
+        } if latencies.size else {}
+    }
+
+    print(json.dumps(summary, indent=2))
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(summary, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
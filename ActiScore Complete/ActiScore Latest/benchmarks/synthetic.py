@@ -0,0 +1,94 @@
+"""Procedurally generated test media, so benchmarks run offline.
+
+Frames show a bright face-like ellipse with darker eyes and mouth on a
+noisy background, which the Haar cascade usually picks up as a face.
+Audio is a mix of tones with a little white noise.
+"""
+import base64
+import io
+import os
+import wave
+
+import numpy as np
+
+SAMPLE_RATE = 22050
+
+
+def face_frame(width=320, height=240, seed=0, shift=0):
+    """A BGR uint8 frame with one face-like shape, moved `shift` pixels right"""
+    rng = np.random.default_rng(seed)
+    frame = rng.integers(0, 60, size=(height, width, 3), dtype=np.uint8)
+    yy, xx = np.mgrid[:height, :width]
+    cx, cy = width / 2 + shift, height / 2
+    rx, ry = width / 6, height / 3
+
+    face = ((xx - cx) / rx) ** 2 + ((yy - cy) / ry) ** 2 <= 1
+    frame[face] = 200
+    for ex in (cx - rx / 2.5, cx + rx / 2.5):
+        eye = ((xx - ex) / (rx / 6)) ** 2 + ((yy - (cy - ry / 4)) / (ry / 10)) ** 2 <= 1
+        frame[eye] = 40
+    mouth = ((xx - cx) / (rx / 2.5)) ** 2 + ((yy - (cy + ry / 2.5)) / (ry / 12)) ** 2 <= 1
+    frame[mouth] = 60
+    return frame
+
+
+def face_box(width=320, height=240, shift=0):
+    """Ground-truth x, y, width, height of the shape drawn by face_frame"""
+    rx, ry = width / 6, height / 3
+    return (int(width / 2 + shift - rx), int(height / 2 - ry), int(2 * rx), int(2 * ry))
+
+
+def frame_data_url(frame):
+    """A JPEG data URL as sent by the browser for real-time streams"""
+    from PIL import Image
+    buffer = io.BytesIO()
+    Image.fromarray(frame[:, :, ::-1]).save(buffer, format='JPEG')
+    return 'data:image/jpeg;base64,' + base64.b64encode(buffer.getvalue()).decode()
+
+
+def write_video(path, frames=90, fps=30, width=320, height=240):
+    """Write an MJPG .avi of a face drifting across the frame"""
+    import cv2
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*'MJPG'), fps, (width, height))
+    for i in range(frames):
+        writer.write(face_frame(width, height, seed=i, shift=int(20 * np.sin(i / 10))))
+    writer.release()
+    return path
+
+
+def tone_audio(seconds=3.0, sr=SAMPLE_RATE, freqs=(220, 330, 440), noise=0.02, seed=0):
+    rng = np.random.default_rng(seed)
+    t = np.arange(int(seconds * sr)) / sr
+    samples = sum(np.sin(2 * np.pi * f * t) for f in freqs) / len(freqs) * 0.3
+    samples = samples + noise * rng.standard_normal(t.size)
+    return np.clip(samples, -1, 1).astype(np.float32)
+
+
+def wav_bytes(samples, sr=SAMPLE_RATE):
+    buffer = io.BytesIO()
+    with wave.open(buffer, 'wb') as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(sr)
+        wav.writeframes((samples * 32767).astype(np.int16).tobytes())
+    return buffer.getvalue()
+
+
+def write_audio(path, seconds=3.0, sr=SAMPLE_RATE):
+    with open(path, 'wb') as f:
+        f.write(wav_bytes(tone_audio(seconds, sr), sr))
+    return path
+
+
+def audio_data_url(seconds=1.0, sr=SAMPLE_RATE):
+    """A WAV data URL as sent by the browser for real-time streams"""
+    return 'data:audio/wav;base64,' + base64.b64encode(wav_bytes(tone_audio(seconds, sr), sr)).decode()
+
+
+def media_set(folder, video_frames=90, audio_seconds=3.0):
+    """Generate the video and audio files the benchmarks analyze"""
+    os.makedirs(folder, exist_ok=True)
+    return {
+        'video': write_video(os.path.join(folder, 'synthetic.avi'), frames=video_frames),
+        'audio': write_audio(os.path.join(folder, 'synthetic.wav'), seconds=audio_seconds)
+    }
@@ -0,0 +1,40 @@
+"""Timing helpers shared by the benchmark suites."""
+import time
+
+import numpy as np
+
+
+def measure(fn, items=1, repeat=20, warmup=2):
+    """Call `fn` repeatedly and summarize latency and throughput.
+
+    `items` is the number of units (frames, clips, requests) one call
+    processes, so throughput is comparable across batch sizes.
+    """
+    for _ in range(warmup):
+        fn()
+
+    latencies = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        latencies.append(time.perf_counter() - started)
+
+    latencies = np.array(latencies) * 1000
+    return summarize(latencies, items * repeat, latencies.sum() / 1000)
+
+
+def summarize(latencies_ms, items, elapsed):
+    latencies_ms = np.asarray(latencies_ms, dtype=np.float64)
+    if not latencies_ms.size:
+        return {'calls': 0, 'items': items, 'throughput_per_s': 0.0, 'latency_ms': {}}
+    return {
+        'calls': int(latencies_ms.size),
+        'items': int(items),
+        'throughput_per_s': float(items / elapsed) if elapsed else 0.0,
+        'latency_ms': {
+            'mean': float(latencies_ms.mean()),
+            'p50': float(np.percentile(latencies_ms, 50)),
+            'p95': float(np.percentile(latencies_ms, 95)),
+            'p99': float(np.percentile(latencies_ms, 99))
+        }
+    }
@@ -0,0 +1,103 @@
+"""Sequential vs threaded video decoding, with face detection as the consumer.
+
+The sequential case is the old FERModel.predict loop: read a frame,
+convert it, detect faces, repeat. The threaded case decodes through
+models.video_pipeline while the main thread detects. --inference-ms adds
+a sleep per frame to stand in for the emotion model.
+
+    python benchmarks/video_pipeline.py --width 1920 --height 1080 --frames 120
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+import cv2
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from models.face_detectors import HaarDetector
+from models.video_pipeline import VideoDecoder
+from synthetic import face_frame
+
+
+def write_video(path, frames, width, height, fps=30):
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*'MJPG'), fps, (width, height))
+    for i in range(frames):
+        writer.write(face_frame(width, height, seed=i, shift=int(width / 16 * np.sin(i / 10))))
+    writer.release()
+
+
+def sequential(path, detector, inference_s):
+    cap = cv2.VideoCapture(path)
+    faces = 0
+    while True:
+        ret, frame = cap.read()
+        if not ret:
+            break
+        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        faces += len(detector.detect(frame, gray))
+        time.sleep(inference_s)
+    cap.release()
+    return faces
+
+
+def threaded(path, detector, decoder, inference_s):
+    faces = 0
+    with decoder.open(path, color=detector.needs_color) as video:
+        for batch in video.batches(8):
+            for frame, gray in batch:
+                faces += len(detector.detect(frame, gray))
+                time.sleep(inference_s)
+    return faces
+
+
+def timed(fn):
+    started = time.perf_counter()
+    result = fn()
+    return time.perf_counter() - started, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--frames', type=int, default=120)
+    parser.add_argument('--width', type=int, default=1920)
+    parser.add_argument('--height', type=int, default=1080)
+    parser.add_argument('--max-width', type=int, default=1280, help='decode width of the threaded pipeline, 0 for native')
+    parser.add_argument('--queue', type=int, default=24)
+    parser.add_argument('--inference-ms', type=float, default=20.0)
+    parser.add_argument('--detect-downscale', type=float, default=0.25)
+    parser.add_argument('--output', help='write the summary as JSON to this file')
+    args = parser.parse_args()
+
+    detector = HaarDetector(downscale=args.detect_downscale)
+    inference_s = args.inference_ms / 1000
+    with tempfile.TemporaryDirectory() as workdir:
+        path = os.path.join(workdir, 'benchmark.avi')
+        write_video(path, args.frames, args.width, args.height)
+
+        cases = {
+            'sequential': lambda: sequential(path, detector, inference_s),
+            'threaded_native': lambda: threaded(path, detector, VideoDecoder(0, args.queue), inference_s),
+            'threaded_downscaled': lambda: threaded(path, detector, VideoDecoder(args.max_width, args.queue), inference_s)
+        }
+        summary = {'frames': args.frames, 'resolution': [args.width, args.height], 'max_width': args.max_width, 'cases': {}}
+        for name, fn in cases.items():
+            elapsed, faces = timed(fn)
+            summary['cases'][name] = {'seconds': elapsed, 'frames_per_s': args.frames / elapsed, 'faces': faces}
+
+    base = summary['cases']['sequential']['seconds']
+    for case in summary['cases'].values():
+        case['speedup'] = base / case['seconds']
+
+    print(json.dumps(summary, indent=2))
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(summary, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -28,10 +28,29 @@ class Analysis(db.Model):
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     is_shared = db.Column(db.Boolean, default=False)
     team_id = db.Column(db.Integer, db.ForeignKey('team.id'), nullable=True)
+    media = db.relationship('MediaRef', backref='analysis', lazy=True, cascade='all, delete-orphan')
+    
+    __table_args__ = (
+        db.Index('ix_analysis_user_created', 'user_id', 'created_at'),
+    )
+    
+    def attach_media(self, *refs):
+        """Point the analysis at its stored media (two refs for fusion)"""
+        self.file_path = ','.join(refs)
+        self.media = [MediaRef(ref=ref) for ref in refs]
     
     def __repr__(self):
         return f"Analysis('{self.analysis_type}', '{self.created_at}')"
 
+class MediaRef(db.Model):
+    """One media reference of an analysis, indexed so shared blobs can be found exactly"""
+    id = db.Column(db.Integer, primary_key=True)
+    analysis_id = db.Column(db.Integer, db.ForeignKey('analysis.id'), nullable=False, index=True)
+    ref = db.Column(db.String(255), nullable=False, index=True)
+    
+    def __repr__(self):
+        return f"MediaRef('{self.analysis_id}', '{self.ref}')"
+
 class Team(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(100), nullable=False)
@@ -50,6 +69,10 @@ class TeamMember(db.Model):
     role = db.Column(db.String(20), default='member')  # 'admin', 'member'
     joined_at = db.Column(db.DateTime, default=datetime.utcnow)
     
+    __table_args__ = (
+        db.Index('ix_team_member_team_user', 'team_id', 'user_id'),
+    )
+    
     def __repr__(self):
         return f"TeamMember('{self.team_id}', '{self.user_id}')"
 
@@ -63,5 +86,25 @@ class Annotation(db.Model):
     y_position = db.Column(db.Float, nullable=True)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     
+    __table_args__ = (
+        db.Index('ix_annotation_analysis_id', 'analysis_id', 'id'),
+    )
+    
+    def __repr__(self):
+        return f"Annotation('{self.analysis_id}', '{self.user_id}')"
+
+class EmotionRollup(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    scope = db.Column(db.String(10), nullable=False)  # 'user' or 'team'
+    scope_id = db.Column(db.Integer, nullable=False)
+    bucket_start = db.Column(db.DateTime, nullable=False)  # Start of the hour
+    emotion = db.Column(db.String(20), nullable=False)
+    total = db.Column(db.Float, default=0.0)  # Sum of emotion probabilities
+    samples = db.Column(db.Integer, default=0)  # Number of analyses summed
+    
+    __table_args__ = (
+        db.UniqueConstraint('scope', 'scope_id', 'bucket_start', 'emotion', name='uq_emotion_rollup'),
+    )
+    
     def __repr__(self):
-        return f"Annotation('{self.analysis_id}', '{self.user_id}')"
\ No newline at end of file
+        return f"EmotionRollup('{self.scope}', '{self.scope_id}', '{self.bucket_start}', '{self.emotion}')"
@@ -0,0 +1,86 @@
+import sqlite3
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.pool import QueuePool
+
+from database.db import db
+
+# Defaults for the engine settings, overridable through app.config
+ENGINE_DEFAULTS = {
+    'SQLITE_BUSY_TIMEOUT_MS': 15000,
+    'SQLITE_SYNCHRONOUS': 'NORMAL',
+    'DATABASE_POOL_SIZE': 10,
+    'DATABASE_MAX_OVERFLOW': 20,
+    'DATABASE_POOL_RECYCLE': 1800
+}
+
+_sqlite_settings = {}
+
+
+def normalize_database_url(url):
+    """Accept the postgres:// scheme used by many hosting providers"""
+    if url.startswith('postgres://'):
+        return 'postgresql://' + url[len('postgres://'):]
+    return url
+
+
+def configure_database(app):
+    """Fill in SQLALCHEMY_ENGINE_OPTIONS for the configured backend.
+
+    SQLite runs in WAL mode so readers never block the writer, with a busy
+    timeout instead of failing immediately with "database is locked".
+    PostgreSQL gets a pre-pinged, recycled connection pool.
+    """
+    for key, value in ENGINE_DEFAULTS.items():
+        app.config.setdefault(key, value)
+
+    url = normalize_database_url(app.config['SQLALCHEMY_DATABASE_URI'])
+    app.config['SQLALCHEMY_DATABASE_URI'] = url
+    options = dict(app.config.get('SQLALCHEMY_ENGINE_OPTIONS') or {})
+
+    if url.startswith('sqlite'):
+        _sqlite_settings.update(
+            busy_timeout=int(app.config['SQLITE_BUSY_TIMEOUT_MS']),
+            synchronous=app.config['SQLITE_SYNCHRONOUS']
+        )
+        connect_args = options.setdefault('connect_args', {})
+        connect_args.setdefault('timeout', app.config['SQLITE_BUSY_TIMEOUT_MS'] / 1000.0)
+        connect_args.setdefault('check_same_thread', False)
+
+        # In-memory databases must stay on a single connection
+        if url not in ('sqlite://', 'sqlite:///:memory:'):
+            options.setdefault('poolclass', QueuePool)
+            options.setdefault('pool_size', app.config['DATABASE_POOL_SIZE'])
+            options.setdefault('max_overflow', app.config['DATABASE_MAX_OVERFLOW'])
+    else:
+        options.setdefault('pool_size', app.config['DATABASE_POOL_SIZE'])
+        options.setdefault('max_overflow', app.config['DATABASE_MAX_OVERFLOW'])
+        options.setdefault('pool_recycle', app.config['DATABASE_POOL_RECYCLE'])
+        options.setdefault('pool_pre_ping', True)
+
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = options
+
+
+@event.listens_for(Engine, 'connect')
+def set_sqlite_pragmas(dbapi_connection, connection_record):
+    if not isinstance(dbapi_connection, sqlite3.Connection):
+        return
+    cursor = dbapi_connection.cursor()
+    cursor.execute('PRAGMA journal_mode=WAL')
+    cursor.execute(f"PRAGMA synchronous={_sqlite_settings.get('synchronous', 'NORMAL')}")
+    cursor.execute(f"PRAGMA busy_timeout={_sqlite_settings.get('busy_timeout', 15000)}")
+    cursor.close()
+
+
+def migrate_schema():
+    """Create missing tables and indexes.
+
+    db.create_all() skips tables that already exist, so indexes added to a
+    model later would never reach existing databases. Each declared index is
+    created here if it is missing.
+    """
+    db.create_all()
+    for table in db.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(bind=db.engine, checkfirst=True)
@@ -0,0 +1,36 @@
+import threading
+
+import cv2
+import numpy as np
+
+
+class FaceBatch:
+    """Turns face boxes of a grayscale frame into a model input batch.
+
+    Each crop is resized into a reused uint8 buffer and copied into a
+    preallocated float32 batch, so no per-face arrays are allocated.
+    Pixels stay in 0-255 for the model's Rescaling layer. Buffers are
+    per thread, and the batch returned by `fill` is a view that the
+    thread's next call overwrites.
+    """
+
+    def __init__(self, size=48):
+        self.size = size
+        self._buffers = threading.local()
+
+    def _batch(self, count):
+        buffers = self._buffers
+        batch = getattr(buffers, 'batch', None)
+        if batch is None or batch.shape[0] < count:
+            buffers.batch = batch = np.empty((max(count, 8), self.size, self.size, 1), dtype=np.float32)
+            buffers.face = np.empty((self.size, self.size), dtype=np.uint8)
+        return batch[:count]
+
+    def fill(self, gray, faces):
+        """(len(faces), size, size, 1) float32 batch of the (x, y, w, h) boxes"""
+        batch = self._batch(len(faces))
+        resized = self._buffers.face
+        for i, (x, y, w, h) in enumerate(faces):
+            cv2.resize(gray[y:y+h, x:x+w], (self.size, self.size), dst=resized)
+            batch[i, :, :, 0] = resized
+        return batch
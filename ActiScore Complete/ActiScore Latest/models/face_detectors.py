@@ -0,0 +1,217 @@
+import os
+import threading
+import urllib.request
+
+import cv2
+import numpy as np
+
+# Model files of the DNN backends, looked up in FACE_DETECTOR_MODEL_DIR.
+# They are not shipped with the code; `python -m models.face_detectors`
+# downloads them from the OpenCV repositories.
+DETECTOR_MODEL_FILES = {
+    'ssd': {
+        'deploy.prototxt': 'https://raw.githubusercontent.com/opencv/opencv/4.x/samples/dnn/face_detector/deploy.prototxt',
+        'res10_300x300_ssd_iter_140000.caffemodel': 'https://raw.githubusercontent.com/opencv/opencv_3rdparty/dnn_samples_face_detector_20170830/res10_300x300_ssd_iter_140000.caffemodel'
+    },
+    'yunet': {
+        'face_detection_yunet_2023mar.onnx': 'https://github.com/opencv/opencv_zoo/raw/main/models/face_detection_yunet/face_detection_yunet_2023mar.onnx'
+    }
+}
+
+DEFAULT_MODEL_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'detectors')
+
+
+def _boxes(boxes):
+    """Boxes as an (N, 4) int32 array of x, y, width, height"""
+    return np.asarray(boxes, dtype=np.int32).reshape(-1, 4)
+
+
+def _clip(boxes, width, height):
+    """Boxes cut to the frame, dropping those left empty"""
+    boxes = _boxes(boxes)
+    # Clip both corners, so a box sticking out on the left or top shrinks too
+    x1 = np.clip(boxes[:, 0], 0, width)
+    y1 = np.clip(boxes[:, 1], 0, height)
+    x2 = np.clip(boxes[:, 0] + boxes[:, 2], 0, width)
+    y2 = np.clip(boxes[:, 1] + boxes[:, 3], 0, height)
+    boxes = np.column_stack([x1, y1, x2 - x1, y2 - y1]).astype(np.int32)
+    return boxes[(boxes[:, 2] > 0) & (boxes[:, 3] > 0)].reshape(-1, 4)
+
+
+class FaceDetector:
+    """Finds faces in BGR frames.
+
+    `detect` returns an (N, 4) int32 array of x, y, width, height boxes in
+    frame coordinates. Backends that need a grayscale frame accept the one
+    the caller already computed; those that set `needs_color` to False
+    also accept None for the BGR frame.
+    """
+
+    name = None
+    needs_color = True
+
+    def detect(self, frame, gray=None):
+        raise NotImplementedError
+
+    def detect_batch(self, frames, grays=None):
+        """Detect faces in several frames; backends override to batch the work"""
+        grays = grays if grays is not None else [None] * len(frames)
+        return [self.detect(frame, gray) for frame, gray in zip(frames, grays)]
+
+
+class HaarDetector(FaceDetector):
+    """OpenCV Haar cascade, optionally run on a downscaled frame.
+
+    With `downscale` below 1 the cascade scans a smaller image, which is
+    roughly quadratically faster; boxes are scaled back to the frame.
+    """
+
+    name = 'haar'
+    needs_color = False
+
+    def __init__(self, downscale=1.0, scale_factor=1.3, min_neighbors=5, min_size=0):
+        self.cascade = cv2.CascadeClassifier(cv2.data.haarcascades + 'haarcascade_frontalface_default.xml')
+        self.downscale = float(downscale)
+        self.scale_factor = scale_factor
+        self.min_neighbors = min_neighbors
+        self.min_size = min_size
+
+    def detect(self, frame, gray=None):
+        if gray is None:
+            gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        height, width = gray.shape[:2]
+
+        scale = self.downscale
+        if scale < 1.0:
+            gray = cv2.resize(gray, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+        min_size = int(self.min_size * min(scale, 1.0))
+
+        boxes = self.cascade.detectMultiScale(gray, self.scale_factor, self.min_neighbors, minSize=(min_size, min_size))
+        boxes = _boxes(boxes)
+        if scale < 1.0 and len(boxes):
+            boxes = np.rint(boxes / scale).astype(np.int32)
+        return _clip(boxes, width, height)
+
+
+class SSDDetector(FaceDetector):
+    """ResNet-10 SSD face detector through OpenCV's DNN module.
+
+    detect_batch runs all frames through the network as one blob.
+    """
+
+    name = 'ssd'
+    mean = (104.0, 177.0, 123.0)
+
+    def __init__(self, model_dir=DEFAULT_MODEL_DIR, confidence=0.5, input_size=300):
+        prototxt, weights = (os.path.join(model_dir, f) for f in DETECTOR_MODEL_FILES['ssd'])
+        _require(prototxt, weights)
+        self.net = cv2.dnn.readNetFromCaffe(prototxt, weights)
+        self.confidence = confidence
+        self.input_size = input_size
+        # A DNN net holds its input and outputs, so calls must not overlap
+        self._lock = threading.Lock()
+
+    def detect(self, frame, gray=None):
+        return self.detect_batch([frame])[0]
+
+    def detect_batch(self, frames, grays=None):
+        if not frames:
+            return []
+        size = (self.input_size, self.input_size)
+        blob = cv2.dnn.blobFromImages(frames, 1.0, size, self.mean, swapRB=False, crop=False)
+        with self._lock:
+            self.net.setInput(blob)
+            detections = self.net.forward().reshape(-1, 7)  # image, class, score, x1, y1, x2, y2
+
+        detections = detections[detections[:, 2] >= self.confidence]
+        results = []
+        for index, frame in enumerate(frames):
+            height, width = frame.shape[:2]
+            rows = detections[detections[:, 0] == index]
+            corners = rows[:, 3:7] * np.array([width, height, width, height], dtype=np.float32)
+            boxes = np.column_stack([corners[:, 0], corners[:, 1], corners[:, 2] - corners[:, 0], corners[:, 3] - corners[:, 1]])
+            results.append(_clip(np.rint(boxes), width, height))
+        return results
+
+
+class YuNetDetector(FaceDetector):
+    """YuNet face detector (cv2.FaceDetectorYN, OpenCV 4.5.4 and later).
+
+    FaceDetectorYN takes one image per call, so detect_batch is the base
+    class' loop over frames; only the SSD backend batches the network call.
+    """
+
+    name = 'yunet'
+
+    def __init__(self, model_dir=DEFAULT_MODEL_DIR, confidence=0.6, nms_threshold=0.3, top_k=50):
+        (model,) = (os.path.join(model_dir, f) for f in DETECTOR_MODEL_FILES['yunet'])
+        _require(model)
+        self.detector = cv2.FaceDetectorYN.create(model, '', (320, 320), confidence, nms_threshold, top_k)
+        self._input_size = (320, 320)
+        self._lock = threading.Lock()
+
+    def detect(self, frame, gray=None):
+        height, width = frame.shape[:2]
+        with self._lock:
+            # Frames of a stream share one size, so this rarely reconfigures
+            if self._input_size != (width, height):
+                self.detector.setInputSize((width, height))
+                self._input_size = (width, height)
+            _, faces = self.detector.detect(frame)
+        if faces is None:
+            return _boxes([])
+        return _clip(np.rint(faces[:, :4]), width, height)
+
+
+def _require(*paths):
+    missing = [p for p in paths if not os.path.exists(p)]
+    if missing:
+        raise FileNotFoundError(
+            f"Face detector model files not found: {', '.join(missing)}. "
+            f"Run `python -m models.face_detectors` to download them."
+        )
+
+
+DETECTORS = {
+    'haar': HaarDetector,
+    'ssd': SSDDetector,
+    'yunet': YuNetDetector
+}
+
+
+def create_detector(settings=None):
+    """Build the face detector selected by FACE_DETECTOR in `settings`.
+
+    `settings` is app.config or any mapping with the same keys, such as
+    os.environ: FACE_DETECTOR ('haar', 'ssd' or 'yunet'),
+    FACE_DETECTOR_MODEL_DIR, FACE_DETECTOR_CONFIDENCE and, for Haar,
+    FACE_DETECTOR_DOWNSCALE.
+    """
+    settings = settings or {}
+    name = settings.get('FACE_DETECTOR') or 'haar'
+    if name not in DETECTORS:
+        raise ValueError(f"Unknown face detector '{name}', expected one of {', '.join(DETECTORS)}")
+
+    if name == 'haar':
+        return HaarDetector(downscale=float(settings.get('FACE_DETECTOR_DOWNSCALE') or 1.0))
+
+    options = {'model_dir': settings.get('FACE_DETECTOR_MODEL_DIR') or DEFAULT_MODEL_DIR}
+    if settings.get('FACE_DETECTOR_CONFIDENCE'):
+        options['confidence'] = float(settings['FACE_DETECTOR_CONFIDENCE'])
+    return DETECTORS[name](**options)
+
+
+def download_models(model_dir=DEFAULT_MODEL_DIR, backends=('ssd', 'yunet')):
+    """Fetch the DNN detector model files that are missing from `model_dir`"""
+    os.makedirs(model_dir, exist_ok=True)
+    for backend in backends:
+        for filename, url in DETECTOR_MODEL_FILES[backend].items():
+            path = os.path.join(model_dir, filename)
+            if not os.path.exists(path):
+                print(f'Downloading {url}')
+                urllib.request.urlretrieve(url, path + '.part')
+                os.replace(path + '.part', path)
+
+
+if __name__ == '__main__':
+    download_models(os.environ.get('FACE_DETECTOR_MODEL_DIR') or DEFAULT_MODEL_DIR)
@@ -2,30 +2,72 @@ import os
 import numpy as np
 import cv2
 import tensorflow as tf
-from tensorflow.keras.models import Sequential, load_model
-from tensorflow.keras.layers import Dense, Dropout, Flatten, Conv2D, MaxPooling2D, BatchNormalization
+from tensorflow.keras.models import Model, Sequential, load_model
+from tensorflow.keras.layers import Input, Dense, Dropout, Flatten, Conv2D, MaxPooling2D, BatchNormalization, Rescaling, Concatenate
 from tensorflow.keras.optimizers import Adam
 import pandas as pd
 from sklearn.model_selection import train_test_split
 import base64
 import io
 from PIL import Image
+from utils.metrics import stage
+from utils.batch import MicroBatcher
+from .face_batch import FaceBatch
+from .face_detectors import HaarDetector
+from .video_pipeline import VideoDecoder
 
 class FERModel:
-    def __init__(self, model_path=None):
+    # Side of the square grayscale face the network takes
+    input_size = 48
+    
+    # Video frames decoded and passed to the face detector together
+    detect_batch_size = 8
+    
+    def __init__(self, model_path=None, detector=None, decoder=None):
         self.emotions = ['Angry', 'Disgust', 'Fear', 'Happy', 'Sad', 'Surprise', 'Neutral']
-        self.face_cascade = cv2.CascadeClassifier(cv2.data.haarcascades + 'haarcascade_frontalface_default.xml')
+        self.detector = detector or HaarDetector()
+        self.decoder = decoder or VideoDecoder()
+        
+        # Per-thread preprocessing buffers, reused across frames
+        self.face_batch = FaceBatch(self.input_size)
         
         if model_path and os.path.exists(model_path):
-            self.model = load_model(model_path)
+            self.model = self._with_rescaling(load_model(model_path))
         else:
             self.model = self._build_model()
+        
+        # Serving returns probabilities and face embeddings from one call,
+        # and concurrent callers share batched model calls
+        self.serving_model = self._serving_model(self.model)
+        self.embedding_size = self.serving_model.output_shape[-1] - len(self.emotions)
+        self.infer = MicroBatcher(self.serving_model.predict_on_batch)
+    
+    def _serving_model(self, model):
+        """Model whose output is the emotion probabilities followed by the
+        penultimate layer's activations, which serve as the face embedding"""
+        # Loaded models may sit inside the Rescaling wrapper of _with_rescaling
+        network = model.layers[-1] if isinstance(model.layers[-1], Model) else model
+        features = Model(network.inputs, [network.output, network.layers[-1].input])
+        
+        inputs = Input(shape=(self.input_size, self.input_size, 1))
+        x = inputs if network is model else model.layers[0](inputs)
+        probabilities, embedding = features(x)
+        return Model(inputs, Concatenate()([probabilities, embedding]))
+    
+    def _with_rescaling(self, model):
+        """Models saved before normalization moved into the network expect [0, 1] input"""
+        if model.layers and isinstance(model.layers[0], Rescaling):
+            return model
+        return Sequential([Rescaling(1. / 255, input_shape=(self.input_size, self.input_size, 1)), model])
     
     def _build_model(self):
         model = Sequential()
         
+        # Inputs are raw 0-255 pixels; scaling happens inside the network
+        model.add(Rescaling(1. / 255, input_shape=(self.input_size, self.input_size, 1)))
+        
         # First convolutional block
-        model.add(Conv2D(32, kernel_size=(3, 3), activation='relu', input_shape=(48, 48, 1)))
+        model.add(Conv2D(32, kernel_size=(3, 3), activation='relu'))
         model.add(BatchNormalization())
         model.add(Conv2D(32, kernel_size=(3, 3), activation='relu'))
         model.add(BatchNormalization())
@@ -83,8 +125,7 @@ class FERModel:
         faces = np.asarray(faces)
         faces = np.expand_dims(faces, -1)
         
-        # Normalize pixel values
-        faces = faces / 255.0
+        # Pixel values stay in 0-255, the model's Rescaling layer normalizes them
         
         # One-hot encode emotions
         emotions = pd.get_dummies(data['emotion']).values
@@ -109,63 +150,86 @@ class FERModel:
         scores = self.model.evaluate(X_test, y_test)
         return {"loss": scores[0], "accuracy": scores[1]}
     
+    def warmup(self, batch_sizes=(1, 2, 4, 8)):
+        """Trace the model for each batch size and initialize the face detector"""
+        frame = np.zeros((240, 320, 3), dtype=np.uint8)
+        self.detector.detect(frame)
+        self.detector.detect_batch([frame] * self.detect_batch_size)
+        for size in batch_sizes:
+            self.serving_model.predict_on_batch(np.zeros((size,) + self.model.input_shape[1:], dtype=np.float32))
+    
     def preprocess_face(self, face):
-        # Convert to grayscale
+        """Model input for a single BGR face crop, as a (1, 48, 48, 1) float32 array"""
         gray_face = cv2.cvtColor(face, cv2.COLOR_BGR2GRAY)
+        height, width = gray_face.shape
+        return self.preprocess_faces(gray_face, [(0, 0, width, height)]).copy()
+    
+    def preprocess_faces(self, gray, faces):
+        """Crop face boxes from a grayscale frame into the model's input batch.
         
-        # Resize to 48x48
-        resized_face = cv2.resize(gray_face, (48, 48))
-        
-        # Normalize
-        normalized_face = resized_face / 255.0
+        The result is a view of a per-thread buffer that the next call
+        overwrites; see FaceBatch.
+        """
+        return self.face_batch.fill(gray, faces)
+    
+    def analyze_faces(self, gray, faces):
+        """Emotion probabilities and embeddings for every face box, in one model call per frame"""
+        if len(faces) == 0:
+            return np.empty((0, len(self.emotions)), dtype=np.float32), np.empty((0, self.embedding_size), dtype=np.float32)
         
-        # Reshape for model input
-        reshaped_face = normalized_face.reshape(1, 48, 48, 1)
+        with stage('fer.preprocess'):
+            batch = self.preprocess_faces(gray, faces)
         
-        return reshaped_face
+        with stage('fer.inference'):
+            outputs = self.infer(batch)
+        return outputs[:, :len(self.emotions)], outputs[:, len(self.emotions):]
     
-    def predict(self, video_path):
-        cap = cv2.VideoCapture(video_path)
+    def predict_faces(self, gray, faces):
+        """Emotion probabilities for every face box, in one model call per frame"""
+        return self.analyze_faces(gray, faces)[0]
+    
+    def predict(self, video_path, timeline=None):
         results = []
         
-        while cap.isOpened():
-            ret, frame = cap.read()
-            if not ret:
-                break
-            
-            # Convert to grayscale
-            gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        # Decode on a background thread while detection and inference run here
+        with self.decoder.open(video_path, color=self.detector.needs_color) as video:
+            # Full-resolution per-frame data goes to the optional timeline builder
+            if timeline is not None:
+                timeline.fps = video.fps
+            frame_index = 0
             
-            # Detect faces
-            faces = self.face_cascade.detectMultiScale(gray, 1.3, 5)
-            
-            frame_results = []
-            for (x, y, w, h) in faces:
-                # Extract face
-                face = frame[y:y+h, x:x+w]
-                
-                # Preprocess face
-                processed_face = self.preprocess_face(face)
+            for batch in video.batches(self.detect_batch_size):
+                frames = [frame for frame, _ in batch]
+                grays = [gray for _, gray in batch]
                 
-                # Predict emotion
-                predictions = self.model.predict(processed_face)[0]
+                with stage('fer.detect'):
+                    # Detect faces in all decoded frames at once
+                    detections = self.detector.detect_batch(frames, grays)
                 
-                # Get top emotion
-                emotion_idx = np.argmax(predictions)
-                emotion = self.emotions[emotion_idx]
-                confidence = float(predictions[emotion_idx])
-                
-                frame_results.append({
-                    "emotion": emotion,
-                    "confidence": confidence,
-                    "position": {"x": int(x), "y": int(y), "width": int(w), "height": int(h)},
-                    "all_emotions": {self.emotions[i]: float(predictions[i]) for i in range(len(self.emotions))}
-                })
-            
-            if frame_results:
-                results.append(frame_results)
-        
-        cap.release()
+                for gray, faces in zip(grays, detections):
+                    frame_results = []
+                    frame_probs, embeddings = self.analyze_faces(gray, faces)
+                    # Report boxes in the uploaded video's coordinates
+                    boxes = video.to_source(faces)
+                    for (x, y, w, h), predictions in zip(boxes, frame_probs):
+                        # Get top emotion
+                        emotion_idx = np.argmax(predictions)
+                        emotion = self.emotions[emotion_idx]
+                        confidence = float(predictions[emotion_idx])
+                        
+                        frame_results.append({
+                            "emotion": emotion,
+                            "confidence": confidence,
+                            "position": {"x": int(x), "y": int(y), "width": int(w), "height": int(h)},
+                            "all_emotions": {self.emotions[i]: float(predictions[i]) for i in range(len(self.emotions))}
+                        })
+                    
+                    if timeline is not None:
+                        timeline.add_frame(frame_index, frame_probs, boxes, embeddings)
+                    frame_index += 1
+                    
+                    if frame_results:
+                        results.append(frame_results)
         
         # Aggregate results
         if not results:
@@ -198,37 +262,31 @@ class FERModel:
         }
     
     def predict_frame(self, frame_data):
-        # Decode base64 image
-        if isinstance(frame_data, str) and frame_data.startswith('data:image'):
-            frame_data = frame_data.split(',')[1]
+        with stage('fer.decode'):
+            # Decode base64 image
+            if isinstance(frame_data, str) and frame_data.startswith('data:image'):
+                frame_data = frame_data.split(',')[1]
+                
+            image_data = base64.b64decode(frame_data)
+            image = Image.open(io.BytesIO(image_data))
+            frame = np.array(image)
             
-        image_data = base64.b64decode(frame_data)
-        image = Image.open(io.BytesIO(image_data))
-        frame = np.array(image)
-        
-        # Convert to BGR (OpenCV format)
-        if frame.shape[2] == 4:  # If RGBA
-            frame = cv2.cvtColor(frame, cv2.COLOR_RGBA2BGR)
-        else:
-            frame = cv2.cvtColor(frame, cv2.COLOR_RGB2BGR)
+            # Convert to BGR (OpenCV format)
+            if frame.shape[2] == 4:  # If RGBA
+                frame = cv2.cvtColor(frame, cv2.COLOR_RGBA2BGR)
+            else:
+                frame = cv2.cvtColor(frame, cv2.COLOR_RGB2BGR)
         
-        # Convert to grayscale
-        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-        
-        # Detect faces
-        faces = self.face_cascade.detectMultiScale(gray, 1.3, 5)
+        with stage('fer.detect'):
+            # Convert to grayscale
+            gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+            
+            # Detect faces
+            faces = self.detector.detect(frame, gray)
         
         results = []
-        for (x, y, w, h) in faces:
-            # Extract face
-            face = frame[y:y+h, x:x+w]
-            
-            # Preprocess face
-            processed_face = self.preprocess_face(face)
-            
-            # Predict emotion
-            predictions = self.model.predict(processed_face)[0]
-            
+        # Predict emotions for all faces of the frame at once
+        for (x, y, w, h), predictions in zip(faces, self.predict_faces(gray, faces)):
             # Get top emotion
             emotion_idx = np.argmax(predictions)
             emotion = self.emotions[emotion_idx]
@@ -11,6 +11,7 @@ from .ser_model import SERModel
 import base64
 import io
 from PIL import Image
+from utils.metrics import stage
 
 class FusionModel:
     def __init__(self, model_path=None, fer_model=None, ser_model=None):
@@ -76,6 +77,11 @@ class FusionModel:
         
         return model
     
+    def warmup(self, batch_sizes=(1, 2, 4, 8)):
+        """Trace the fusion network for each batch size"""
+        for size in batch_sizes:
+            self.model.predict_on_batch([np.zeros((size,) + shape[1:], dtype=np.float32) for shape in self.model.input_shape])
+    
     def train(self, video_features, audio_features, labels, epochs=50, batch_size=32):
         # Split data
         from sklearn.model_selection import train_test_split
@@ -100,55 +106,56 @@ class FusionModel:
         scores = self.model.evaluate([X_video_test, X_audio_test], y_test)
         return {"loss": scores[0], "accuracy": scores[1]}
     
-    def predict(self, video_path, audio_path):
+    def predict(self, video_path, audio_path, timeline=None):
         # Get FER predictions
-        fer_results = self.fer_model.predict(video_path)
+        fer_results = self.fer_model.predict(video_path, timeline=timeline)
         
         # Get SER predictions
         ser_results = self.ser_model.predict(audio_path)
         
-        # Simple fusion (weighted average)
-        # In a real implementation, we would extract features and use the fusion model
-        fer_emotions = fer_results['emotion_distribution']
-        ser_emotions = ser_results['emotion_distribution']
-        
-        # Map SER emotions to FER emotions
-        mapped_ser_emotions = {
-            'Angry': ser_emotions.get('angry', 0),
-            'Disgust': ser_emotions.get('disgust', 0),
-            'Fear': ser_emotions.get('fearful', 0),
-            'Happy': ser_emotions.get('happy', 0),
-            'Sad': ser_emotions.get('sad', 0),
-            'Surprise': ser_emotions.get('surprised', 0),
-            'Neutral': (ser_emotions.get('neutral', 0) + ser_emotions.get('calm', 0)) / 2
-        }
-        
-        # Weighted fusion (60% video, 40% audio)
-        fusion_emotions = {}
-        for emotion in self.emotions:
-            fusion_emotions[emotion] = 0.6 * fer_emotions.get(emotion, 0) + 0.4 * mapped_ser_emotions.get(emotion, 0)
-        
-        # Get dominant emotion
-        dominant_emotion = max(fusion_emotions, key=fusion_emotions.get)
-        
-        # Calculate valence-arousal
-        valence = self.valence_arousal[dominant_emotion]['valence']
-        arousal = self.valence_arousal[dominant_emotion]['arousal']
-        
-        # Determine intensity
-        confidence = fusion_emotions[dominant_emotion]
-        if confidence < 0.4:
-            intensity = "mild"
-        elif confidence < 0.7:
-            intensity = "moderate"
-        else:
-            intensity = "strong"
-        
-        # Check for compound emotions
-        sorted_emotions = sorted(fusion_emotions.items(), key=lambda x: x[1], reverse=True)
-        compound_emotion = None
-        if sorted_emotions[1][1] > 0.3 * sorted_emotions[0][1]:
-            compound_emotion = f"{sorted_emotions[0][0]}-{sorted_emotions[1][0]}"
+        with stage('fusion.combine'):
+            # Simple fusion (weighted average)
+            # In a real implementation, we would extract features and use the fusion model
+            fer_emotions = fer_results['emotion_distribution']
+            ser_emotions = ser_results['emotion_distribution']
+        
+            # Map SER emotions to FER emotions
+            mapped_ser_emotions = {
+                'Angry': ser_emotions.get('angry', 0),
+                'Disgust': ser_emotions.get('disgust', 0),
+                'Fear': ser_emotions.get('fearful', 0),
+                'Happy': ser_emotions.get('happy', 0),
+                'Sad': ser_emotions.get('sad', 0),
+                'Surprise': ser_emotions.get('surprised', 0),
+                'Neutral': (ser_emotions.get('neutral', 0) + ser_emotions.get('calm', 0)) / 2
+            }
+        
+            # Weighted fusion (60% video, 40% audio)
+            fusion_emotions = {}
+            for emotion in self.emotions:
+                fusion_emotions[emotion] = 0.6 * fer_emotions.get(emotion, 0) + 0.4 * mapped_ser_emotions.get(emotion, 0)
+        
+            # Get dominant emotion
+            dominant_emotion = max(fusion_emotions, key=fusion_emotions.get)
+        
+            # Calculate valence-arousal
+            valence = self.valence_arousal[dominant_emotion]['valence']
+            arousal = self.valence_arousal[dominant_emotion]['arousal']
+        
+            # Determine intensity
+            confidence = fusion_emotions[dominant_emotion]
+            if confidence < 0.4:
+                intensity = "mild"
+            elif confidence < 0.7:
+                intensity = "moderate"
+            else:
+                intensity = "strong"
+        
+            # Check for compound emotions
+            sorted_emotions = sorted(fusion_emotions.items(), key=lambda x: x[1], reverse=True)
+            compound_emotion = None
+            if sorted_emotions[1][1] > 0.3 * sorted_emotions[0][1]:
+                compound_emotion = f"{sorted_emotions[0][0]}-{sorted_emotions[1][0]}"
         
         return {
             "dominant_emotion": dominant_emotion,
@@ -169,51 +176,52 @@ class FusionModel:
         # Get SER predictions
         ser_results = self.ser_model.predict_chunk(audio_data)
         
-        # Extract emotion distributions
-        if 'faces' in fer_results and fer_results['faces']:
-            fer_emotions = fer_results['faces'][0]['all_emotions']
-        else:
-            fer_emotions = {emotion: 0.0 for emotion in self.emotions}
-        
-        ser_emotions = ser_results['all_emotions']
-        
-        # Map SER emotions to FER emotions
-        mapped_ser_emotions = {
-            'Angry': ser_emotions.get('angry', 0),
-            'Disgust': ser_emotions.get('disgust', 0),
-            'Fear': ser_emotions.get('fearful', 0),
-            'Happy': ser_emotions.get('happy', 0),
-            'Sad': ser_emotions.get('sad', 0),
-            'Surprise': ser_emotions.get('surprised', 0),
-            'Neutral': (ser_emotions.get('neutral', 0) + ser_emotions.get('calm', 0)) / 2
-        }
-        
-        # Weighted fusion (60% video, 40% audio)
-        fusion_emotions = {}
-        for emotion in self.emotions:
-            fusion_emotions[emotion] = 0.6 * fer_emotions.get(emotion, 0) + 0.4 * mapped_ser_emotions.get(emotion, 0)
-        
-        # Get dominant emotion
-        dominant_emotion = max(fusion_emotions, key=fusion_emotions.get)
-        
-        # Calculate valence-arousal
-        valence = self.valence_arousal[dominant_emotion]['valence']
-        arousal = self.valence_arousal[dominant_emotion]['arousal']
-        
-        # Determine intensity
-        confidence = fusion_emotions[dominant_emotion]
-        if confidence < 0.4:
-            intensity = "mild"
-        elif confidence < 0.7:
-            intensity = "moderate"
-        else:
-            intensity = "strong"
-        
-        # Check for compound emotions
-        sorted_emotions = sorted(fusion_emotions.items(), key=lambda x: x[1], reverse=True)
-        compound_emotion = None
-        if len(sorted_emotions) > 1 and sorted_emotions[1][1] > 0.3 * sorted_emotions[0][1]:
-            compound_emotion = f"{sorted_emotions[0][0]}-{sorted_emotions[1][0]}"
+        with stage('fusion.combine'):
+            # Extract emotion distributions
+            if 'faces' in fer_results and fer_results['faces']:
+                fer_emotions = fer_results['faces'][0]['all_emotions']
+            else:
+                fer_emotions = {emotion: 0.0 for emotion in self.emotions}
+        
+            ser_emotions = ser_results['all_emotions']
+        
+            # Map SER emotions to FER emotions
+            mapped_ser_emotions = {
+                'Angry': ser_emotions.get('angry', 0),
+                'Disgust': ser_emotions.get('disgust', 0),
+                'Fear': ser_emotions.get('fearful', 0),
+                'Happy': ser_emotions.get('happy', 0),
+                'Sad': ser_emotions.get('sad', 0),
+                'Surprise': ser_emotions.get('surprised', 0),
+                'Neutral': (ser_emotions.get('neutral', 0) + ser_emotions.get('calm', 0)) / 2
+            }
+        
+            # Weighted fusion (60% video, 40% audio)
+            fusion_emotions = {}
+            for emotion in self.emotions:
+                fusion_emotions[emotion] = 0.6 * fer_emotions.get(emotion, 0) + 0.4 * mapped_ser_emotions.get(emotion, 0)
+        
+            # Get dominant emotion
+            dominant_emotion = max(fusion_emotions, key=fusion_emotions.get)
+        
+            # Calculate valence-arousal
+            valence = self.valence_arousal[dominant_emotion]['valence']
+            arousal = self.valence_arousal[dominant_emotion]['arousal']
+        
+            # Determine intensity
+            confidence = fusion_emotions[dominant_emotion]
+            if confidence < 0.4:
+                intensity = "mild"
+            elif confidence < 0.7:
+                intensity = "moderate"
+            else:
+                intensity = "strong"
+        
+            # Check for compound emotions
+            sorted_emotions = sorted(fusion_emotions.items(), key=lambda x: x[1], reverse=True)
+            compound_emotion = None
+            if len(sorted_emotions) > 1 and sorted_emotions[1][1] > 0.3 * sorted_emotions[0][1]:
+                compound_emotion = f"{sorted_emotions[0][0]}-{sorted_emotions[1][0]}"
         
         return {
             "dominant_emotion": dominant_emotion,
@@ -0,0 +1,36 @@
+import threading
+
+from .fer_model import FERModel
+from .ser_model import SERModel
+from .fusion_model import FusionModel
+from .face_detectors import create_detector
+from .video_pipeline import create_video_decoder
+
+_lock = threading.Lock()
+_models = None
+
+
+class ModelSet:
+    """The FER, SER and Fusion models that serve one process"""
+
+    def __init__(self, settings=None):
+        self.fer = FERModel(detector=create_detector(settings), decoder=create_video_decoder(settings))
+        self.ser = SERModel()
+        self.fusion = FusionModel(fer_model=self.fer, ser_model=self.ser)
+
+    def __iter__(self):
+        return iter([('fer', self.fer), ('ser', self.ser), ('fusion', self.fusion)])
+
+
+def get_models(settings=None):
+    """The process-wide ModelSet, built by the first caller.
+
+    app.py and the API blueprint both serve requests from it, so every
+    model is loaded and warmed up once per process. `settings` (app.config
+    or os.environ) only matters for the first call.
+    """
+    global _models
+    with _lock:
+        if _models is None:
+            _models = ModelSet(settings)
+        return _models
@@ -12,6 +12,9 @@ import sounddevice as sd
 import soundfile as sf
 import base64
 import io
+import tempfile
+from utils.metrics import stage
+from utils.batch import MicroBatcher
 
 class SERModel:
     def __init__(self, model_path=None):
@@ -21,6 +24,9 @@ class SERModel:
             self.model = load_model(model_path)
         else:
             self.model = self._build_model()
+        
+        # Concurrent callers share batched model calls
+        self.infer = MicroBatcher(self.model.predict_on_batch)
     
     def _build_model(self):
         model = Sequential()
@@ -58,13 +64,21 @@ class SERModel:
         
         return model
     
+    def warmup(self, batch_sizes=(1, 2, 4, 8)):
+        """Trace the model for each batch size and compile librosa's feature code"""
+        librosa.feature.mfcc(y=np.zeros(22050, dtype=np.float32), sr=22050, n_mfcc=40)
+        for size in batch_sizes:
+            self.model.predict_on_batch(np.zeros((size,) + self.model.input_shape[1:], dtype=np.float32))
+    
     def extract_features(self, audio_path, max_pad_len=174):
         try:
             # Load audio file
-            y, sr = librosa.load(audio_path, sr=22050)
+            with stage('ser.decode'):
+                y, sr = librosa.load(audio_path, sr=22050)
             
             # Extract MFCCs
-            mfccs = librosa.feature.mfcc(y=y, sr=sr, n_mfcc=40)
+            with stage('ser.features'):
+                mfccs = librosa.feature.mfcc(y=y, sr=sr, n_mfcc=40)
             
             # Transpose to get time as first dimension
             mfccs = mfccs.T
@@ -152,7 +166,8 @@ class SERModel:
         mfccs = mfccs.reshape(1, mfccs.shape[0], 1)
         
         # Predict emotion
-        predictions = self.model.predict(mfccs)[0]
+        with stage('ser.inference'):
+            predictions = self.infer(mfccs)[0]
         
         # Get top emotion
         emotion_idx = np.argmax(predictions)
@@ -163,7 +178,8 @@ class SERModel:
         all_emotions = {self.emotions[i]: float(predictions[i]) for i in range(len(self.emotions))}
         
         # Get audio duration
-        y, sr = librosa.load(audio_path)
+        with stage('ser.decode'):
+            y, sr = librosa.load(audio_path)
         duration = librosa.get_duration(y=y, sr=sr)
         
         return {
@@ -179,18 +195,21 @@ class SERModel:
         if isinstance(audio_data, str) and audio_data.startswith('data:audio'):
             audio_data = audio_data.split(',')[1]
             
-        audio_bytes = base64.b64decode(audio_data)
-        
-        # Save to temporary file
-        temp_file = 'temp_audio.wav'
-        with open(temp_file, 'wb') as f:
-            f.write(audio_bytes)
+        with stage('ser.decode'):
+            audio_bytes = base64.b64decode(audio_data)
+            
+            # Save to a temporary file of its own; chunks of several streams
+            # are processed concurrently
+            fd, temp_file = tempfile.mkstemp(suffix='.wav')
+            with os.fdopen(fd, 'wb') as f:
+                f.write(audio_bytes)
         
         # Extract features
-        mfccs = self.extract_features(temp_file)
-        
-        # Remove temporary file
-        os.remove(temp_file)
+        try:
+            mfccs = self.extract_features(temp_file)
+        finally:
+            # Remove temporary file
+            os.remove(temp_file)
         
         if mfccs is None:
             return {"error": "Failed to extract features"}
@@ -199,7 +218,8 @@ class SERModel:
         mfccs = mfccs.reshape(1, mfccs.shape[0], 1)
         
         # Predict emotion
-        predictions = self.model.predict(mfccs)[0]
+        with stage('ser.inference'):
+            predictions = self.infer(mfccs)[0]
         
         # Get top emotion
         emotion_idx = np.argmax(predictions)
@@ -0,0 +1,141 @@
+import contextvars
+import queue
+import threading
+
+import cv2
+import numpy as np
+
+from utils.metrics import stage
+
+_END = object()
+
+
+class DecodedVideo:
+    """Frames of one video, decoded ahead of the consumer by a background thread.
+
+    The decode thread reads, downscales and converts frames to grayscale
+    while the caller runs detection and inference on earlier ones. The
+    bounded queue caps how far decoding runs ahead, and with it memory.
+    Use as a context manager so the thread and capture are released when
+    the consumer stops early.
+    """
+
+    def __init__(self, cap, max_width=0, queue_size=24, color=True):
+        self.cap = cap
+        self.fps = float(cap.get(cv2.CAP_PROP_FPS) or 0.0)
+        self.max_width = max_width
+        self.color = color
+        self.scale = 1.0
+        self._queue = queue.Queue(maxsize=max(1, queue_size))
+        self._stop = threading.Event()
+        # Run in a copy of the caller's context so decode timings reach its trace
+        self._thread = threading.Thread(target=contextvars.copy_context().run, args=(self._decode,), name='video-decode', daemon=True)
+        self._thread.start()
+
+    def _put(self, item):
+        while not self._stop.is_set():
+            try:
+                self._queue.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _decode(self):
+        try:
+            while not self._stop.is_set():
+                with stage('fer.decode'):
+                    ret, frame = self.cap.read()
+                    if not ret:
+                        break
+                    if self.max_width and frame.shape[1] > self.max_width:
+                        self.scale = self.max_width / frame.shape[1]
+                        frame = cv2.resize(frame, None, fx=self.scale, fy=self.scale, interpolation=cv2.INTER_AREA)
+                    gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+                if not self._put((frame if self.color else None, gray)):
+                    return
+        except Exception as e:
+            self._put(e)
+        finally:
+            self.cap.release()
+            self._put(_END)
+
+    def batches(self, size):
+        """Yield lists of up to `size` (frame, gray) pairs in decode order.
+
+        `frame` is the BGR frame, or None when decoding in grayscale only.
+        Both are at the working resolution, `scale` times the source size.
+        """
+        batch = []
+        while True:
+            with stage('fer.decode_wait'):
+                item = self._queue.get()
+            if item is _END:
+                break
+            if isinstance(item, Exception):
+                raise item
+            batch.append(item)
+            if len(batch) == size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+    def to_source(self, boxes):
+        """Map x, y, width, height boxes from working to source resolution"""
+        if self.scale == 1.0 or len(boxes) == 0:
+            return boxes
+        return np.rint(np.asarray(boxes) / self.scale).astype(np.int32)
+
+    def close(self):
+        self._stop.set()
+        self._thread.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class VideoDecoder:
+    """Opens videos for threaded decoding at a bounded working resolution.
+
+    Frames wider than `max_width` are downscaled as soon as they are
+    decoded, so a 4K upload never queues full-size frames; 0 keeps the
+    source resolution. `queue_size` is the number of decoded frames that
+    may wait for the consumer. With `hw_acceleration`, OpenCV may use any
+    available hardware decoder and falls back to software otherwise.
+    """
+
+    def __init__(self, max_width=1280, queue_size=24, hw_acceleration=False):
+        self.max_width = int(max_width or 0)
+        self.queue_size = int(queue_size)
+        self.hw_acceleration = hw_acceleration
+
+    def _capture(self, path):
+        # The acceleration property exists from OpenCV 4.5.2
+        if self.hw_acceleration and hasattr(cv2, 'CAP_PROP_HW_ACCELERATION'):
+            cap = cv2.VideoCapture(path, cv2.CAP_ANY, [cv2.CAP_PROP_HW_ACCELERATION, cv2.VIDEO_ACCELERATION_ANY])
+            if cap.isOpened():
+                return cap
+        return cv2.VideoCapture(path)
+
+    def open(self, path, color=True):
+        """Start decoding `path`; with color=False only grayscale frames are kept"""
+        return DecodedVideo(self._capture(path), self.max_width, self.queue_size, color)
+
+
+def create_video_decoder(settings=None):
+    """Build the video decoder configured in `settings`.
+
+    `settings` is app.config or a mapping with the same keys, such as
+    os.environ: VIDEO_DECODE_MAX_WIDTH (0 for the source resolution),
+    VIDEO_DECODE_QUEUE and VIDEO_HW_ACCELERATION.
+    """
+    settings = settings or {}
+    return VideoDecoder(
+        max_width=int(settings.get('VIDEO_DECODE_MAX_WIDTH', 1280) or 0),
+        queue_size=int(settings.get('VIDEO_DECODE_QUEUE') or 24),
+        hw_acceleration=str(settings.get('VIDEO_HW_ACCELERATION') or '0').lower() in ('1', 'true', 'any')
+    )
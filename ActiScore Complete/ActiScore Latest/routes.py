@@ -1,6 +1,8 @@
 from flask import render_template, url_for, flash, redirect, request, jsonify
 from flask_login import login_user, current_user, logout_user, login_required
 from werkzeug.utils import secure_filename
+from sqlalchemy import func
+from sqlalchemy.orm import defer
 import os
 import json
 from datetime import datetime
@@ -70,8 +72,9 @@ def register_routes(app):
     @app.route('/dashboard')
     @login_required
     def dashboard():
-        analyses = Analysis.query.filter_by(user_id=current_user.id).order_by(Analysis.created_at.desc()).all()
-        return render_template('dashboard.html', title='Dashboard', analyses=analyses)
+        analyses = Analysis.query.options(defer(Analysis.results)).filter_by(user_id=current_user.id).order_by(Analysis.created_at.desc(), Analysis.id.desc()).limit(20).all()
+        analysis_counts = dict(db.session.query(Analysis.analysis_type, func.count(Analysis.id)).filter_by(user_id=current_user.id).group_by(Analysis.analysis_type).all())
+        return render_template('dashboard.html', title='Dashboard', analyses=analyses, analysis_counts=analysis_counts)
     
     @app.route('/analyze', methods=['GET', 'POST'])
     @login_required
@@ -1,20 +1,31 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, current_app, Response, stream_with_context
 from flask_login import login_required, current_user
 from werkzeug.utils import secure_filename
+from sqlalchemy import and_, or_
+from sqlalchemy.orm import defer
 import os
-import json
+import base64
+import shutil
+import uuid
+import numpy as np
 from datetime import datetime
 
 # Import models
-from models.fer_model import FERModel
-from models.ser_model import SERModel
-from models.fusion_model import FusionModel
+from models.registry import get_models
 from database.db import db, Analysis
+from utils.timeline import TimelineBuilder, EmotionTimeline, timeline_path
+from utils.rollups import BUCKET_SIZES, record_analysis, query_rollups
+from utils.access import is_team_member, can_access_analysis, is_admin_user
+from utils.metrics import metrics, stage
+from utils.batch import collect_batch_files
+from utils.serialization import dumps, dumps_payload, loads, parse_utc
 
-# Initialize models
-fer_model = FERModel()
-ser_model = SERModel()
-fusion_model = FusionModel()
+# Initialize models. app.py builds them first and the blueprint shares its
+# instances; imported on its own, the settings come from the environment.
+models = get_models(os.environ)
+fer_model = models.fer
+ser_model = models.ser
+fusion_model = models.fusion
 
 # Create blueprint
 api = Blueprint('api', __name__)
@@ -110,10 +121,41 @@ API_DOCS = {
                 }
             }
         },
+        "/api/v1/analyze/batch": {
+            "post": {
+                "summary": "Analyze many files in one request",
+                "description": "Upload video and audio files, or .zip archives of them, as 'files'. Each file's result is streamed as one NDJSON line when it finishes; a final line with status 'complete' maps file names to the stored analysis ids.",
+                "requestBody": {
+                    "content": {
+                        "multipart/form-data": {
+                            "schema": {
+                                "type": "object",
+                                "properties": {
+                                    "files": {
+                                        "type": "array",
+                                        "items": {"type": "string", "format": "binary"}
+                                    }
+                                }
+                            }
+                        }
+                    }
+                },
+                "responses": {
+                    "200": {
+                        "description": "NDJSON stream of per-file results"
+                    }
+                }
+            }
+        },
         "/api/v1/analyses": {
             "get": {
                 "summary": "Get user's analyses",
-                "description": "Get a list of the user's analyses",
+                "description": "Get a page of the user's analyses, newest first. Pass next_cursor back as cursor to get the following page.",
+                "parameters": [
+                    {"name": "cursor", "in": "query", "schema": {"type": "string"}},
+                    {"name": "limit", "in": "query", "schema": {"type": "integer"}},
+                    {"name": "fields", "in": "query", "schema": {"type": "string"}}
+                ],
                 "responses": {
                     "200": {
                         "description": "List of analyses"
@@ -121,6 +163,66 @@ API_DOCS = {
                 }
             }
         },
+        "/api/v1/analyses/{id}/timeline": {
+            "get": {
+                "summary": "Get per-frame emotion timeline",
+                "description": "Get a downsampled slice of the full-resolution emotion timeline of a video analysis",
+                "parameters": [
+                    {"name": "id", "in": "path", "required": True, "schema": {"type": "integer"}},
+                    {"name": "start", "in": "query", "schema": {"type": "integer"}},
+                    {"name": "end", "in": "query", "schema": {"type": "integer"}},
+                    {"name": "points", "in": "query", "schema": {"type": "integer"}}
+                ],
+                "responses": {
+                    "200": {
+                        "description": "Emotion timeline slice"
+                    }
+                }
+            }
+        },
+        "/api/v1/analyses/{id}/tracks": {
+            "get": {
+                "summary": "List face tracks",
+                "description": "List the face tracks of a video analysis with their time range and emotion distribution",
+                "parameters": [
+                    {"name": "id", "in": "path", "required": True, "schema": {"type": "integer"}}
+                ],
+                "responses": {
+                    "200": {
+                        "description": "Face tracks"
+                    }
+                }
+            }
+        },
+        "/api/v1/analyses/{id}/tracks/{track}/similar": {
+            "get": {
+                "summary": "Find similar moments",
+                "description": "Find the face tracks most similar to one track across your own analyses (scope=user) or those shared with a team (scope=team)",
+                "parameters": [
+                    {"name": "id", "in": "path", "required": True, "schema": {"type": "integer"}},
+                    {"name": "track", "in": "path", "required": True, "schema": {"type": "integer"}},
+                    {"name": "scope", "in": "query", "schema": {"type": "string", "enum": ["user", "team"]}},
+                    {"name": "team_id", "in": "query", "schema": {"type": "integer"}},
+                    {"name": "k", "in": "query", "schema": {"type": "integer"}}
+                ],
+                "responses": {
+                    "200": {
+                        "description": "Matching tracks with their cosine similarity"
+                    }
+                }
+            }
+        },
+        "/api/v1/admin/latency": {
+            "get": {
+                "summary": "Get latency percentiles",
+                "description": "Get p50/p95/p99 latency of each analysis pipeline stage and HTTP endpoint. Admins only.",
+                "responses": {
+                    "200": {
+                        "description": "Latency summary per series"
+                    }
+                }
+            }
+        },
         "/api/v1/analyses/{id}": {
             "get": {
                 "summary": "Get analysis details",
@@ -164,20 +266,37 @@ def analyze_video():
     if file:
         filename = secure_filename(file.filename)
         filepath = os.path.join(current_app.config['UPLOAD_FOLDER'], filename)
-        file.save(filepath)
+        with stage('upload.save'):
+            file.save(filepath)
         
         # Process video with FER model
-        results = fer_model.predict(filepath)
+        timeline = TimelineBuilder(fer_model.emotions)
+        results = fer_model.predict(filepath, timeline=timeline)
+        
+        # Move the upload into media storage
+        with stage('media.store'):
+            filepath = current_app.extensions['media_store'].put(filepath)
         
         # Save analysis to database
-        analysis = Analysis(
-            user_id=current_user.id,
-            analysis_type='video',
-            file_path=filepath,
-            results=json.dumps(results)
-        )
-        db.session.add(analysis)
-        db.session.commit()
+        with stage('serialize'):
+            results_json = dumps(results)
+        with stage('db.write'):
+            analysis = Analysis(
+                user_id=current_user.id,
+                analysis_type='video',
+                results=results_json
+            )
+            analysis.attach_media(filepath)
+            db.session.add(analysis)
+            record_analysis(analysis, results)
+            db.session.commit()
+        
+        # Keep the full-resolution timeline next to the summary
+        with stage('timeline.save'):
+            built = timeline.build()
+            built.save(timeline_path(current_app.config['TIMELINE_FOLDER'], analysis.id))
+        # Make its face tracks searchable right away
+        current_app.extensions['embedding_index'].add(analysis, built.tracks)
         
         return jsonify({
             'success': True,
@@ -199,20 +318,29 @@ def analyze_audio():
     if file:
         filename = secure_filename(file.filename)
         filepath = os.path.join(current_app.config['UPLOAD_FOLDER'], filename)
-        file.save(filepath)
+        with stage('upload.save'):
+            file.save(filepath)
         
         # Process audio with SER model
         results = ser_model.predict(filepath)
         
+        # Move the upload into media storage
+        with stage('media.store'):
+            filepath = current_app.extensions['media_store'].put(filepath)
+        
         # Save analysis to database
-        analysis = Analysis(
-            user_id=current_user.id,
-            analysis_type='audio',
-            file_path=filepath,
-            results=json.dumps(results)
-        )
-        db.session.add(analysis)
-        db.session.commit()
+        with stage('serialize'):
+            results_json = dumps(results)
+        with stage('db.write'):
+            analysis = Analysis(
+                user_id=current_user.id,
+                analysis_type='audio',
+                results=results_json
+            )
+            analysis.attach_media(filepath)
+            db.session.add(analysis)
+            record_analysis(analysis, results)
+            db.session.commit()
         
         return jsonify({
             'success': True,
@@ -240,21 +368,40 @@ def analyze_fusion():
         video_filepath = os.path.join(current_app.config['UPLOAD_FOLDER'], video_filename)
         audio_filepath = os.path.join(current_app.config['UPLOAD_FOLDER'], audio_filename)
         
-        video_file.save(video_filepath)
-        audio_file.save(audio_filepath)
+        with stage('upload.save'):
+            video_file.save(video_filepath)
+            audio_file.save(audio_filepath)
         
         # Process with fusion model
-        results = fusion_model.predict(video_filepath, audio_filepath)
+        timeline = TimelineBuilder(fusion_model.fer_model.emotions)
+        results = fusion_model.predict(video_filepath, audio_filepath, timeline=timeline)
+        
+        # Move the uploads into media storage
+        with stage('media.store'):
+            media_store = current_app.extensions['media_store']
+            video_filepath = media_store.put(video_filepath)
+            audio_filepath = media_store.put(audio_filepath)
         
         # Save analysis to database
-        analysis = Analysis(
-            user_id=current_user.id,
-            analysis_type='fusion',
-            file_path=f"{video_filepath},{audio_filepath}",
-            results=json.dumps(results)
-        )
-        db.session.add(analysis)
-        db.session.commit()
+        with stage('serialize'):
+            results_json = dumps(results)
+        with stage('db.write'):
+            analysis = Analysis(
+                user_id=current_user.id,
+                analysis_type='fusion',
+                results=results_json
+            )
+            analysis.attach_media(video_filepath, audio_filepath)
+            db.session.add(analysis)
+            record_analysis(analysis, results)
+            db.session.commit()
+        
+        # Keep the full-resolution timeline next to the summary
+        with stage('timeline.save'):
+            built = timeline.build()
+            built.save(timeline_path(current_app.config['TIMELINE_FOLDER'], analysis.id))
+        # Make its face tracks searchable right away
+        current_app.extensions['embedding_index'].add(analysis, built.tracks)
         
         return jsonify({
             'success': True,
@@ -262,25 +409,178 @@ def analyze_fusion():
             'results': results
         })
 
+def analyze_batch_item(item):
+    """Run the model for one file of a batch, on the batch worker pool"""
+    if item['type'] == 'video':
+        timeline = TimelineBuilder(fer_model.emotions)
+        return fer_model.predict(item['path'], timeline=timeline), timeline
+    return ser_model.predict(item['path']), None
+
+def ndjson(record):
+    return dumps_payload(record) + '\n'
+
+@api.route('/v1/analyze/batch', methods=['POST'])
+@login_required
+def analyze_batch():
+    """Analyze many video/audio files or .zip archives of them in one request"""
+    uploads = request.files.getlist('files')
+    if not uploads:
+        return jsonify({'error': 'No files part'}), 400
+    
+    folder = os.path.join(current_app.config['UPLOAD_FOLDER'], 'batch', uuid.uuid4().hex)
+    items, rejected = collect_batch_files(uploads, folder, current_app.config['BATCH_MAX_FILES'])
+    if not items and not rejected:
+        return jsonify({'error': 'No selected files'}), 400
+    
+    analyzer = current_app.extensions['batch_analyzer']
+    user_id = current_user.id
+    timeline_folder = current_app.config['TIMELINE_FOLDER']
+    embedding_index = current_app.extensions['embedding_index']
+    media_store = current_app.extensions['media_store']
+    
+    def save(completed):
+        """Store, commit and index the analyzed files; returns their analyses"""
+        # Move analyzed files into media storage
+        with stage('media.store'):
+            refs = [media_store.put(item['path']) for item, _, _ in completed]
+        
+        # Save the whole batch in one transaction
+        with stage('serialize'):
+            payloads = [dumps(results) for _, results, _ in completed]
+        with stage('db.write'):
+            analyses = [
+                Analysis(user_id=user_id, analysis_type=item['type'], results=payload)
+                for (item, _, _), payload in zip(completed, payloads)
+            ]
+            for analysis, ref in zip(analyses, refs):
+                analysis.attach_media(ref)
+            db.session.add_all(analyses)
+            for analysis, (_, results, _) in zip(analyses, completed):
+                record_analysis(analysis, results)
+            try:
+                db.session.commit()
+            except Exception:
+                db.session.rollback()
+                raise
+        
+        # Keep the full-resolution timelines next to the summaries
+        with stage('timeline.save'):
+            for analysis, (_, _, timeline) in zip(analyses, completed):
+                if timeline is not None:
+                    built = timeline.build()
+                    built.save(timeline_path(timeline_folder, analysis.id))
+                    embedding_index.add(analysis, built.tracks)
+        return analyses
+    
+    def generate():
+        completed = []
+        saving = False
+        try:
+            for name, reason in rejected:
+                yield ndjson({'file': name, 'status': 'rejected', 'error': reason})
+            
+            # One line per file, in the order they finish
+            failed = len(rejected)
+            for item, output, error in analyzer.map(items, analyze_batch_item):
+                if error is not None:
+                    failed += 1
+                    yield ndjson({'file': item['name'], 'type': item['type'], 'status': 'failed', 'error': error})
+                    continue
+                results, timeline = output
+                completed.append((item, results, timeline))
+                yield ndjson({'file': item['name'], 'type': item['type'], 'status': 'done', 'results': results})
+            
+            saving = True
+            try:
+                analyses = save(completed)
+            except Exception as e:
+                current_app.logger.exception('Failed to save batch of %d analyses', len(completed))
+                yield ndjson({'status': 'error', 'error': f'Could not save the analyses: {e}'})
+                return
+            
+            yield ndjson({
+                'status': 'complete',
+                'succeeded': len(completed),
+                'failed': failed,
+                'analyses': [{'file': item['name'], 'analysis_id': analysis.id} for analysis, (item, _, _) in zip(analyses, completed)]
+            })
+        finally:
+            # The client disconnected or the batch broke off: keep what was reported done
+            if not saving and completed:
+                try:
+                    save(completed)
+                except Exception:
+                    current_app.logger.exception('Failed to save interrupted batch of %d analyses', len(completed))
+            shutil.rmtree(folder, ignore_errors=True)
+    
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
+# Fields that can be requested from GET /v1/analyses with ?fields=
+ANALYSIS_FIELDS = {
+    'id': lambda a: a.id,
+    'type': lambda a: a.analysis_type,
+    'created_at': lambda a: a.created_at.isoformat(),
+    'is_shared': lambda a: a.is_shared,
+    'team_id': lambda a: a.team_id,
+    'file_path': lambda a: a.file_path,
+    'results': lambda a: loads(a.results) if a.results else None
+}
+DEFAULT_ANALYSIS_FIELDS = ['id', 'type', 'created_at', 'is_shared']
+ANALYSES_PAGE_SIZE = 50
+ANALYSES_MAX_PAGE_SIZE = 200
+
+def encode_cursor(analysis):
+    """Opaque keyset cursor pointing after the given analysis"""
+    raw = f"{analysis.created_at.isoformat()}|{analysis.id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+def decode_cursor(cursor):
+    created_at, analysis_id = base64.urlsafe_b64decode(cursor.encode()).decode().split('|')
+    return datetime.fromisoformat(created_at), int(analysis_id)
+
 @api.route('/v1/analyses', methods=['GET'])
 @login_required
 def get_analyses():
-    """Get user's analyses"""
-    analyses = Analysis.query.filter_by(user_id=current_user.id).order_by(Analysis.created_at.desc()).all()
+    """Get a page of the user's analyses, newest first"""
+    fields = request.args.get('fields')
+    fields = [f.strip() for f in fields.split(',') if f.strip()] if fields else DEFAULT_ANALYSIS_FIELDS
+    unknown = [f for f in fields if f not in ANALYSIS_FIELDS]
+    if unknown:
+        return jsonify({'error': f"Unknown fields: {', '.join(unknown)}"}), 400
     
-    results = []
-    for analysis in analyses:
-        results.append({
-            'id': analysis.id,
-            'type': analysis.analysis_type,
-            'created_at': analysis.created_at.isoformat(),
-            'is_shared': analysis.is_shared
-        })
+    limit = max(1, min(request.args.get('limit', ANALYSES_PAGE_SIZE, type=int), ANALYSES_MAX_PAGE_SIZE))
     
-    return jsonify({
+    query = Analysis.query.filter_by(user_id=current_user.id)
+    
+    # Keyset pagination on (created_at, id) served by ix_analysis_user_created
+    cursor = request.args.get('cursor')
+    if cursor:
+        try:
+            created_at, analysis_id = decode_cursor(cursor)
+        except (ValueError, UnicodeDecodeError):
+            return jsonify({'error': 'Invalid cursor'}), 400
+        query = query.filter(or_(
+            Analysis.created_at < created_at,
+            and_(Analysis.created_at == created_at, Analysis.id < analysis_id)
+        ))
+    
+    # The results column is large, only load it when it was asked for
+    if 'results' not in fields:
+        query = query.options(defer(Analysis.results))
+    
+    analyses = query.order_by(Analysis.created_at.desc(), Analysis.id.desc()).limit(limit + 1).all()
+    has_more = len(analyses) > limit
+    analyses = analyses[:limit]
+    
+    response = jsonify({
         'success': True,
-        'analyses': results
+        'analyses': [{field: ANALYSIS_FIELDS[field](analysis) for field in fields} for analysis in analyses],
+        'next_cursor': encode_cursor(analyses[-1]) if has_more else None
     })
+    
+    # Let polling clients revalidate with If-None-Match
+    response.add_etag()
+    return response.make_conditional(request)
 
 @api.route('/v1/analyses/<int:analysis_id>', methods=['GET'])
 @login_required
@@ -289,7 +589,7 @@ def get_analysis(analysis_id):
     analysis = Analysis.query.get_or_404(analysis_id)
     
     # Check if user has access to the analysis
-    if analysis.user_id != current_user.id and not (analysis.is_shared and TeamMember.query.filter_by(team_id=analysis.team_id, user_id=current_user.id).first()):
+    if not can_access_analysis(analysis):
         return jsonify({'error': 'Access denied'}), 403
     
     return jsonify({
@@ -298,44 +598,198 @@ def get_analysis(analysis_id):
             'id': analysis.id,
             'type': analysis.analysis_type,
             'created_at': analysis.created_at.isoformat(),
-            'results': json.loads(analysis.results),
+            'results': loads(analysis.results),
             'is_shared': analysis.is_shared
         }
     })
 
+@api.route('/v1/analyses/<int:analysis_id>/timeline', methods=['GET'])
+@login_required
+def get_analysis_timeline(analysis_id):
+    """Get a downsampled slice of an analysis' per-frame emotion timeline"""
+    analysis = Analysis.query.get_or_404(analysis_id)
+    
+    # Check if user has access to the analysis
+    if not can_access_analysis(analysis):
+        return jsonify({'error': 'Access denied'}), 403
+    
+    path = timeline_path(current_app.config['TIMELINE_FOLDER'], analysis.id)
+    if not EmotionTimeline.exists(path):
+        return jsonify({'error': 'No timeline stored for this analysis'}), 404
+    
+    start = request.args.get('start', 0, type=int)
+    end = request.args.get('end', None, type=int)
+    points = min(request.args.get('points', 100, type=int), 2000)
+    if start < 0 or (end is not None and end < 0) or points < 0:
+        return jsonify({'error': 'start, end and points must not be negative'}), 400
+    
+    timeline = EmotionTimeline.load(path)
+    sliced = timeline.downsample(start=start, end=end, points=points)
+    
+    return jsonify({
+        'success': True,
+        'frames': len(timeline),
+        'fps': timeline.fps,
+        'timestamps': sliced['timestamps'],
+        'face_counts': sliced['face_counts'],
+        'emotions': [
+            {'name': emotion, 'values': values.round(4).tolist()}
+            for emotion, values in zip(timeline.emotions, sliced['values'])
+        ]
+    })
+
+def load_analysis_tracks(analysis):
+    path = timeline_path(current_app.config['TIMELINE_FOLDER'], analysis.id)
+    return EmotionTimeline.load_tracks(path)
+
+@api.route('/v1/analyses/<int:analysis_id>/tracks', methods=['GET'])
+@login_required
+def get_analysis_tracks(analysis_id):
+    """List the face tracks of a video analysis"""
+    analysis = Analysis.query.get_or_404(analysis_id)
+    
+    # Check if user has access to the analysis
+    if not can_access_analysis(analysis):
+        return jsonify({'error': 'Access denied'}), 403
+    
+    tracks = load_analysis_tracks(analysis)
+    if tracks is None:
+        return jsonify({'error': 'No face tracks stored for this analysis'}), 404
+    
+    return jsonify({
+        'success': True,
+        'tracks': [
+            {
+                'track': i,
+                'start': float(tracks['start'][i]),
+                'end': float(tracks['end'][i]),
+                'frames': int(tracks['frames'][i]),
+                'dominant_emotion': fer_model.emotions[int(np.argmax(probs))],
+                'emotion_distribution': {emotion: float(p) for emotion, p in zip(fer_model.emotions, probs)}
+            }
+            for i, probs in enumerate(tracks['probs'])
+        ]
+    })
+
+@api.route('/v1/analyses/<int:analysis_id>/tracks/<int:track>/similar', methods=['GET'])
+@login_required
+def find_similar_tracks(analysis_id, track):
+    """Find face tracks across the user's or a team's analyses that resemble one track"""
+    analysis = Analysis.query.get_or_404(analysis_id)
+    
+    # Check if user has access to the analysis
+    if not can_access_analysis(analysis):
+        return jsonify({'error': 'Access denied'}), 403
+    
+    tracks = load_analysis_tracks(analysis)
+    if tracks is None or not 0 <= track < len(tracks['embeddings']):
+        return jsonify({'error': 'Track not found'}), 404
+    
+    # Search the user's own analyses or those shared with one of their teams
+    scope = request.args.get('scope', 'user')
+    if scope == 'user':
+        scope_key = ('user', current_user.id)
+    elif scope == 'team':
+        team_id = request.args.get('team_id', analysis.team_id, type=int)
+        if team_id is None or not is_team_member(team_id):
+            return jsonify({'error': 'Access denied'}), 403
+        scope_key = ('team', team_id)
+    else:
+        return jsonify({'error': "scope must be 'user' or 'team'"}), 400
+    k = max(1, min(request.args.get('k', 10, type=int), 100))
+    
+    with stage('similarity.search'):
+        matches = current_app.extensions['embedding_index'].search(scope_key, tracks['embeddings'][track], k=k, exclude=(analysis.id, track))
+    for match in matches:
+        match['dominant_emotion'] = fer_model.emotions[match.pop('dominant')]
+    
+    return jsonify({
+        'success': True,
+        'query': {'analysis_id': analysis.id, 'track': track},
+        'scope': scope,
+        'matches': matches
+    })
+
+def parse_rollup_args():
+    """Resolve scope, time range and bucket size for the rollup endpoints"""
+    bucket = request.args.get('bucket', 'day')
+    if bucket not in BUCKET_SIZES:
+        return None, (jsonify({'error': f"bucket must be one of {', '.join(BUCKET_SIZES)}"}), 400)
+    
+    try:
+        end = parse_utc(request.args['end']) if 'end' in request.args else datetime.utcnow()
+        start = parse_utc(request.args['start']) if 'start' in request.args else end - 30 * BUCKET_SIZES['day']
+    except ValueError:
+        return None, (jsonify({'error': 'start and end must be ISO 8601 timestamps'}), 400)
+    
+    if start > end:
+        return None, (jsonify({'error': 'start must be before end'}), 400)
+    
+    team_id = request.args.get('team_id', type=int)
+    if team_id is not None:
+        if not is_team_member(team_id):
+            return None, (jsonify({'error': 'Access denied'}), 403)
+        scope = ('team', team_id)
+    else:
+        scope = ('user', current_user.id)
+    
+    try:
+        labels, values = query_rollups(scope[0], scope[1], start, end, bucket)
+    except ValueError as e:
+        return None, (jsonify({'error': str(e)}), 400)
+    
+    return (labels, values), None
+
 @api.route('/v1/emotion-timeline', methods=['GET'])
 @login_required
 def get_emotion_timeline():
     """Get emotion timeline data for dashboard visualization"""
-    # This would typically fetch real data from the database
-    # For now, return sample data
+    rollups, error = parse_rollup_args()
+    if error:
+        return error
+    
+    labels, values = rollups
     return jsonify({
         'success': True,
-        'timestamps': ['00:00', '00:05', '00:10', '00:15', '00:20', '00:25', '00:30'],
-        'emotions': [
-            {'name': 'Happy', 'values': [0.2, 0.3, 0.5, 0.7, 0.6, 0.4, 0.3]},
-            {'name': 'Sad', 'values': [0.1, 0.2, 0.1, 0.0, 0.1, 0.2, 0.3]},
-            {'name': 'Angry', 'values': [0.3, 0.2, 0.1, 0.0, 0.0, 0.1, 0.1]},
-            {'name': 'Surprised', 'values': [0.1, 0.1, 0.2, 0.2, 0.1, 0.1, 0.0]},
-            {'name': 'Neutral', 'values': [0.3, 0.2, 0.1, 0.1, 0.2, 0.2, 0.3]}
-        ]
+        'timestamps': labels,
+        'emotions': [{'name': emotion, 'values': series} for emotion, series in values.items()]
     })
 
 @api.route('/v1/emotion-heatmap', methods=['GET'])
 @login_required
 def get_emotion_heatmap():
     """Get emotion heatmap data for dashboard visualization"""
-    # This would typically fetch real data from the database
-    # For now, return sample data
+    rollups, error = parse_rollup_args()
+    if error:
+        return error
+    
+    labels, values = rollups
     return jsonify({
         'success': True,
-        'emotions': ['Happy', 'Sad', 'Angry', 'Surprised', 'Neutral'],
-        'timeLabels': ['00:00', '00:05', '00:10', '00:15', '00:20', '00:25', '00:30'],
-        'values': [
-            [0.2, 0.3, 0.5, 0.7, 0.6, 0.4, 0.3],
-            [0.1, 0.2, 0.1, 0.0, 0.1, 0.2, 0.3],
-            [0.3, 0.2, 0.1, 0.0, 0.0, 0.1, 0.1],
-            [0.1, 0.1, 0.2, 0.2, 0.1, 0.1, 0.0],
-            [0.3, 0.2, 0.1, 0.1, 0.2, 0.2, 0.3]
-        ]
-    })
\ No newline at end of file
+        'emotions': list(values),
+        'timeLabels': labels,
+        'values': list(values.values())
+    })
+
+@api.route('/v1/admin/stream-metrics', methods=['GET'])
+@login_required
+def get_stream_metrics():
+    """Get per-session drop counts and latency of the real-time streams"""
+    if not is_admin_user():
+        return jsonify({'error': 'Access denied'}), 403
+    
+    scheduler = current_app.extensions.get('stream_scheduler')
+    if scheduler is None:
+        return jsonify({'error': 'Streaming is not enabled'}), 404
+    
+    return jsonify(dict(scheduler.metrics(), success=True))
+
+
+@api.route('/v1/admin/latency', methods=['GET'])
+@login_required
+def get_latency_metrics():
+    """Get p50/p95/p99 latency of every pipeline stage and endpoint"""
+    if not is_admin_user():
+        return jsonify({'error': 'Access denied'}), 403
+    
+    return jsonify({'success': True, 'series': metrics.snapshot()})
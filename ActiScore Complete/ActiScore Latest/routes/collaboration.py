@@ -1,8 +1,13 @@
-from flask import Blueprint, render_template, request, jsonify, redirect, url_for, flash
+from flask import Blueprint, render_template, request, jsonify, redirect, url_for, flash, current_app
 from flask_login import login_required, current_user
 from database.db import db, User, Analysis, Team, TeamMember, Annotation
 from flask_socketio import emit, join_room, leave_room
-import json
+from sqlalchemy.orm import defer, joinedload
+from utils.rollups import apply_analysis
+from utils.access import get_membership, is_team_member, is_team_admin, can_access_analysis
+from utils.realtime import disconnect_handlers
+from utils.serialization import loads
+from utils.annotations import RoomRegistry, AnnotationPipeline, annotation_payload, query_annotations, latest_annotation_id
 from datetime import datetime
 
 collaboration = Blueprint('collaboration', __name__)
@@ -54,15 +59,15 @@ def team_detail(team_id):
     team = Team.query.get_or_404(team_id)
     
     # Check if user is a member of the team
-    is_member = TeamMember.query.filter_by(team_id=team_id, user_id=current_user.id).first()
+    is_member = get_membership(team_id)
     if not is_member:
         flash('You are not a member of this team', 'danger')
         return redirect(url_for('collaboration.teams'))
     
-    team_members = TeamMember.query.filter_by(team_id=team_id).all()
+    # Load members together with their users in a single query
+    team_members = db.session.query(TeamMember, User).join(User, User.id == TeamMember.user_id).filter(TeamMember.team_id == team_id).all()
     members = []
-    for member in team_members:
-        user = User.query.get(member.user_id)
+    for member, user in team_members:
         members.append({
             'id': user.id,
             'username': user.username,
@@ -70,7 +75,8 @@ def team_detail(team_id):
             'joined_at': member.joined_at
         })
     
-    shared_analyses = Analysis.query.filter_by(team_id=team_id).all()
+    # The template shows each owner's username, so load owners eagerly
+    shared_analyses = Analysis.query.options(joinedload(Analysis.user), defer(Analysis.results)).filter_by(team_id=team_id).all()
     
     return render_template('team_detail.html', team=team, members=members, analyses=shared_analyses, is_admin=(is_member.role == 'admin'))
 
@@ -81,8 +87,7 @@ def invite_member(team_id):
     team = Team.query.get_or_404(team_id)
     
     # Check if user is an admin of the team
-    is_admin = TeamMember.query.filter_by(team_id=team_id, user_id=current_user.id, role='admin').first()
-    if not is_admin:
+    if not is_team_admin(team_id):
         flash('You do not have permission to invite members', 'danger')
         return redirect(url_for('collaboration.team_detail', team_id=team_id))
     
@@ -126,16 +131,30 @@ def share_analysis(analysis_id):
     team = Team.query.get_or_404(team_id)
     
     # Check if user is a member of the team
-    is_member = TeamMember.query.filter_by(team_id=team_id, user_id=current_user.id).first()
-    if not is_member:
+    if not is_team_member(team_id):
         flash('You are not a member of this team', 'danger')
         return redirect(url_for('dashboard'))
     
+    # Move the analysis' contribution to the new team's dashboard rollups
+    team_id = team.id
+    if analysis.team_id != team_id and analysis.results:
+        results = loads(analysis.results)
+        if analysis.team_id:
+            apply_analysis(analysis, results, scopes=[('team', analysis.team_id)], sign=-1)
+        apply_analysis(analysis, results, scopes=[('team', team_id)])
+    
     # Share analysis with team
+    previous_team_id = analysis.team_id
     analysis.is_shared = True
     analysis.team_id = team_id
     db.session.commit()
     
+    # The teams' similarity indexes reload with the new membership
+    embedding_index = current_app.extensions.get('embedding_index')
+    if embedding_index is not None:
+        for scope_id in {previous_team_id, team_id} - {None}:
+            embedding_index.invalidate(('team', scope_id))
+    
     flash('Analysis shared with team successfully', 'success')
     return redirect(url_for('dashboard'))
 
@@ -146,7 +165,7 @@ def add_annotation(analysis_id):
     analysis = Analysis.query.get_or_404(analysis_id)
     
     # Check if user has access to the analysis
-    if analysis.user_id != current_user.id and not (analysis.is_shared and TeamMember.query.filter_by(team_id=analysis.team_id, user_id=current_user.id).first()):
+    if not can_access_analysis(analysis):
         return jsonify({'error': 'Access denied'}), 403
     
     data = request.json
@@ -169,67 +188,91 @@ def add_annotation(analysis_id):
     db.session.add(annotation)
     db.session.commit()
     
-    # Get user info for response
-    user = User.query.get(current_user.id)
-    
-    return jsonify({
-        'id': annotation.id,
-        'content': annotation.content,
-        'timestamp': annotation.timestamp,
-        'x_position': annotation.x_position,
-        'y_position': annotation.y_position,
-        'created_at': annotation.created_at.isoformat(),
-        'user': {
-            'id': user.id,
-            'username': user.username
-        }
-    }), 201
+    return jsonify(annotation_payload(annotation, current_user.username)), 201
 
 @collaboration.route('/analysis/<int:analysis_id>/annotations')
 @login_required
 def get_annotations(analysis_id):
-    """Get all annotations for an analysis"""
+    """Get the annotations of an analysis, optionally only those after `since`"""
     analysis = Analysis.query.get_or_404(analysis_id)
     
     # Check if user has access to the analysis
-    if analysis.user_id != current_user.id and not (analysis.is_shared and TeamMember.query.filter_by(team_id=analysis.team_id, user_id=current_user.id).first()):
+    if not can_access_analysis(analysis):
         return jsonify({'error': 'Access denied'}), 403
     
-    annotations = Annotation.query.filter_by(analysis_id=analysis_id).all()
-    result = []
-    
-    for annotation in annotations:
-        user = User.query.get(annotation.user_id)
-        result.append({
-            'id': annotation.id,
-            'content': annotation.content,
-            'timestamp': annotation.timestamp,
-            'x_position': annotation.x_position,
-            'y_position': annotation.y_position,
-            'created_at': annotation.created_at.isoformat(),
-            'user': {
-                'id': user.id,
-                'username': user.username
-            }
-        })
+    # Clients pass this back as ?since= to fetch only newer annotations. It is
+    # the newest id regardless of the viewport, read before the query so an
+    # annotation added meanwhile is sent again rather than skipped.
+    resume_token = latest_annotation_id(analysis_id)
+    
+    try:
+        result = query_annotations(
+            analysis_id,
+            since=request.args.get('since'),
+            time_from=request.args.get('from', type=float),
+            time_to=request.args.get('to', type=float)
+        )
+    except ValueError:
+        return jsonify({'error': 'since must be an annotation id or an ISO 8601 timestamp'}), 400
     
-    return jsonify(result)
+    response = jsonify(result)
+    response.headers['X-Resume-Token'] = str(resume_token)
+    return response
 
 # Socket.IO event handlers for real-time collaboration
+rooms = RoomRegistry()
+
+def socket_analysis_id(data):
+    """The analysis_id of a socket message, or None after emitting an error"""
+    try:
+        return int((data or {}).get('analysis_id'))
+    except (TypeError, ValueError):
+        emit('error', {'error': 'analysis_id must be an integer'})
+        return None
+
+def annotation_error(data):
+    """Why a new_annotation message is invalid, or None"""
+    content = data.get('content')
+    if not isinstance(content, str) or not content:
+        return 'content must be a non-empty string'
+    for field in ('timestamp', 'x_position', 'y_position'):
+        value = data.get(field)
+        if value is not None and (isinstance(value, bool) or not isinstance(value, (int, float))):
+            return f'{field} must be a number'
+    return None
+
 def register_socketio_events(socketio):
+    pipeline = AnnotationPipeline(socketio)
+    
     @socketio.on('join_analysis_room')
     @login_required
     def handle_join_analysis_room(data):
-        analysis_id = data.get('analysis_id')
-        analysis = Analysis.query.get_or_404(analysis_id)
+        analysis_id = socket_analysis_id(data)
+        if analysis_id is None:
+            return False
+        analysis = Analysis.query.get(analysis_id)
         
         # Check if user has access to the analysis
-        if analysis.user_id != current_user.id and not (analysis.is_shared and TeamMember.query.filter_by(team_id=analysis.team_id, user_id=current_user.id).first()):
+        if analysis is None or not can_access_analysis(analysis):
             return False
         
         room = f"analysis_{analysis_id}"
         join_room(room)
+        rooms.join(request.sid, analysis_id, current_user.id, current_user.username)
+        
+        # Tell the newcomer who is already here
+        emit('room_users', {'users': rooms.members(analysis_id)})
         
+        # A reconnecting client sends the last annotation id it has seen
+        resume_token = data.get('resume_token')
+        if resume_token is not None and str(resume_token).isdigit():
+            missed = query_annotations(analysis_id, since=int(resume_token))
+            emit('annotations_sync', {
+                'annotations': missed,
+                'resume_token': missed[-1]['id'] if missed else int(resume_token)
+            })
+        else:
+            emit('annotations_sync', {'annotations': [], 'resume_token': latest_annotation_id(analysis_id)})
         emit('user_joined', {
             'user_id': current_user.id,
             'username': current_user.username
@@ -237,50 +280,37 @@ def register_socketio_events(socketio):
     
     @socketio.on('leave_analysis_room')
     def handle_leave_analysis_room(data):
-        analysis_id = data.get('analysis_id')
+        analysis_id = socket_analysis_id(data)
+        if analysis_id is None:
+            return False
         room = f"analysis_{analysis_id}"
         leave_room(room)
+        user = rooms.leave(request.sid, analysis_id)
         
-        emit('user_left', {
-            'user_id': current_user.id,
-            'username': current_user.username
-        }, room=room)
+        if user:
+            emit('user_left', user, room=room)
+    
+    def leave_all_rooms(sid):
+        for analysis_id, user in rooms.disconnect(sid):
+            if user:
+                emit('user_left', user, room=f"analysis_{analysis_id}")
+    
+    disconnect_handlers.append(leave_all_rooms)
     
     @socketio.on('new_annotation')
     def handle_new_annotation(data):
-        analysis_id = data.get('analysis_id')
-        content = data.get('content')
-        timestamp = data.get('timestamp')
-        x_position = data.get('x_position')
-        y_position = data.get('y_position')
-        
-        analysis = Analysis.query.get_or_404(analysis_id)
+        analysis_id = socket_analysis_id(data)
+        if analysis_id is None:
+            return False
         
-        # Check if user has access to the analysis
-        if analysis.user_id != current_user.id and not (analysis.is_shared and TeamMember.query.filter_by(team_id=analysis.team_id, user_id=current_user.id).first()):
+        # Access was checked when the socket joined the room
+        if not rooms.has_access(request.sid, analysis_id):
             return False
         
-        annotation = Annotation(
-            analysis_id=analysis_id,
-            user_id=current_user.id,
-            content=content,
-            timestamp=timestamp,
-            x_position=x_position,
-            y_position=y_position
-        )
-        db.session.add(annotation)
-        db.session.commit()
+        # Annotations are saved in batches, so reject bad values here
+        error = annotation_error(data)
+        if error:
+            emit('error', {'error': error})
+            return False
         
-        room = f"analysis_{analysis_id}"
-        emit('annotation_added', {
-            'id': annotation.id,
-            'content': annotation.content,
-            'timestamp': annotation.timestamp,
-            'x_position': annotation.x_position,
-            'y_position': annotation.y_position,
-            'created_at': annotation.created_at.isoformat(),
-            'user': {
-                'id': current_user.id,
-                'username': current_user.username
-            }
-        }, room=room)
\ No newline at end of file
+        pipeline.submit(analysis_id, current_user.id, current_user.username, data)
@@ -1,27 +1,48 @@
-from flask import Blueprint, render_template, request, jsonify, send_file
+from flask import Blueprint, render_template, request, jsonify, send_file, current_app, url_for, Response, stream_with_context
+from sqlalchemy.orm import defer
 from flask_login import login_required, current_user
 from database.db import db, Analysis, User
-import pandas as pd
-import matplotlib.pyplot as plt
-import seaborn as sns
-import io
-import base64
 from datetime import datetime
 import os
-from reportlab.lib.pagesizes import letter
-from reportlab.pdfgen import canvas
-from reportlab.lib import colors
-from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer, Image
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from reportlab.lib.units import inch
-import json
+import io
+import csv
+from utils.access import can_access_analysis
+from utils.report_jobs import report_cache_key
+from utils.report_model import REPORT_TEMPLATES, ReportEntry, ReportModel
+from utils.report_renderers import RENDERERS, EMOTION_COLUMNS, emotion_rows
+from utils.charts import CHART_TYPES
+from utils.serialization import loads
+from werkzeug.utils import secure_filename
 
 reports = Blueprint('reports', __name__)
 
+REPORT_FORMATS = {
+    'pdf': ('pdf', 'application/pdf'),
+    'excel': ('xlsx', 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'),
+    'ppt': ('pptx', 'application/vnd.openxmlformats-officedocument.presentationml.presentation')
+}
+
+def report_jobs():
+    return current_app.extensions['report_jobs']
+
+def iter_report_entries(analysis_ids, batch_size=50):
+    """Yield parsed analyses one at a time, fetching rows in small batches"""
+    query = Analysis.query.filter(Analysis.id.in_(analysis_ids)).order_by(Analysis.created_at, Analysis.id)
+    for analysis in query.yield_per(batch_size):
+        yield ReportEntry.from_analysis(analysis)
+
+def job_response(job, status_code=202):
+    payload = job.to_dict()
+    payload['status_url'] = url_for('reports.get_report_job', job_id=job.id)
+    if job.status == 'done':
+        payload['download_url'] = url_for('reports.download_report', job_id=job.id)
+        status_code = 200
+    return jsonify(payload), status_code
+
 @reports.route('/generate-report', methods=['POST'])
 @login_required
 def generate_report():
-    """Generate a report based on analysis data"""
+    """Start generating a report; poll status_url, then fetch download_url"""
     try:
         data = request.json
         report_type = data.get('type', 'pdf')
@@ -29,179 +50,126 @@ def generate_report():
         template = data.get('template', 'default')
         
         # Get analyses data
-        analyses = Analysis.query.filter(Analysis.id.in_(analysis_ids)).all()
+        analyses = [a for a in Analysis.query.options(defer(Analysis.results)).filter(Analysis.id.in_(analysis_ids)).order_by(Analysis.created_at).all() if can_access_analysis(a)]
         
         if not analyses:
             return jsonify({'error': 'No analyses found'}), 404
         
-        # Generate report based on type
-        if report_type == 'pdf':
-            return generate_pdf_report(analyses, template)
-        elif report_type == 'excel':
-            return generate_excel_report(analyses)
-        elif report_type == 'ppt':
-            return generate_ppt_report(analyses, template)
-        else:
+        if report_type == 'csv':
+            return generate_csv_report([a.id for a in analyses])
+        if report_type not in REPORT_FORMATS:
             return jsonify({'error': 'Unsupported report type'}), 400
+        if template not in REPORT_TEMPLATES:
+            return jsonify({'error': 'Unknown report template'}), 400
+        
+        # The worker runs outside this request and re-reads the rows itself
+        ids = [a.id for a in analyses]
+        username = current_user.username
+        app = current_app._get_current_object()
+        charts = current_app.extensions['charts']
+        renderer = RENDERERS[report_type]
+        
+        def render(out):
+            # Entries are streamed from the database on every pass
+            with app.app_context():
+                model = ReportModel(lambda: iter_report_entries(ids), template, username, charts)
+                renderer(model, out)
+        
+        extension, _ = REPORT_FORMATS[report_type]
+        key = report_cache_key(current_user.id, report_type, template, analyses)
+        download_name = f"actiscore_report_{datetime.now().strftime('%Y%m%d_%H%M%S')}.{extension}"
+        job = report_jobs().submit(current_user.id, key, extension, download_name, render)
+        
+        return job_response(job)
             
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
-def generate_pdf_report(analyses, template):
-    """Generate PDF report from analyses"""
-    buffer = io.BytesIO()
-    
-    # Create PDF document
-    doc = SimpleDocTemplate(buffer, pagesize=letter)
-    styles = getSampleStyleSheet()
-    elements = []
-    
-    # Add title
-    title_style = styles['Title']
-    elements.append(Paragraph("ActiScore Emotion Analysis Report", title_style))
-    elements.append(Spacer(1, 0.25*inch))
-    
-    # Add date
-    date_style = styles['Normal']
-    elements.append(Paragraph(f"Generated on: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}", date_style))
-    elements.append(Paragraph(f"User: {current_user.username}", date_style))
-    elements.append(Spacer(1, 0.25*inch))
-    
-    # Add summary
-    elements.append(Paragraph("Summary of Analyses", styles['Heading2']))
-    elements.append(Spacer(1, 0.1*inch))
-    
-    # Create summary table
-    summary_data = [['Date', 'Type', 'Duration', 'Dominant Emotion']]
-    for analysis in analyses:
-        results = json.loads(analysis.results)
-        summary_data.append([
-            analysis.created_at.strftime('%Y-%m-%d %H:%M'),
-            analysis.analysis_type,
-            f"{results.get('duration', 0):.1f} seconds",
-            results.get('dominant_emotion', 'Unknown')
-        ])
-    
-    summary_table = Table(summary_data, colWidths=[1.5*inch, 1*inch, 1*inch, 1.5*inch])
-    summary_table.setStyle(TableStyle([
-        ('BACKGROUND', (0, 0), (-1, 0), colors.blue),
-        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-        ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-        ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-        ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
-        ('GRID', (0, 0), (-1, -1), 1, colors.black)
-    ]))
-    elements.append(summary_table)
-    elements.append(Spacer(1, 0.25*inch))
-    
-    # Add detailed analysis for each item
-    elements.append(Paragraph("Detailed Analysis", styles['Heading2']))
-    elements.append(Spacer(1, 0.1*inch))
-    
-    for analysis in analyses:
-        results = json.loads(analysis.results)
-        elements.append(Paragraph(f"Analysis ID: {analysis.id}", styles['Heading3']))
-        elements.append(Paragraph(f"Date: {analysis.created_at.strftime('%Y-%m-%d %H:%M:%S')}", styles['Normal']))
-        elements.append(Paragraph(f"Type: {analysis.analysis_type}", styles['Normal']))
-        elements.append(Spacer(1, 0.1*inch))
-        
-        # Add emotion data
-        if 'emotions' in results:
-            emotions_data = [['Emotion', 'Confidence']]
-            for emotion, score in results['emotions'].items():
-                emotions_data.append([emotion, f"{score:.2f}"])
-            
-            emotions_table = Table(emotions_data, colWidths=[2*inch, 2*inch])
-            emotions_table.setStyle(TableStyle([
-                ('BACKGROUND', (0, 0), (-1, 0), colors.blue),
-                ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-                ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-                ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-                ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-                ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
-                ('GRID', (0, 0), (-1, -1), 1, colors.black)
-            ]))
-            elements.append(emotions_table)
-        
-        # Add chart if available
-        if 'chart_image' in results:
-            img_data = base64.b64decode(results['chart_image'])
-            img = Image(io.BytesIO(img_data), width=6*inch, height=3*inch)
-            elements.append(img)
-        
-        elements.append(Spacer(1, 0.25*inch))
-    
-    # Build PDF
-    doc.build(elements)
+@reports.route('/jobs/<job_id>', methods=['GET'])
+@login_required
+def get_report_job(job_id):
+    """Get the status of a report job"""
+    job = report_jobs().get(job_id)
+    if job is None or job.user_id != current_user.id:
+        return jsonify({'error': 'Report job not found'}), 404
     
-    # Prepare response
-    buffer.seek(0)
-    return send_file(
-        buffer,
-        as_attachment=True,
-        download_name=f"actiscore_report_{datetime.now().strftime('%Y%m%d_%H%M%S')}.pdf",
-        mimetype='application/pdf'
+    return job_response(job, 200)
+
+@reports.route('/download/<job_id>', methods=['GET'])
+@login_required
+def download_report(job_id):
+    """Download a finished report"""
+    job = report_jobs().get(job_id)
+    if job is None or job.user_id != current_user.id:
+        return jsonify({'error': 'Report job not found'}), 404
+    if job.status != 'done':
+        return jsonify({'error': 'Report is not ready'}), 409
+    
+    extension = os.path.splitext(job.path)[1].lstrip('.')
+    mimetype = next(m for ext, m in REPORT_FORMATS.values() if ext == extension)
+    try:
+        return send_file(job.path, as_attachment=True, download_name=job.download_name, mimetype=mimetype)
+    except FileNotFoundError:
+        # The cached artifact expired; generating the report again recreates it
+        return jsonify({'error': 'Report has expired, please generate it again'}), 404
+
+def generate_csv_report(analysis_ids):
+    """Stream a long-format CSV of all emotions straight to the response"""
+    def generate():
+        line = io.StringIO()
+        writer = csv.writer(line)
+        writer.writerow(EMOTION_COLUMNS)
+        for entry in iter_report_entries(analysis_ids):
+            for row in emotion_rows(entry):
+                row[1] = row[1].isoformat()
+                writer.writerow(row)
+            yield line.getvalue()
+            line.seek(0)
+            line.truncate()
+        yield line.getvalue()
+    
+    return Response(
+        stream_with_context(generate()),
+        mimetype='text/csv',
+        headers={'Content-Disposition': f"attachment; filename=actiscore_report_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv"}
     )
 
-def generate_excel_report(analyses):
-    """Generate Excel report from analyses"""
-    buffer = io.BytesIO()
-    
-    # Create Excel writer
-    writer = pd.ExcelWriter(buffer, engine='xlsxwriter')
-    
-    # Create summary sheet
-    summary_data = []
-    for analysis in analyses:
-        results = json.loads(analysis.results)
-        summary_data.append({
-            'ID': analysis.id,
-            'Date': analysis.created_at,
-            'Type': analysis.analysis_type,
-            'Duration': results.get('duration', 0),
-            'Dominant Emotion': results.get('dominant_emotion', 'Unknown')
-        })
-    
-    summary_df = pd.DataFrame(summary_data)
-    summary_df.to_excel(writer, sheet_name='Summary', index=False)
+@reports.route('/analysis/<int:analysis_id>/charts/<chart_type>', methods=['GET'])
+@login_required
+def get_analysis_chart(analysis_id, chart_type):
+    """Get the cache key and URL of a rendered chart for an analysis"""
+    if chart_type not in CHART_TYPES:
+        return jsonify({'error': 'Unknown chart type'}), 404
     
-    # Create detailed sheets for each analysis
-    for i, analysis in enumerate(analyses):
-        results = json.loads(analysis.results)
-        
-        if 'emotions' in results:
-            emotions_data = []
-            for emotion, score in results['emotions'].items():
-                emotions_data.append({
-                    'Emotion': emotion,
-                    'Confidence': score
-                })
-            
-            emotions_df = pd.DataFrame(emotions_data)
-            emotions_df.to_excel(writer, sheet_name=f'Analysis_{i+1}', index=False)
+    analysis = Analysis.query.get_or_404(analysis_id)
+    if not can_access_analysis(analysis):
+        return jsonify({'error': 'Access denied'}), 403
     
-    # Save Excel file
-    writer.save()
+    results = loads(analysis.results) if analysis.results else {}
+    key = current_app.extensions['charts'].render(analysis.id, chart_type, results)
+    if key is None:
+        return jsonify({'error': 'No data for this chart'}), 404
     
-    # Prepare response
-    buffer.seek(0)
-    return send_file(
-        buffer,
-        as_attachment=True,
-        download_name=f"actiscore_report_{datetime.now().strftime('%Y%m%d_%H%M%S')}.xlsx",
-        mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
-    )
+    return jsonify({'key': key, 'url': url_for('reports.get_chart', key=key)})
 
-def generate_ppt_report(analyses, template):
-    """Generate PowerPoint report from analyses"""
-    # This would use python-pptx library to create PowerPoint presentations
-    # For simplicity, we'll return a placeholder response
-    return jsonify({
-        'message': 'PowerPoint report generation is not implemented in this demo',
-        'analyses': [a.id for a in analyses],
-        'template': template
-    })
+@reports.route('/charts/<key>.png', methods=['GET'])
+@login_required
+def get_chart(key):
+    """Serve a cached chart PNG"""
+    charts = current_app.extensions['charts']
+    try:
+        analysis = Analysis.query.get_or_404(charts.analysis_id(key))
+    except ValueError:
+        return jsonify({'error': 'Chart not found'}), 404
+    if not can_access_analysis(analysis):
+        return jsonify({'error': 'Access denied'}), 403
+    
+    path = charts.path(secure_filename(key))
+    if not os.path.exists(path):
+        return jsonify({'error': 'Chart not found'}), 404
+    
+    # Keys change with the plotted data, so the image can be cached forever
+    return send_file(path, mimetype='image/png', max_age=31536000)
 
 @reports.route('/report-templates', methods=['GET'])
 @login_required
@@ -209,35 +177,14 @@ def get_report_templates():
     """Get available report templates"""
     templates = [
         {
-            'id': 'default',
-            'name': 'Default Template',
-            'description': 'Standard report with summary and detailed analysis',
-            'thumbnail': '/static/images/templates/default.png'
-        },
-        {
-            'id': 'executive',
-            'name': 'Executive Summary',
-            'description': 'Concise report focused on key metrics and insights',
-            'thumbnail': '/static/images/templates/executive.png'
-        },
-        {
-            'id': 'detailed',
-            'name': 'Detailed Analysis',
-            'description': 'Comprehensive report with in-depth analysis and visualizations',
-            'thumbnail': '/static/images/templates/detailed.png'
-        },
-        {
-            'id': 'comparison',
-            'name': 'Comparison Report',
-            'description': 'Side-by-side comparison of multiple analyses',
-            'thumbnail': '/static/images/templates/comparison.png'
-        },
-        {
-            'id': 'timeline',
-            'name': 'Timeline Report',
-            'description': 'Chronological analysis showing emotion changes over time',
-            'thumbnail': '/static/images/templates/timeline.png'
+            'id': template_id,
+            'name': layout['name'],
+            'description': layout['description'],
+            'sections': layout['sections'],
+            'formats': list(REPORT_FORMATS) + ['csv'],
+            'thumbnail': f'/static/images/templates/{template_id}.png'
         }
+        for template_id, layout in REPORT_TEMPLATES.items()
     ]
     
-    return jsonify(templates)
\ No newline at end of file
+    return jsonify(templates)
@@ -568,9 +568,21 @@ function initCollaboration() {
     const socket = io();
     const annotationMarkers = [];
     let currentUsers = [];
+    let resumeToken = null;
     
-    // Join analysis room
-    socket.emit('join_analysis_room', { analysis_id: analysisId });
+    // Join analysis room, and rejoin with a resume token after reconnects
+    // so the server only sends the annotations we missed
+    socket.on('connect', function() {
+        socket.emit('join_analysis_room', { analysis_id: analysisId, resume_token: resumeToken });
+    });
+    
+    // Handle annotations missed while disconnected
+    socket.on('annotations_sync', function(data) {
+        data.annotations.forEach(annotation => {
+            addAnnotationMarker(annotation);
+        });
+        resumeToken = Math.max(resumeToken || 0, data.resume_token);
+    });
     
     // Handle user joined event
     socket.on('user_joined', function(data) {
@@ -592,12 +604,21 @@ function initCollaboration() {
         showNotification(`${data.username} left the session`);
     });
     
-    // Handle new annotation event
-    socket.on('annotation_added', function(data) {
-        addAnnotationMarker(data);
-        
-        // Show notification
-        showNotification(`${data.user.username} added an annotation`);
+    // Handle users already present when we joined
+    socket.on('room_users', function(data) {
+        currentUsers = data.users.map(user => ({ user_id: user.user_id, username: user.username }));
+        updateActiveUsers();
+    });
+    
+    // Handle batched annotation events
+    socket.on('annotations_added', function(data) {
+        data.annotations.forEach(annotation => {
+            addAnnotationMarker(annotation);
+            resumeToken = Math.max(resumeToken || 0, annotation.id);
+            
+            // Show notification
+            showNotification(`${annotation.user.username} added an annotation`);
+        });
     });
     
     // Update active users display
@@ -684,6 +705,7 @@ function initCollaboration() {
         .then(annotations => {
             annotations.forEach(annotation => {
                 addAnnotationMarker(annotation);
+                resumeToken = Math.max(resumeToken || 0, annotation.id);
             });
         })
         .catch(error => console.error('Error loading annotations:', error));
@@ -745,23 +767,11 @@ function initCollaboration() {
                 y_position: y
             };
             
-            // Emit socket event
+            // Emit socket event; the server persists and broadcasts it
             socket.emit('new_annotation', data);
             
-            // Also save via API for persistence
-            fetch(`/collaboration/analysis/${analysisId}/annotate`, {
-                method: 'POST',
-                headers: {
-                    'Content-Type': 'application/json'
-                },
-                body: JSON.stringify(data)
-            })
-            .then(response => response.json())
-            .then(annotation => {
-                // Remove the form
-                form.remove();
-            })
-            .catch(error => console.error('Error saving annotation:', error));
+            // Remove the form
+            form.remove();
         });
     }
     
@@ -0,0 +1,125 @@
+"""Media store and retention tests.
+
+The S3 backend runs against moto's in-process stand-in for S3, so no
+bucket or credentials are needed. Run from the app directory with
+`python -m pytest`.
+"""
+import os
+import sys
+from datetime import datetime, timedelta
+
+import pytest
+from flask import Flask
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database.db import db, User, Analysis, MediaRef
+from utils.retention import RetentionSweeper
+from utils.storage import LocalMediaStore, S3MediaStore
+
+moto = pytest.importorskip('moto')
+boto3 = pytest.importorskip('boto3')
+
+BUCKET = 'media-bucket'
+
+
+@pytest.fixture
+def s3_store():
+    with moto.mock_aws():
+        client = boto3.client('s3', region_name='us-east-1')
+        client.create_bucket(Bucket=BUCKET)
+        yield S3MediaStore(BUCKET, client=client)
+
+
+@pytest.fixture(params=['local', 's3'])
+def store(request, tmp_path):
+    if request.param == 'local':
+        return LocalMediaStore(str(tmp_path / 'media'))
+    return request.getfixturevalue('s3_store')
+
+
+@pytest.fixture
+def app(tmp_path):
+    app = Flask(__name__)
+    app.config.update(
+        SQLALCHEMY_DATABASE_URI='sqlite://',
+        SQLALCHEMY_TRACK_MODIFICATIONS=False,
+        UPLOAD_FOLDER=str(tmp_path / 'uploads'),
+        TESTING=True
+    )
+    db.init_app(app)
+    with app.app_context():
+        db.create_all()
+        db.session.add(User(username='owner', email='owner@example.com', password='x'))
+        db.session.commit()
+        yield app
+        db.drop_all()
+
+
+def upload(tmp_path, name, data):
+    path = tmp_path / name
+    path.write_bytes(data)
+    return str(path)
+
+
+def add_analysis(created_at, *refs):
+    analysis = Analysis(user_id=1, analysis_type='video', results='{}', created_at=created_at)
+    analysis.attach_media(*refs)
+    db.session.add(analysis)
+    db.session.commit()
+    return analysis
+
+
+def test_s3_store_round_trip(s3_store, tmp_path):
+    path = upload(tmp_path, 'clip.MP4', b'video bytes')
+    ref = s3_store.put(path)
+
+    assert s3_store.owns(ref) and ref.endswith('.mp4')
+    assert not os.path.exists(path)
+    assert s3_store.exists(ref)
+    assert s3_store.modified(ref) is not None
+    with s3_store.local_path(ref) as local:
+        with open(local, 'rb') as f:
+            assert f.read() == b'video bytes'
+    assert not os.path.exists(local)
+
+    # Identical content is stored once
+    assert s3_store.put(upload(tmp_path, 'copy.mp4', b'video bytes')) == ref
+    assert len(s3_store.client.list_objects_v2(Bucket=BUCKET)['Contents']) == 1
+
+    s3_store.delete(ref)
+    assert not s3_store.exists(ref)
+    assert s3_store.modified(ref) is None
+
+
+def test_sweep_keeps_shared_blobs(app, store, tmp_path, monkeypatch):
+    old = datetime.utcnow() - timedelta(days=30)
+    # Treat every blob as stored long ago
+    monkeypatch.setattr(store, 'modified', lambda ref: old)
+    only_old = store.put(upload(tmp_path, 'old.mp4', b'only old'))
+    shared = store.put(upload(tmp_path, 'shared.mp4', b'shared'))
+    expired = add_analysis(old, only_old, shared)
+    recent = add_analysis(datetime.utcnow(), shared)
+
+    RetentionSweeper(app, store, retention_days=7).sweep()
+
+    assert not store.exists(only_old)
+    assert store.exists(shared)
+    assert expired.file_path is None and not expired.media
+    assert recent.file_path == shared
+    assert MediaRef.query.count() == 1
+
+
+def test_sweep_keeps_blob_reused_by_pending_upload(app, tmp_path):
+    store = LocalMediaStore(str(tmp_path / 'media'))
+    old = datetime.utcnow() - timedelta(days=30)
+    ref = store.put(upload(tmp_path, 'first.mp4', b'same'))
+    os.utime(store.path(ref), (old.timestamp(), old.timestamp()))
+    expired = add_analysis(old, ref)
+
+    # A new upload of the same content, its analysis not committed yet
+    assert store.put(upload(tmp_path, 'second.mp4', b'same')) == ref
+    RetentionSweeper(app, store, retention_days=0).sweep()
+
+    assert store.exists(ref)
+    assert expired.file_path == ref
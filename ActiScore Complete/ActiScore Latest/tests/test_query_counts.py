@@ -0,0 +1,149 @@
+"""Query-count regression tests for the collaboration views.
+
+Each view must run the same number of SQL statements however many team
+members, shared analyses or annotations there are, so an N+1 pattern
+coming back fails here. Run from the app directory with `python -m pytest`.
+"""
+import os
+import sys
+from contextlib import contextmanager
+
+import pytest
+from flask import Blueprint, Flask
+from flask_login import LoginManager, login_user
+from sqlalchemy import event
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database.db import db, User, Analysis, Team, TeamMember, Annotation
+from routes.collaboration import collaboration
+
+# Endpoints base.html and team_detail.html link to, outside this blueprint
+PAGE_ENDPOINTS = ['index', 'analyze', 'dashboard', 'login', 'logout', 'register']
+ANALYSIS_ENDPOINTS = ['facial_analysis', 'speech_analysis', 'fusion_analysis']
+
+
+def create_app():
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    app = Flask(__name__, template_folder=os.path.join(root, 'templates'), static_folder=os.path.join(root, 'static'))
+    app.config.update(SQLALCHEMY_DATABASE_URI='sqlite://', SQLALCHEMY_TRACK_MODIFICATIONS=False, SECRET_KEY='test', TESTING=True)
+    db.init_app(app)
+
+    login_manager = LoginManager(app)
+    login_manager.user_loader(lambda user_id: User.query.get(int(user_id)))
+
+    for endpoint in PAGE_ENDPOINTS:
+        app.add_url_rule(f'/{endpoint}', endpoint, lambda: '')
+    for endpoint in ANALYSIS_ENDPOINTS:
+        app.add_url_rule(f'/{endpoint}/<int:analysis_id>', endpoint, lambda analysis_id: '')
+    api = Blueprint('api', __name__)
+    api.add_url_rule('/docs', 'get_docs', lambda: '')
+    app.register_blueprint(api, url_prefix='/api')
+    app.register_blueprint(collaboration, url_prefix='/collaboration')
+
+    @app.route('/_login/<int:user_id>')
+    def test_login(user_id):
+        login_user(User.query.get(user_id))
+        return ''
+
+    return app
+
+
+@pytest.fixture
+def app():
+    # Requests run outside this context so each gets a fresh session, as in production
+    app = create_app()
+    with app.app_context():
+        db.create_all()
+    yield app
+    with app.app_context():
+        db.drop_all()
+
+
+@contextmanager
+def count_queries(engine):
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(engine, 'before_cursor_execute', before_cursor_execute)
+    try:
+        yield statements
+    finally:
+        event.remove(engine, 'before_cursor_execute', before_cursor_execute)
+
+
+def add_users(count, prefix):
+    users = [User(username=f'{prefix}{i}', email=f'{prefix}{i}@example.com', password='x') for i in range(count)]
+    db.session.add_all(users)
+    db.session.commit()
+    return users
+
+
+def team_with(members, analyses):
+    """A team of `members` users; they and as many former members each shared
+    `analyses` analyses with it. Returns (team id, first member id)"""
+    users = add_users(members, f'team{members}x{analyses}-')
+    # Owners who left the team are not loaded by the members query
+    former = add_users(members, f'former{members}x{analyses}-')
+    team = Team(name='Team', created_by=users[0].id)
+    db.session.add(team)
+    db.session.commit()
+    db.session.add_all(
+        TeamMember(team_id=team.id, user_id=user.id, role='admin' if i == 0 else 'member')
+        for i, user in enumerate(users)
+    )
+    db.session.add_all(
+        Analysis(user_id=user.id, analysis_type='FER', results='{}', is_shared=True, team_id=team.id)
+        for user in users + former for _ in range(analyses)
+    )
+    db.session.commit()
+    return team.id, users[0].id
+
+
+def analysis_with(annotations):
+    """An analysis annotated by `annotations` different users; returns (analysis id, owner id)"""
+    users = add_users(annotations + 1, f'notes{annotations}-')
+    analysis = Analysis(user_id=users[0].id, analysis_type='FER', results='{}')
+    db.session.add(analysis)
+    db.session.commit()
+    db.session.add_all(
+        Annotation(analysis_id=analysis.id, user_id=user.id, content=f'note {i}', timestamp=float(i))
+        for i, user in enumerate(users[1:])
+    )
+    db.session.commit()
+    return analysis.id, users[0].id
+
+
+def queries_for(app, user_id, url):
+    client = app.test_client()
+    client.get(f'/_login/{user_id}')
+    with app.app_context():
+        engine = db.engine
+    with count_queries(engine) as statements:
+        response = client.get(url)
+    assert response.status_code == 200
+    return len(statements)
+
+
+def test_team_detail_query_count_is_constant(app):
+    with app.app_context():
+        small_team, small_user = team_with(members=2, analyses=1)
+        large_team, large_user = team_with(members=12, analyses=5)
+
+    small = queries_for(app, small_user, f'/collaboration/team/{small_team}')
+    large = queries_for(app, large_user, f'/collaboration/team/{large_team}')
+
+    assert small == large
+
+
+def test_get_annotations_query_count_is_constant(app):
+    with app.app_context():
+        few, few_owner = analysis_with(annotations=2)
+        many, many_owner = analysis_with(annotations=30)
+
+    small = queries_for(app, few_owner, f'/collaboration/analysis/{few}/annotations')
+    large = queries_for(app, many_owner, f'/collaboration/analysis/{many}/annotations')
+
+    assert small == large
@@ -0,0 +1,51 @@
+from flask import g, current_app
+from flask_login import current_user
+
+from database.db import TeamMember
+
+_NOT_A_MEMBER = object()
+
+
+def get_membership(team_id, user_id=None):
+    """Return the user's TeamMember row for a team, or None.
+
+    Lookups are cached on flask.g, so repeated permission checks within one
+    request or Socket.IO event cost a single query per team.
+    """
+    if team_id is None:
+        return None
+    if user_id is None:
+        user_id = current_user.id
+
+    cache = g.setdefault('team_memberships', {})
+    key = (int(team_id), user_id)
+    if key not in cache:
+        member = TeamMember.query.filter_by(team_id=key[0], user_id=user_id).first()
+        cache[key] = member if member is not None else _NOT_A_MEMBER
+
+    member = cache[key]
+    return None if member is _NOT_A_MEMBER else member
+
+
+def is_team_member(team_id, user_id=None):
+    return get_membership(team_id, user_id) is not None
+
+
+def is_team_admin(team_id, user_id=None):
+    member = get_membership(team_id, user_id)
+    return member is not None and member.role == 'admin'
+
+
+def can_access_analysis(analysis, user_id=None):
+    """Owners can always access an analysis, team members once it is shared"""
+    if user_id is None:
+        user_id = current_user.id
+    if analysis.user_id == user_id:
+        return True
+    return bool(analysis.is_shared) and is_team_member(analysis.team_id, user_id)
+
+
+def is_admin_user(user=None):
+    """Operators are configured by email in ADMIN_EMAILS"""
+    user = user or current_user
+    return user.is_authenticated and user.email in current_app.config.get('ADMIN_EMAILS', [])
@@ -0,0 +1,197 @@
+import threading
+from datetime import datetime
+
+from flask import current_app
+
+from database.db import db, User, Annotation
+from utils.serialization import parse_utc
+
+
+def annotation_payload(annotation, username):
+    return {
+        'id': annotation.id,
+        'content': annotation.content,
+        'timestamp': annotation.timestamp,
+        'x_position': annotation.x_position,
+        'y_position': annotation.y_position,
+        'created_at': annotation.created_at.isoformat(),
+        'user': {
+            'id': annotation.user_id,
+            'username': username
+        }
+    }
+
+
+def parse_since(since):
+    """A since cursor is either an annotation id or an ISO 8601 timestamp"""
+    if since is None or since == '':
+        return None
+    if str(since).isdigit():
+        return int(since)
+    return parse_utc(since)
+
+
+def query_annotations(analysis_id, since=None, time_from=None, time_to=None):
+    """Annotations of an analysis ordered by id, optionally only a delta.
+
+    `since` limits the result to annotations created after an id or a
+    creation time; `time_from`/`time_to` restrict the annotation timestamp
+    to a viewport of the media.
+    """
+    query = db.session.query(Annotation, User.username).join(User, User.id == Annotation.user_id).filter(Annotation.analysis_id == analysis_id)
+
+    since = parse_since(since)
+    if isinstance(since, int):
+        query = query.filter(Annotation.id > since)
+    elif since is not None:
+        query = query.filter(Annotation.created_at > since)
+
+    if time_from is not None:
+        query = query.filter(Annotation.timestamp >= time_from)
+    if time_to is not None:
+        query = query.filter(Annotation.timestamp <= time_to)
+
+    return [annotation_payload(annotation, username) for annotation, username in query.order_by(Annotation.id)]
+
+
+def latest_annotation_id(analysis_id):
+    """Resume token for a room: the newest annotation id, or 0"""
+    return db.session.query(db.func.max(Annotation.id)).filter(Annotation.analysis_id == analysis_id).scalar() or 0
+
+
+class RoomRegistry:
+    """In-memory presence and access cache for analysis rooms.
+
+    Access is checked against the database once, when a socket joins a room;
+    later events from that socket only consult this registry.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._rooms = {}  # analysis_id -> {sid: user}
+        self._sessions = {}  # sid -> set of analysis_ids
+
+    def join(self, sid, analysis_id, user_id, username):
+        with self._lock:
+            self._rooms.setdefault(analysis_id, {})[sid] = {'user_id': user_id, 'username': username}
+            self._sessions.setdefault(sid, set()).add(analysis_id)
+
+    def leave(self, sid, analysis_id):
+        with self._lock:
+            user = self._rooms.get(analysis_id, {}).pop(sid, None)
+            if analysis_id in self._rooms and not self._rooms[analysis_id]:
+                del self._rooms[analysis_id]
+            self._sessions.get(sid, set()).discard(analysis_id)
+            return user
+
+    def disconnect(self, sid):
+        """Drop a socket from every room, returning (analysis_id, user) pairs"""
+        with self._lock:
+            analysis_ids = self._sessions.pop(sid, set())
+        return [(analysis_id, self.leave(sid, analysis_id)) for analysis_id in analysis_ids]
+
+    def has_access(self, sid, analysis_id):
+        with self._lock:
+            return analysis_id in self._sessions.get(sid, ())
+
+    def members(self, analysis_id):
+        """Distinct users present in a room (a user may have several tabs open)"""
+        with self._lock:
+            users = {user['user_id']: user for user in self._rooms.get(analysis_id, {}).values()}
+        return list(users.values())
+
+
+class AnnotationPipeline:
+    """Coalesces annotation writes and broadcasts.
+
+    Annotations submitted within `window` seconds are inserted in a single
+    transaction and broadcast to each room as one `annotations_added`
+    message.
+    """
+
+    def __init__(self, socketio, window=0.05):
+        self.socketio = socketio
+        self.window = window
+        self.app = None
+        self._lock = threading.Lock()
+        self._pending = []
+        self._running = False
+
+    def submit(self, analysis_id, user_id, username, data):
+        with self._lock:
+            self._pending.append((analysis_id, user_id, username, data, datetime.utcnow()))
+            start = not self._running
+            self._running = True
+
+        if start:
+            self.app = current_app._get_current_object()
+            self.socketio.start_background_task(self._run)
+
+    def _run(self):
+        try:
+            while True:
+                self.socketio.sleep(self.window)
+                with self._lock:
+                    batch, self._pending = self._pending, []
+                    if not batch:
+                        self._running = False
+                        return
+                # A failed batch is logged and dropped; later ones still go through
+                try:
+                    self.flush(batch)
+                except Exception:
+                    self.app.logger.exception('Failed to flush %d annotations', len(batch))
+        except BaseException:
+            # Let the next submit start a new task
+            with self._lock:
+                self._running = False
+            raise
+
+    def flush(self, batch):
+        with self.app.app_context():
+            try:
+                rooms = self._save(batch)
+            except Exception:
+                db.session.rollback()
+                self.app.logger.exception('Failed to save %d annotations, retrying one by one', len(batch))
+                # One bad row must not drop the others
+                rooms = {}
+                for item in batch:
+                    try:
+                        saved = self._save([item])
+                    except Exception:
+                        db.session.rollback()
+                        self.app.logger.exception('Failed to save annotation for analysis %s', item[0])
+                        continue
+                    for analysis_id, payloads in saved.items():
+                        rooms.setdefault(analysis_id, []).extend(payloads)
+
+        for analysis_id, payloads in rooms.items():
+            self.socketio.emit('annotations_added', {
+                'analysis_id': analysis_id,
+                'annotations': payloads
+            }, room=f"analysis_{analysis_id}")
+
+    def _save(self, batch):
+        """Insert a batch in one transaction; returns the payloads by analysis id"""
+        annotations = []
+        for analysis_id, user_id, username, data, created_at in batch:
+            annotation = Annotation(
+                analysis_id=analysis_id,
+                user_id=user_id,
+                content=data.get('content'),
+                timestamp=data.get('timestamp'),
+                x_position=data.get('x_position'),
+                y_position=data.get('y_position'),
+                created_at=created_at
+            )
+            annotations.append((annotation, username))
+
+        db.session.add_all([annotation for annotation, _ in annotations])
+        # Flush assigns ids; build payloads before commit expires the rows
+        db.session.flush()
+        rooms = {}
+        for annotation, username in annotations:
+            rooms.setdefault(annotation.analysis_id, []).append(annotation_payload(annotation, username))
+        db.session.commit()
+        return rooms
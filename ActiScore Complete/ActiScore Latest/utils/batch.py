@@ -0,0 +1,179 @@
+import os
+import threading
+import zipfile
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import numpy as np
+from werkzeug.utils import secure_filename
+
+VIDEO_EXTENSIONS = {'.mp4', '.avi', '.mov', '.mkv', '.webm'}
+AUDIO_EXTENSIONS = {'.wav', '.mp3', '.ogg', '.flac', '.m4a'}
+ARCHIVE_EXTENSIONS = {'.zip'}
+
+
+class _Request:
+    __slots__ = ('inputs', 'output', 'error', 'lead', 'done')
+
+    def __init__(self, inputs):
+        self.inputs = inputs
+        self.output = None
+        self.error = None
+        self.lead = False
+        self.done = threading.Event()
+
+
+class MicroBatcher:
+    """Coalesces concurrent model calls into one batched call.
+
+    The first caller to find the model idle runs it for every request queued
+    so far. Callers arriving meanwhile wait, and one of them runs the next
+    round for everything queued by then. An idle model adds no latency; a
+    busy one gets larger batches instead of a queue of single-item calls.
+    """
+
+    def __init__(self, fn, max_batch=256):
+        self.fn = fn
+        self.max_batch = max_batch
+        self._lock = threading.Lock()
+        self._pending = []
+        self._running = False
+
+    def __call__(self, inputs):
+        request = _Request(inputs)
+        with self._lock:
+            self._pending.append(request)
+            lead = not self._running
+            self._running = True
+
+        # A leader's own request is always the first one it takes
+        if lead:
+            self._run_rounds()
+        else:
+            request.done.wait()
+            if request.lead:
+                self._run_rounds()
+
+        if request.error is not None:
+            raise request.error
+        return request.output
+
+    def _run_rounds(self):
+        with self._lock:
+            batch = self._take()
+        self._run(batch)
+
+        with self._lock:
+            if not self._pending:
+                self._running = False
+                return
+            # Hand the next round to a waiting caller
+            successor = self._pending[0]
+        successor.lead = True
+        successor.done.set()
+
+    def _take(self):
+        batch, rows = [], 0
+        while self._pending and (not batch or rows + len(self._pending[0].inputs) <= self.max_batch):
+            request = self._pending.pop(0)
+            batch.append(request)
+            rows += len(request.inputs)
+        return batch
+
+    def _run(self, batch):
+        try:
+            inputs = batch[0].inputs if len(batch) == 1 else np.concatenate([r.inputs for r in batch])
+            outputs = np.asarray(self.fn(inputs))
+        except Exception as e:
+            for request in batch:
+                request.error = e
+                request.done.set()
+            return
+
+        offset = 0
+        for request in batch:
+            request.output = outputs[offset:offset + len(request.inputs)]
+            offset += len(request.inputs)
+            request.lead = False
+            request.done.set()
+
+
+def media_type(filename):
+    extension = os.path.splitext(filename)[1].lower()
+    if extension in VIDEO_EXTENSIONS:
+        return 'video'
+    if extension in AUDIO_EXTENSIONS:
+        return 'audio'
+    return None
+
+
+def collect_batch_files(files, folder, max_files=50, max_archive_bytes=512 * 1024 * 1024):
+    """Save uploaded media and the contents of uploaded .zip archives.
+
+    Returns (items, rejected): items are dicts with the client-visible name,
+    the saved path and the media type; rejected are (name, reason) pairs.
+    """
+    os.makedirs(folder, exist_ok=True)
+    items, rejected = [], []
+
+    def add(name, save):
+        if len(items) >= max_files:
+            rejected.append((name, f'Batch is limited to {max_files} files'))
+            return
+        kind = media_type(name)
+        if kind is None:
+            rejected.append((name, 'Unsupported file type'))
+            return
+        path = os.path.join(folder, f'{len(items)}_{secure_filename(os.path.basename(name)) or "upload"}')
+        save(path)
+        items.append({'name': name, 'path': path, 'type': kind})
+
+    for upload in files:
+        if not upload.filename:
+            continue
+        if os.path.splitext(upload.filename)[1].lower() not in ARCHIVE_EXTENSIONS:
+            add(upload.filename, upload.save)
+            continue
+
+        try:
+            archive = zipfile.ZipFile(upload.stream)
+        except zipfile.BadZipFile:
+            rejected.append((upload.filename, 'Not a valid zip archive'))
+            continue
+        with archive:
+            members = [m for m in archive.infolist() if not m.is_dir()]
+            # Checked before extracting anything, against zip bombs
+            if sum(m.file_size for m in members) > max_archive_bytes:
+                rejected.append((upload.filename, 'Archive is too large once extracted'))
+                continue
+            for member in members:
+                def save(path, member=member):
+                    with archive.open(member) as source, open(path, 'wb') as target:
+                        while True:
+                            chunk = source.read(1024 * 1024)
+                            if not chunk:
+                                break
+                            target.write(chunk)
+                add(f'{upload.filename}/{member.filename}', save)
+
+    return items, rejected
+
+
+class BatchAnalyzer:
+    """Worker pool that analyzes the files of batch requests.
+
+    Files of all batches share the pool, and the models' MicroBatcher merges
+    the inference calls of concurrently running files.
+    """
+
+    def __init__(self, max_workers=4):
+        self._executor = ThreadPoolExecutor(max_workers=max_workers)
+
+    def map(self, items, analyze):
+        """Yield (item, results, error) for each item as soon as it finishes"""
+        futures = {self._executor.submit(analyze, item): item for item in items}
+        for future in as_completed(futures):
+            item = futures[future]
+            try:
+                yield item, future.result(), None
+            except Exception as e:
+                yield item, None, str(e)
@@ -0,0 +1,124 @@
+import hashlib
+import json
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from utils.timeline import EmotionTimeline, timeline_path
+
+CHART_TYPES = ('distribution', 'timeline')
+
+
+def _figure(width=8, height=4):
+    # The object-oriented API with the Agg canvas needs no pyplot global
+    # state, so charts can be rendered from several worker threads
+    from matplotlib.figure import Figure
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    figure = Figure(figsize=(width, height), dpi=100)
+    FigureCanvasAgg(figure)
+    return figure
+
+
+def render_distribution(data, path):
+    figure = _figure()
+    ax = figure.add_subplot(111)
+    emotions = list(data['emotions'])
+    ax.bar(emotions, [data['emotions'][e] for e in emotions], color='#4e73df')
+    ax.set_ylim(0, 1)
+    ax.set_ylabel('Confidence')
+    ax.set_title('Emotion distribution')
+    figure.tight_layout()
+    figure.savefig(path, format='png')
+
+
+def render_timeline(data, path):
+    figure = _figure(10, 4)
+    ax = figure.add_subplot(111)
+    for emotion, values in data['series'].items():
+        ax.plot(data['timestamps'], values, label=emotion, linewidth=1.2)
+    ax.set_ylim(0, 1)
+    ax.set_xlabel('Seconds')
+    ax.set_ylabel('Probability')
+    ax.set_title('Emotions over time')
+    ax.legend(loc='upper right', fontsize='small', ncol=4)
+    figure.tight_layout()
+    figure.savefig(path, format='png')
+
+
+RENDERERS = {
+    'distribution': render_distribution,
+    'timeline': render_timeline
+}
+
+
+class ChartService:
+    """Renders analysis charts to PNG on demand and caches them on disk.
+
+    Charts are addressed by a key built from the analysis id, the chart type
+    and a hash of the plotted data, so a cached PNG is reused until the
+    underlying data changes. Reports and dashboards reference charts by key
+    instead of carrying base64 images inside Analysis.results.
+    """
+
+    def __init__(self, folder, timeline_folder=None, max_workers=2):
+        self.folder = folder
+        self.timeline_folder = timeline_folder
+        os.makedirs(folder, exist_ok=True)
+        self._executor = ThreadPoolExecutor(max_workers=max_workers)
+        self._lock = threading.Lock()
+        self._inflight = {}
+
+    def chart_data(self, analysis_id, chart_type, results):
+        """The data a chart plots, or None if the analysis has nothing to show"""
+        if chart_type == 'distribution':
+            emotions = results.get('emotions') or results.get('emotion_distribution')
+            return {'emotions': emotions} if emotions else None
+
+        if chart_type == 'timeline' and self.timeline_folder:
+            path = timeline_path(self.timeline_folder, analysis_id)
+            if not EmotionTimeline.exists(path):
+                return None
+            timeline = EmotionTimeline.load(path)
+            sliced = timeline.downsample(points=200)
+            return {
+                'timestamps': [round(t, 3) for t in sliced['timestamps']],
+                'series': {e: v.round(4).tolist() for e, v in zip(timeline.emotions, sliced['values'])}
+            }
+        return None
+
+    def key(self, analysis_id, chart_type, data):
+        digest = hashlib.sha256(json.dumps(data, sort_keys=True).encode()).hexdigest()[:16]
+        return f'{analysis_id}-{chart_type}-{digest}'
+
+    def path(self, key):
+        return os.path.join(self.folder, f'{key}.png')
+
+    def render(self, analysis_id, chart_type, results):
+        """Return the cache key of the chart, rendering it if needed"""
+        data = self.chart_data(analysis_id, chart_type, results)
+        if data is None:
+            return None
+
+        key = self.key(analysis_id, chart_type, data)
+        if os.path.exists(self.path(key)):
+            return key
+
+        with self._lock:
+            future = self._inflight.get(key)
+            if future is None:
+                future = self._inflight[key] = self._executor.submit(self._render, chart_type, data, key)
+        try:
+            future.result()
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+        return key
+
+    def _render(self, chart_type, data, key):
+        tmp_path = self.path(key) + '.part'
+        RENDERERS[chart_type](data, tmp_path)
+        os.replace(tmp_path, self.path(key))
+
+    @staticmethod
+    def analysis_id(key):
+        return int(key.split('-', 1)[0])
@@ -0,0 +1,228 @@
+import threading
+from collections import OrderedDict
+from datetime import datetime, timedelta
+
+import numpy as np
+
+from database.db import db, Analysis
+from utils.timeline import EmotionTimeline, timeline_path
+
+try:
+    import faiss
+except ImportError:  # exact search with NumPy instead
+    faiss = None
+
+# Analysis types whose timelines carry face tracks
+TRACKED_TYPES = ('video', 'fusion')
+
+# An analysis whose timeline is not saved yet is retried for this long
+# before the index gives up on it
+PENDING_TIMELINE = timedelta(minutes=5)
+
+
+def analysis_scopes(analysis):
+    """Index scopes an analysis belongs to: its owner and, once shared, its team"""
+    scopes = [('user', analysis.user_id)]
+    if analysis.is_shared and analysis.team_id:
+        scopes.append(('team', analysis.team_id))
+    return scopes
+
+
+class _ScopeIndex:
+    """Track embeddings of every analysis in one scope, searched by cosine similarity"""
+
+    def __init__(self, dim=None):
+        self.dim = dim
+        self.vectors = None
+        self.analysis_id = np.empty(0, dtype=np.int64)
+        self.track = np.empty(0, dtype=np.int32)
+        self.start = np.empty(0, dtype=np.float64)
+        self.end = np.empty(0, dtype=np.float64)
+        self.dominant = np.empty(0, dtype=np.int32)
+        self.faiss_index = None
+        # Analyses indexed so far, and the newest one loaded from the database
+        self.ids = set()
+        self.max_id = 0
+
+    def __len__(self):
+        return len(self.analysis_id)
+
+    def contains(self, analysis_id):
+        return analysis_id in self.ids
+
+    def stamp(self):
+        """(count, newest id) of the indexed analyses"""
+        return len(self.ids), max(self.ids, default=0)
+
+    def add(self, entries):
+        """Append the tracks of (analysis_id, tracks) pairs in one step"""
+        self.ids.update(a for a, _ in entries)
+        entries = [(a, t) for a, t in entries if t is not None and len(t['embeddings'])]
+        if not entries:
+            return
+        if self.dim is None:
+            self.dim = entries[0][1]['embeddings'].shape[1]
+            self.vectors = np.empty((0, self.dim), dtype=np.float32)
+        # Tracks from a model with another embedding size cannot be compared
+        entries = [(a, t) for a, t in entries if t['embeddings'].shape[1] == self.dim]
+        if not entries:
+            return
+
+        vectors = np.concatenate([t['embeddings'] for _, t in entries]).astype(np.float32)
+        self.vectors = np.concatenate([self.vectors, vectors])
+        self.analysis_id = np.concatenate([self.analysis_id] + [np.full(len(t['embeddings']), a, dtype=np.int64) for a, t in entries])
+        self.track = np.concatenate([self.track] + [np.arange(len(t['embeddings']), dtype=np.int32) for _, t in entries])
+        self.start = np.concatenate([self.start] + [t['start'] for _, t in entries])
+        self.end = np.concatenate([self.end] + [t['end'] for _, t in entries])
+        self.dominant = np.concatenate([self.dominant] + [np.argmax(t['probs'], axis=1).astype(np.int32) for _, t in entries])
+        if faiss is not None:
+            if self.faiss_index is None:
+                self.faiss_index = faiss.IndexFlatIP(self.dim)
+            self.faiss_index.add(vectors)
+
+    def search(self, vector, k):
+        """Row indices and scores of the k most similar tracks"""
+        if not len(self):
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+        k = min(k, len(self))
+        if self.faiss_index is not None:
+            scores, rows = self.faiss_index.search(vector[None, :], k)
+            return rows[0], scores[0]
+        # Embeddings are L2-normalized, so the dot product is the cosine
+        scores = self.vectors @ vector
+        rows = np.argpartition(-scores, k - 1)[:k]
+        rows = rows[np.argsort(-scores[rows])]
+        return rows, scores[rows]
+
+
+class EmbeddingIndex:
+    """In-memory similarity index of face tracks, one per user or team.
+
+    A scope is loaded from the saved timelines the first time it is
+    searched. Before each search, the count and newest id of the scope's
+    analyses are compared with what was loaded: analyses saved since, by
+    any worker, are appended, and anything else (sharing changes,
+    deletions) reloads the scope. At most `max_scopes` scopes stay in
+    memory, least recently used first out.
+    """
+
+    def __init__(self, timeline_folder, max_scopes=64):
+        self.timeline_folder = timeline_folder
+        self.max_scopes = max_scopes
+        self._lock = threading.Lock()
+        self._scopes = OrderedDict()
+
+    def _query(self, scope):
+        kind, scope_id = scope
+        query = Analysis.query.filter(Analysis.analysis_type.in_(TRACKED_TYPES))
+        if kind == 'user':
+            return query.filter(Analysis.user_id == scope_id)
+        return query.filter(Analysis.team_id == scope_id, Analysis.is_shared.is_(True))
+
+    def _stamp(self, scope):
+        """(count, newest id) of the scope's analyses"""
+        count, max_id = self._query(scope).with_entities(db.func.count(Analysis.id), db.func.max(Analysis.id)).one()
+        return count, max_id or 0
+
+    def _load_new(self, scope, index):
+        """Append analyses newer than the index; False if one is still being saved"""
+        rows = self._query(scope).with_entities(Analysis.id, Analysis.created_at).filter(
+            Analysis.id > index.max_id
+        ).order_by(Analysis.id).all()
+
+        entries = []
+        covered = index.max_id
+        complete = True
+        for analysis_id, created_at in rows:
+            path = timeline_path(self.timeline_folder, analysis_id)
+            if not EmotionTimeline.exists(path) and created_at and datetime.utcnow() - created_at < PENDING_TIMELINE:
+                # Committed by another worker that has not saved the timeline yet
+                complete = False
+                break
+            entries.append((analysis_id, EmotionTimeline.load_tracks(path)))
+            covered = analysis_id
+
+        with self._lock:
+            # Another request or add() may have indexed them meanwhile
+            index.add([(a, t) for a, t in entries if not index.contains(a)])
+            index.max_id = max(index.max_id, covered)
+        return complete
+
+    def _load(self, scope):
+        index = _ScopeIndex()
+        self._load_new(scope, index)
+        return index
+
+    def scope(self, scope):
+        with self._lock:
+            index = self._scopes.get(scope)
+            if index is not None:
+                self._scopes.move_to_end(scope)
+
+        if index is not None:
+            stamp = self._stamp(scope)
+            if stamp == index.stamp():
+                return index
+            complete = True
+            if stamp[1] > index.max_id:
+                complete = self._load_new(scope, index)
+            if not complete or stamp == index.stamp():
+                return index
+            # Analyses were shared, unshared or deleted: start over
+            self.invalidate(scope)
+
+        index = self._load(scope)
+        with self._lock:
+            # Another request may have loaded it meanwhile
+            index = self._scopes.setdefault(scope, index)
+            self._scopes.move_to_end(scope)
+            while len(self._scopes) > self.max_scopes:
+                self._scopes.popitem(last=False)
+        return index
+
+    def add(self, analysis, tracks):
+        """Add a completed analysis' tracks to the scopes already in memory.
+
+        Only this process sees them right away; other workers pick the
+        analysis up on their next search of the scope.
+        """
+        if tracks is None:
+            return
+        with self._lock:
+            for scope in analysis_scopes(analysis):
+                index = self._scopes.get(scope)
+                # A scope loaded after the tracks were saved already has them
+                if index is not None and not index.contains(analysis.id):
+                    index.add([(analysis.id, tracks)])
+
+    def invalidate(self, scope):
+        """Drop a scope so its next search reloads it, e.g. after sharing changes"""
+        with self._lock:
+            self._scopes.pop(scope, None)
+
+    def search(self, scope, vector, k=10, exclude=None):
+        """The k tracks of `scope` most similar to `vector`.
+
+        Returns dicts with analysis_id, track, start, end (seconds),
+        the dominant emotion index and the cosine score. `exclude` is an
+        (analysis_id, track) pair left out of the results, usually the query.
+        """
+        index = self.scope(scope)
+        vector = np.asarray(vector, dtype=np.float32)
+        vector = vector / max(float(np.linalg.norm(vector)), 1e-12)
+        with self._lock:
+            rows, scores = index.search(vector, k + 1 if exclude else k)
+            matches = [
+                {
+                    'analysis_id': int(index.analysis_id[row]),
+                    'track': int(index.track[row]),
+                    'start': float(index.start[row]),
+                    'end': float(index.end[row]),
+                    'dominant': int(index.dominant[row]),
+                    'score': float(score)
+                }
+                for row, score in zip(rows, scores) if row >= 0
+            ]
+        if exclude:
+            matches = [m for m in matches if (m['analysis_id'], m['track']) != tuple(exclude)]
+        return matches[:k]
@@ -0,0 +1,189 @@
+import contextvars
+import hmac
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+import numpy as np
+from flask import current_app, g, request
+
+from utils.access import is_admin_user
+from utils.serialization import dumps_payload
+
+QUANTILES = (0.5, 0.95, 0.99)
+
+# Stage timings of the current request, or None when not requested
+_trace = contextvars.ContextVar('actiscore_trace', default=None)
+
+
+class LatencyHistogram:
+    """Running count and sum plus a window of recent samples for quantiles"""
+
+    def __init__(self, window=2048):
+        self.count = 0
+        self.sum = 0.0
+        self.samples = deque(maxlen=window)
+
+    def observe(self, seconds):
+        self.count += 1
+        self.sum += seconds
+        self.samples.append(seconds)
+
+    def quantiles(self):
+        if not self.samples:
+            return {q: 0.0 for q in QUANTILES}
+        values = np.percentile(np.fromiter(self.samples, dtype=np.float64), [q * 100 for q in QUANTILES])
+        return dict(zip(QUANTILES, values.tolist()))
+
+
+class MetricsRegistry:
+    """Process-wide latency histograms keyed by metric name and labels.
+
+    Quantiles are computed over the most recent `window` samples of each
+    series; counts and sums cover the whole process lifetime, as Prometheus
+    summaries expect.
+    """
+
+    def __init__(self, window=2048):
+        self.window = window
+        self._lock = threading.Lock()
+        self._series = {}
+        self._help = {}
+
+    def describe(self, name, text):
+        self._help[name] = text
+
+    def observe(self, name, seconds, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            histogram = self._series.get(key)
+            if histogram is None:
+                histogram = self._series[key] = LatencyHistogram(self.window)
+            histogram.observe(seconds)
+
+    def snapshot(self):
+        """Latency summary per series, in milliseconds"""
+        with self._lock:
+            series = [(name, labels, h.count, h.sum, h.quantiles()) for (name, labels), h in self._series.items()]
+        return [
+            {
+                'metric': name,
+                'labels': dict(labels),
+                'count': count,
+                'mean_ms': total / count * 1000 if count else 0.0,
+                **{f'p{int(q * 100)}_ms': value * 1000 for q, value in quantiles.items()}
+            }
+            for name, labels, count, total, quantiles in sorted(series, key=lambda s: (s[0], s[1]))
+        ]
+
+    def render_prometheus(self):
+        """Prometheus text exposition format, one summary per metric name"""
+        with self._lock:
+            series = sorted(((name, labels, h.count, h.sum, h.quantiles()) for (name, labels), h in self._series.items()), key=lambda s: (s[0], s[1]))
+
+        lines = []
+        current = None
+        for name, labels, count, total, quantiles in series:
+            if name != current:
+                current = name
+                if name in self._help:
+                    lines.append(f'# HELP {name} {self._help[name]}')
+                lines.append(f'# TYPE {name} summary')
+            for q, value in quantiles.items():
+                lines.append(f'{name}{_labels(labels + (("quantile", str(q)),))} {value:.6f}')
+            lines.append(f'{name}_sum{_labels(labels)} {total:.6f}')
+            lines.append(f'{name}_count{_labels(labels)} {count}')
+        return '\n'.join(lines) + '\n'
+
+
+def _labels(labels):
+    if not labels:
+        return ''
+    escaped = (str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, value in labels)
+    return '{' + ','.join(f'{key}="{value}"' for (key, _), value in zip(labels, escaped)) + '}'
+
+
+metrics = MetricsRegistry()
+metrics.describe('actiscore_stage_seconds', 'Time spent in one stage of the analysis pipeline')
+metrics.describe('actiscore_http_request_seconds', 'Time to handle an HTTP request')
+metrics.describe('actiscore_stream_seconds', 'Time from receiving a stream message to emitting its result')
+
+
+def start_trace(enabled=True):
+    """Collect per-stage timings for the current request or task.
+
+    Always called at the start of a request, so a reused worker thread never
+    keeps adding to the previous request's trace.
+    """
+    trace = {} if enabled else None
+    _trace.set(trace)
+    return trace
+
+
+def current_trace():
+    return _trace.get()
+
+
+@contextmanager
+def stage(name):
+    """Time a pipeline stage into the histograms and the active trace"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        metrics.observe('actiscore_stage_seconds', elapsed, stage=name)
+        trace = _trace.get()
+        if trace is not None:
+            trace[name] = trace.get(name, 0.0) + elapsed
+
+
+def timings_requested():
+    return request.args.get('timings') in ('1', 'true') or request.headers.get('X-Timings') == '1'
+
+
+def register_metrics(app):
+    """Time every request and optionally report its stage breakdown.
+
+    With API_TIMINGS enabled, or per request with ?timings=1 or an
+    `X-Timings: 1` header, the response gets a Server-Timing header and
+    JSON object responses get a `timings` field in milliseconds.
+    """
+    @app.before_request
+    def start_request_timer():
+        g.request_started = time.perf_counter()
+        g.request_trace = start_trace(bool(app.config.get('API_TIMINGS')) or timings_requested())
+
+    @app.after_request
+    def record_request_time(response):
+        started = g.pop('request_started', None)
+        if started is None or request.endpoint in (None, 'static'):
+            return response
+        elapsed = time.perf_counter() - started
+        metrics.observe('actiscore_http_request_seconds', elapsed, endpoint=request.endpoint, method=request.method)
+
+        trace = g.pop('request_trace', None)
+        if trace is None:
+            return response
+        timings = {name: round(seconds * 1000, 3) for name, seconds in trace.items()}
+        timings['total'] = round(elapsed * 1000, 3)
+        response.headers['Server-Timing'] = ', '.join(f'{name.replace(".", "-")};dur={ms}' for name, ms in timings.items())
+
+        body = response.get_json(silent=True) if response.is_json and not response.direct_passthrough else None
+        if isinstance(body, dict):
+            body['timings'] = timings
+            response.set_data(dumps_payload(body))
+            # An ETag set by the view described the body without timings
+            if 'ETag' in response.headers:
+                response.add_etag(overwrite=True)
+        return response
+
+
+def metrics_authorized():
+    """Scrapers authenticate with METRICS_TOKEN as a bearer token"""
+    token = current_app.config.get('METRICS_TOKEN')
+    header = request.headers.get('Authorization', '')
+    if token and hmac.compare_digest(header, f'Bearer {token}'):
+        return True
+    return is_admin_user()
@@ -0,0 +1,69 @@
+import contextvars
+
+import socketio
+from concurrent.futures import ThreadPoolExecutor
+
+# Called with the sid of every disconnecting socket. Socket.IO allows only
+# one 'disconnect' handler, so features register cleanup callbacks here.
+disconnect_handlers = []
+
+
+class FakeRedisManager(socketio.RedisManager):
+    """Redis client manager backed by an in-process fakeredis server.
+
+    Every manager created with the same `fakeredis://<name>` URL shares one
+    fake server, so several SocketIO instances in one process behave like
+    workers connected to a real Redis. Intended for tests only.
+    """
+
+    _servers = {}
+
+    def _redis_connect(self):
+        import fakeredis
+        name = self.redis_url[len('fakeredis://'):] or 'default'
+        server = self._servers.setdefault(name, fakeredis.FakeServer())
+        self.redis = fakeredis.FakeRedis(server=server)
+        self.pubsub = self.redis.pubsub(ignore_subscribe_messages=True)
+        self.connected = True
+
+
+def create_client_manager(url, channel='actiscore-socketio'):
+    """Build the Socket.IO client manager that lets rooms span processes.
+
+    Supported URLs are redis:// and rediss:// (Redis), amqp:// and other
+    kombu transports, and fakeredis:// for tests. Returns None without a
+    URL, which keeps the default single-process manager.
+    """
+    if not url:
+        return None
+    if url.startswith('fakeredis://'):
+        return FakeRedisManager(url, channel=channel)
+    if url.startswith(('redis://', 'rediss://')):
+        return socketio.RedisManager(url, channel=channel)
+    return socketio.KombuManager(url, channel=channel)
+
+
+class InferenceOffloader:
+    """Runs blocking model calls outside the Socket.IO event loop.
+
+    Under eventlet and gevent a CPU-bound predict call would stall every
+    other connection on the worker, so it is handed to the native thread
+    pool of the async framework. In threading mode handlers already run
+    in their own thread and a bounded executor caps concurrent inference.
+    """
+
+    def __init__(self, async_mode, max_workers=2):
+        self.async_mode = async_mode
+        self._executor = ThreadPoolExecutor(max_workers=max_workers) if async_mode == 'threading' else None
+
+    def run(self, fn, *args):
+        # Carry the caller's context along so stage timings reach its trace
+        args = (fn,) + args
+        fn = contextvars.copy_context().run
+        if self.async_mode == 'eventlet':
+            from eventlet import tpool
+            return tpool.execute(fn, *args)
+        if self.async_mode == 'gevent':
+            import gevent
+            return gevent.get_hub().threadpool.apply(fn, args)
+        return self._executor.submit(fn, *args).result()
@@ -0,0 +1,112 @@
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+
+def report_cache_key(user_id, report_type, template, analyses):
+    """Identical requests over unchanged analyses share one artifact"""
+    fingerprint = {
+        'user': user_id,
+        'type': report_type,
+        'template': template,
+        'analyses': sorted((a.id, a.created_at.isoformat(), a.team_id or 0) for a in analyses)
+    }
+    return hashlib.sha256(json.dumps(fingerprint).encode()).hexdigest()
+
+
+class ReportJob:
+    def __init__(self, job_id, user_id, key, path, download_name):
+        self.id = job_id
+        self.user_id = user_id
+        self.key = key
+        self.path = path
+        self.download_name = download_name
+        self.status = 'pending'
+        self.error = None
+        self.created = time.time()
+
+    def to_dict(self):
+        return {
+            'job_id': self.id,
+            'status': self.status,
+            'error': self.error
+        }
+
+
+class ReportJobManager:
+    """Runs report rendering in a worker pool and caches the artifacts.
+
+    Artifacts are written to a temporary file in the report folder and
+    renamed into place once complete, so a cached file is never partial.
+    """
+
+    def __init__(self, folder, max_workers=2, max_age=24 * 3600):
+        self.folder = folder
+        self.max_age = max_age
+        os.makedirs(folder, exist_ok=True)
+        self._executor = ThreadPoolExecutor(max_workers=max_workers)
+        self._lock = threading.Lock()
+        self._jobs = {}
+        self._running = {}  # cache key -> job id
+
+    def submit(self, user_id, key, extension, download_name, render):
+        """Schedule `render(file)` unless the artifact is cached or in flight"""
+        path = os.path.join(self.folder, f'{key}.{extension}')
+        job = ReportJob(uuid.uuid4().hex, user_id, key, path, download_name)
+
+        with self._lock:
+            if key in self._running:
+                return self._jobs[self._running[key]]
+            self._jobs[job.id] = job
+            try:
+                # Reusing an artifact renews it, so prune() keeps it around
+                os.utime(path)
+                job.status = 'done'
+                return job
+            except FileNotFoundError:
+                pass
+            self._running[key] = job.id
+
+        self._executor.submit(self._run, job, render)
+        return job
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def _run(self, job, render):
+        job.status = 'running'
+        tmp_path = None
+        try:
+            with tempfile.NamedTemporaryFile(dir=self.folder, suffix='.part', delete=False) as f:
+                tmp_path = f.name
+                render(f)
+            os.replace(tmp_path, job.path)
+            job.status = 'done'
+        except Exception as e:
+            job.status = 'failed'
+            job.error = str(e)
+            if tmp_path and os.path.exists(tmp_path):
+                os.remove(tmp_path)
+        finally:
+            with self._lock:
+                self._running.pop(job.key, None)
+        self.prune()
+
+    def prune(self):
+        """Drop artifacts and finished jobs older than max_age"""
+        cutoff = time.time() - self.max_age
+        for entry in os.scandir(self.folder):
+            if entry.is_file() and entry.stat().st_mtime < cutoff:
+                try:
+                    os.remove(entry.path)
+                except OSError:
+                    pass
+        with self._lock:
+            for job_id in [j.id for j in self._jobs.values() if j.created < cutoff and j.status in ('done', 'failed')]:
+                del self._jobs[job_id]
@@ -0,0 +1,125 @@
+from utils.serialization import loads
+
+# Data-driven report layouts. Every output format renders the same
+# sections in the listed order; `charts` are the per-analysis charts the
+# PDF and PowerPoint formats draw (Excel and CSV have none).
+REPORT_TEMPLATES = {
+    'default': {
+        'name': 'Default Template',
+        'description': 'Standard report with summary and detailed analysis',
+        'sections': ['summary', 'details'],
+        'charts': ['distribution']
+    },
+    'executive': {
+        'name': 'Executive Summary',
+        'description': 'Concise report focused on key metrics and insights',
+        'sections': ['overview', 'summary'],
+        'charts': []
+    },
+    'detailed': {
+        'name': 'Detailed Analysis',
+        'description': 'Comprehensive report with in-depth analysis and visualizations',
+        'sections': ['overview', 'summary', 'details'],
+        'charts': ['distribution', 'timeline']
+    },
+    'comparison': {
+        'name': 'Comparison Report',
+        'description': 'Side-by-side comparison of multiple analyses',
+        'sections': ['overview', 'comparison'],
+        'charts': []
+    },
+    'timeline': {
+        'name': 'Timeline Report',
+        'description': 'Chronological analysis showing emotion changes over time',
+        'sections': ['overview', 'timeline'],
+        'charts': ['timeline']
+    }
+}
+
+
+class ReportEntry:
+    """The parts of one analysis a report needs, parsed once"""
+
+    __slots__ = ('id', 'created_at', 'type', 'duration', 'dominant_emotion', 'emotions', 'charts')
+
+    def __init__(self, analysis_id, created_at, analysis_type, results):
+        self.id = analysis_id
+        self.created_at = created_at
+        self.type = analysis_type
+        self.duration = results.get('duration', 0) or 0
+        self.dominant_emotion = results.get('dominant_emotion', 'Unknown')
+        self.emotions = results.get('emotions') or results.get('emotion_distribution') or {}
+        self.charts = {}  # chart type -> PNG path
+
+    @classmethod
+    def from_analysis(cls, analysis):
+        results = loads(analysis.results) if analysis.results else {}
+        return cls(analysis.id, analysis.created_at, analysis.analysis_type, results)
+
+
+class ReportModel:
+    """Format-independent report: aggregates, layout and a source of entries.
+
+    `entries` is a callable returning a fresh iterable of ReportEntry, so
+    each pass over the analyses streams them again instead of keeping them
+    all in memory. Building the model makes one pass for the aggregates;
+    charts are rendered only when a renderer asks for them.
+    """
+
+    def __init__(self, entries, template='default', username=None, charts=None):
+        self.template_id = template if template in REPORT_TEMPLATES else 'default'
+        self.layout = REPORT_TEMPLATES[self.template_id]
+        self.username = username
+        self._entries = entries
+        self._charts = charts
+        self._aggregate_chart = None
+
+        # Aggregate distribution, counts and period in a single pass
+        totals = {}
+        with_emotions = 0
+        self.count = 0
+        self.type_counts = {}
+        self.total_duration = 0
+        self.start = self.end = None
+        for entry in self._entries():
+            self.count += 1
+            self.type_counts[entry.type] = self.type_counts.get(entry.type, 0) + 1
+            self.total_duration += entry.duration
+            self.start = entry.created_at if self.start is None else min(self.start, entry.created_at)
+            self.end = entry.created_at if self.end is None else max(self.end, entry.created_at)
+            if entry.emotions:
+                with_emotions += 1
+            for emotion, score in entry.emotions.items():
+                totals[emotion] = totals.get(emotion, 0.0) + score
+        self.emotion_names = sorted(totals)
+        count = max(1, with_emotions)
+        self.aggregate = {emotion: totals[emotion] / count for emotion in self.emotion_names}
+        self.dominant_emotion = max(self.aggregate, key=self.aggregate.get) if self.aggregate else 'Unknown'
+
+    @property
+    def sections(self):
+        return self.layout['sections']
+
+    @property
+    def date_range(self):
+        return self.start, self.end
+
+    def entries(self, chart_types=()):
+        """Stream the entries, rendering those of `chart_types` the template includes"""
+        chart_types = [c for c in chart_types if c in self.layout['charts']] if self._charts is not None else []
+        for entry in self._entries():
+            for chart_type in chart_types:
+                key = self._charts.render(entry.id, chart_type, {'emotions': entry.emotions})
+                if key:
+                    entry.charts[chart_type] = self._charts.path(key)
+            yield entry
+
+    def aggregate_chart(self):
+        """Path of the overall distribution chart for the overview, or None"""
+        if self._aggregate_chart is None and self._charts is not None and self.aggregate:
+            # Id 0 never matches an analysis, so the aggregate chart is only
+            # reachable from inside the report
+            key = self._charts.render(0, 'distribution', {'emotions': self.aggregate})
+            if key:
+                self._aggregate_chart = self._charts.path(key)
+        return self._aggregate_chart
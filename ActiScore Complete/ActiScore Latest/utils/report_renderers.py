@@ -0,0 +1,244 @@
+from datetime import datetime
+
+import xlsxwriter
+from reportlab.lib import colors
+from reportlab.lib.pagesizes import letter
+from reportlab.lib.styles import getSampleStyleSheet
+from reportlab.lib.units import inch
+from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer, Image
+
+# Rows per worksheet allowed by the xlsx format
+EXCEL_MAX_ROWS = 1048576
+
+EMOTION_COLUMNS = ['Analysis ID', 'Date', 'Type', 'Duration', 'Dominant Emotion', 'Emotion', 'Confidence']
+SUMMARY_COLUMNS = ['Date', 'Type', 'Duration', 'Dominant Emotion']
+
+TABLE_STYLE = TableStyle([
+    ('BACKGROUND', (0, 0), (-1, 0), colors.blue),
+    ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+    ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+    ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+    ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
+    ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
+    ('GRID', (0, 0), (-1, -1), 1, colors.black)
+])
+
+
+def emotion_rows(entry):
+    """Long-format rows: one per (analysis, emotion)"""
+    for emotion, score in entry.emotions.items():
+        yield [entry.id, entry.created_at, entry.type, entry.duration, entry.dominant_emotion, emotion, score]
+
+
+def summary_row(entry):
+    return [
+        entry.created_at.strftime('%Y-%m-%d %H:%M'),
+        entry.type,
+        f"{entry.duration:.1f} seconds",
+        entry.dominant_emotion
+    ]
+
+
+def overview_lines(model):
+    start, end = model.date_range
+    lines = [f"Analyses: {model.count}"]
+    if start:
+        lines.append(f"Period: {start.strftime('%Y-%m-%d')} to {end.strftime('%Y-%m-%d')}")
+    lines.append(f"Overall dominant emotion: {model.dominant_emotion}")
+    lines.append(f"Total duration: {model.total_duration:.1f} seconds")
+    lines.extend(f"{analysis_type} analyses: {count}" for analysis_type, count in sorted(model.type_counts.items()))
+    return lines
+
+
+def comparison_rows(model):
+    header = ['ID', 'Date'] + model.emotion_names
+    rows = [[str(entry.id), entry.created_at.strftime('%Y-%m-%d')] + [f"{entry.emotions.get(e, 0):.2f}" for e in model.emotion_names]
+            for entry in model.entries()]
+    return header, rows
+
+
+# PDF
+
+def render_pdf(model, out):
+    """Lay out a ReportModel as a PDF into the file object `out`"""
+    doc = SimpleDocTemplate(out, pagesize=letter)
+    styles = getSampleStyleSheet()
+    elements = []
+
+    elements.append(Paragraph("ActiScore Emotion Analysis Report", styles['Title']))
+    elements.append(Spacer(1, 0.25*inch))
+    elements.append(Paragraph(f"Generated on: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}", styles['Normal']))
+    if model.username:
+        elements.append(Paragraph(f"User: {model.username}", styles['Normal']))
+    elements.append(Spacer(1, 0.25*inch))
+
+    def table(data, col_widths=None):
+        t = Table(data, colWidths=col_widths, repeatRows=1)
+        t.setStyle(TABLE_STYLE)
+        return t
+
+    for section in model.sections:
+        if section == 'overview':
+            elements.append(Paragraph("Overview", styles['Heading2']))
+            for line in overview_lines(model):
+                elements.append(Paragraph(line, styles['Normal']))
+            aggregate_chart = model.aggregate_chart()
+            if aggregate_chart:
+                elements.append(Image(aggregate_chart, width=6*inch, height=3*inch))
+
+        elif section == 'summary':
+            elements.append(Paragraph("Summary of Analyses", styles['Heading2']))
+            elements.append(Spacer(1, 0.1*inch))
+            data = [SUMMARY_COLUMNS] + [summary_row(entry) for entry in model.entries()]
+            elements.append(table(data, [1.5*inch, 1*inch, 1*inch, 1.5*inch]))
+
+        elif section == 'comparison':
+            elements.append(Paragraph("Comparison", styles['Heading2']))
+            elements.append(Spacer(1, 0.1*inch))
+            header, rows = comparison_rows(model)
+            elements.append(table([header] + rows))
+
+        elif section in ('details', 'timeline'):
+            title = "Detailed Analysis" if section == 'details' else "Timeline"
+            elements.append(Paragraph(title, styles['Heading2']))
+            elements.append(Spacer(1, 0.1*inch))
+            chart_types = ['distribution', 'timeline'] if section == 'details' else ['timeline']
+            for entry in model.entries(chart_types):
+                elements.append(Paragraph(f"Analysis ID: {entry.id}", styles['Heading3']))
+                elements.append(Paragraph(f"Date: {entry.created_at.strftime('%Y-%m-%d %H:%M:%S')}", styles['Normal']))
+                elements.append(Paragraph(f"Type: {entry.type} - dominant emotion: {entry.dominant_emotion}", styles['Normal']))
+                elements.append(Spacer(1, 0.1*inch))
+                if section == 'details' and entry.emotions:
+                    data = [['Emotion', 'Confidence']] + [[e, f"{s:.2f}"] for e, s in entry.emotions.items()]
+                    elements.append(table(data, [2*inch, 2*inch]))
+                for chart_type in chart_types:
+                    if chart_type in entry.charts:
+                        elements.append(Image(entry.charts[chart_type], width=6*inch, height=3*inch))
+
+        elements.append(Spacer(1, 0.25*inch))
+
+    doc.build(elements)
+
+
+# Excel
+
+def render_excel(model, out):
+    """Lay out a ReportModel as an xlsx workbook into the file object `out`.
+
+    Uses xlsxwriter's constant_memory mode, which flushes each row as soon
+    as the next one starts, and a single long-format Emotions sheet instead
+    of one sheet per analysis.
+    """
+    workbook = xlsxwriter.Workbook(out, {'constant_memory': True, 'default_date_format': 'yyyy-mm-dd hh:mm'})
+    header = workbook.add_format({'bold': True})
+
+    if 'overview' in model.sections:
+        overview = workbook.add_worksheet('Overview')
+        for row, line in enumerate(overview_lines(model)):
+            overview.write(row, 0, line)
+
+    summary = workbook.add_worksheet('Summary')
+    summary.write_row(0, 0, ['ID', 'Date', 'Type', 'Duration', 'Dominant Emotion'], header)
+
+    emotions = workbook.add_worksheet('Emotions')
+    emotions.write_row(0, 0, EMOTION_COLUMNS, header)
+
+    emotion_row = 1
+    sheet_count = 1
+    for row, entry in enumerate(model.entries(), start=1):
+        summary.write_row(row, 0, [entry.id, entry.created_at, entry.type, entry.duration, entry.dominant_emotion])
+
+        for values in emotion_rows(entry):
+            # Continue on a new sheet when Excel's row limit is reached
+            if emotion_row >= EXCEL_MAX_ROWS:
+                sheet_count += 1
+                emotions = workbook.add_worksheet(f'Emotions_{sheet_count}')
+                emotions.write_row(0, 0, EMOTION_COLUMNS, header)
+                emotion_row = 1
+            emotions.write_row(emotion_row, 0, values)
+            emotion_row += 1
+
+    workbook.close()
+
+
+# PowerPoint
+
+PPT_TABLE_ROWS = 12
+
+
+def render_pptx(model, out):
+    """Lay out a ReportModel as a PowerPoint deck into the file object `out`"""
+    from pptx import Presentation
+    from pptx.util import Inches, Pt
+
+    prs = Presentation()
+    prs.slide_width = Inches(13.333)
+    prs.slide_height = Inches(7.5)
+    title_layout, content_layout, title_only_layout = prs.slide_layouts[0], prs.slide_layouts[1], prs.slide_layouts[5]
+
+    slide = prs.slides.add_slide(title_layout)
+    slide.shapes.title.text = "ActiScore Emotion Analysis Report"
+    slide.placeholders[1].text = f"Generated on {datetime.now().strftime('%Y-%m-%d %H:%M')}" + (f" for {model.username}" if model.username else '')
+
+    def add_table(title, header, rows):
+        # Long tables continue over several slides
+        for start in range(0, max(len(rows), 1), PPT_TABLE_ROWS):
+            chunk = rows[start:start + PPT_TABLE_ROWS]
+            slide = prs.slides.add_slide(title_only_layout)
+            slide.shapes.title.text = title if start == 0 else f"{title} (continued)"
+            shape = slide.shapes.add_table(len(chunk) + 1, len(header), Inches(0.5), Inches(1.5), Inches(12.3), Inches(0.4) * (len(chunk) + 1))
+            for col, text in enumerate(header):
+                shape.table.cell(0, col).text = str(text)
+            for row, values in enumerate(chunk, start=1):
+                for col, text in enumerate(values):
+                    cell = shape.table.cell(row, col)
+                    cell.text = str(text)
+                    cell.text_frame.paragraphs[0].font.size = Pt(12)
+
+    def add_image(title, path, subtitle=None):
+        slide = prs.slides.add_slide(title_only_layout)
+        slide.shapes.title.text = title
+        if subtitle:
+            box = slide.shapes.add_textbox(Inches(0.5), Inches(1.3), Inches(12), Inches(0.5))
+            box.text_frame.text = subtitle
+        slide.shapes.add_picture(path, Inches(1.5), Inches(2), width=Inches(10))
+
+    for section in model.sections:
+        if section == 'overview':
+            slide = prs.slides.add_slide(content_layout)
+            slide.shapes.title.text = "Overview"
+            body = slide.placeholders[1].text_frame
+            lines = overview_lines(model)
+            body.text = lines[0]
+            for line in lines[1:]:
+                body.add_paragraph().text = line
+            aggregate_chart = model.aggregate_chart()
+            if aggregate_chart:
+                add_image("Overall emotion distribution", aggregate_chart)
+
+        elif section == 'summary':
+            add_table("Summary of Analyses", SUMMARY_COLUMNS, [summary_row(entry) for entry in model.entries()])
+
+        elif section == 'comparison':
+            header, rows = comparison_rows(model)
+            add_table("Comparison", header, rows)
+
+        elif section in ('details', 'timeline'):
+            chart_types = ['distribution', 'timeline'] if section == 'details' else ['timeline']
+            for entry in model.entries(chart_types):
+                subtitle = f"{entry.created_at.strftime('%Y-%m-%d %H:%M')} - {entry.type} - dominant emotion: {entry.dominant_emotion}"
+                charts = [entry.charts[c] for c in chart_types if c in entry.charts]
+                if charts:
+                    for path in charts:
+                        add_image(f"Analysis {entry.id}", path, subtitle)
+                elif section == 'details' and entry.emotions:
+                    add_table(f"Analysis {entry.id}", ['Emotion', 'Confidence'], [[e, f"{s:.2f}"] for e, s in entry.emotions.items()])
+
+    prs.save(out)
+
+
+RENDERERS = {
+    'pdf': render_pdf,
+    'excel': render_excel,
+    'ppt': render_pptx
+}
@@ -0,0 +1,131 @@
+import os
+import threading
+from datetime import datetime, timedelta
+
+from database.db import db, Analysis, MediaRef
+
+# Longest expected time between storing an upload and committing its
+# analysis; blobs stored more recently are never deleted
+STORE_GRACE = timedelta(minutes=10)
+
+
+def media_refs(file_path):
+    """Media references of an analysis; fusion analyses store two, comma-separated"""
+    return [ref for ref in (file_path or '').split(',') if ref]
+
+
+class RetentionSweeper:
+    """Deletes raw media of analyses older than the retention period.
+
+    Timelines, track embeddings and results are derived data and stay;
+    only the uploaded media goes, and Analysis.file_path is cleared. Each
+    sweep handles at most `batch_size` analyses, continuing from where the
+    previous one stopped, so a large backlog is worked off in small steps.
+    A retention of 0 days deletes media as soon as the analysis is saved,
+    except blobs stored within STORE_GRACE, which a pending upload may share.
+    """
+
+    def __init__(self, app, store, retention_days, interval=300, batch_size=200):
+        self.app = app
+        self.store = store
+        self.retention = timedelta(days=retention_days)
+        self.interval = interval
+        self.batch_size = batch_size
+        self.upload_folder = os.path.abspath(app.config['UPLOAD_FOLDER'])
+        self._cursor = 0
+        self._stop = threading.Event()
+        self.deleted = 0
+        self.failed = 0
+
+    def start(self):
+        threading.Thread(target=self._loop, name='media-retention', daemon=True).start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+
+    def _loop(self):
+        while not self._stop.wait(self.interval):
+            try:
+                with self.app.app_context():
+                    self.sweep()
+            except Exception as e:
+                self.app.logger.warning(f'Media retention sweep failed: {e}')
+
+    def sweep(self):
+        """Process the next batch of expired analyses; returns how many were handled"""
+        cutoff = datetime.utcnow() - self.retention
+        # A blob reused by an upload whose analysis is not committed yet
+        stored_after = min(cutoff, datetime.utcnow() - STORE_GRACE)
+        expired = (
+            Analysis.query
+            .filter(Analysis.file_path.isnot(None), Analysis.created_at <= cutoff, Analysis.id > self._cursor)
+            .order_by(Analysis.id)
+            .limit(self.batch_size)
+            .all()
+        )
+        if not expired:
+            # Start over next time, retrying anything that failed
+            self._cursor = 0
+            return 0
+
+        for analysis in expired:
+            refs = media_refs(analysis.file_path)
+            kept = [
+                ref for ref in refs
+                # Content-addressed media may be shared with a newer analysis,
+                # or reused by an upload not saved yet, which is retried later
+                if not self._still_referenced(ref, cutoff)
+                and (self._recently_stored(ref, stored_after) or not self._delete(ref))
+            ]
+            if kept:
+                analysis.attach_media(*kept)
+            else:
+                analysis.file_path = None
+                analysis.media = []
+            self._cursor = analysis.id
+        db.session.commit()
+        return len(expired)
+
+    def _still_referenced(self, ref, cutoff):
+        return db.session.query(
+            MediaRef.query.join(Analysis)
+            .filter(MediaRef.ref == ref, Analysis.created_at > cutoff, Analysis.file_path.isnot(None))
+            .exists()
+        ).scalar()
+
+    def _recently_stored(self, ref, stored_after):
+        if not self.store.owns(ref):
+            return False
+        try:
+            modified = self.store.modified(ref)
+        except Exception as e:
+            # Keep the media when in doubt; the next sweep tries again
+            self.app.logger.warning(f'Could not check media {ref}: {e}')
+            return True
+        return modified is not None and modified > stored_after
+
+    def _delete(self, ref):
+        try:
+            if self.store.owns(ref):
+                self.store.delete(ref)
+            elif os.path.isabs(ref) and os.path.commonpath([self.upload_folder, os.path.abspath(ref)]) == self.upload_folder:
+                # Uploads saved before the media store existed
+                if os.path.exists(ref):
+                    os.remove(ref)
+            self.deleted += 1
+            return True
+        except Exception as e:
+            self.app.logger.warning(f'Could not delete media {ref}: {e}')
+            self.failed += 1
+            return False
+
+
+def backfill_media_refs():
+    """Index the media of analyses saved before MediaRef existed"""
+    query = Analysis.query.with_entities(Analysis.id, Analysis.file_path).filter(
+        Analysis.file_path.isnot(None), ~Analysis.media.any()
+    )
+    for analysis_id, file_path in query.all():
+        db.session.add_all(MediaRef(analysis_id=analysis_id, ref=ref) for ref in media_refs(file_path))
+    db.session.commit()
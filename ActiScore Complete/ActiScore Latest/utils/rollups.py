@@ -0,0 +1,176 @@
+from datetime import datetime, timedelta
+
+from sqlalchemy.exc import IntegrityError
+
+from database.db import db, Analysis, EmotionRollup
+from utils.serialization import loads
+
+# Rollups are stored per hour and merged into coarser buckets on read
+BUCKET_SIZES = {
+    'hour': timedelta(hours=1),
+    'day': timedelta(days=1),
+    'week': timedelta(weeks=1)
+}
+MAX_BUCKETS = 1000
+
+EMOTIONS = ['Angry', 'Disgust', 'Fear', 'Happy', 'Sad', 'Surprise', 'Neutral']
+
+# SER labels mapped onto the FER label set (same mapping as FusionModel)
+SER_TO_FER = {
+    'angry': 'Angry',
+    'disgust': 'Disgust',
+    'fearful': 'Fear',
+    'happy': 'Happy',
+    'sad': 'Sad',
+    'surprised': 'Surprise',
+    'neutral': 'Neutral',
+    'calm': 'Neutral'
+}
+
+
+def bucket_floor(dt, bucket='hour'):
+    """Truncate a datetime to the start of its bucket (weeks start on Monday)"""
+    dt = dt.replace(minute=0, second=0, microsecond=0)
+    if bucket == 'hour':
+        return dt
+    dt = dt.replace(hour=0)
+    if bucket == 'week':
+        dt -= timedelta(days=dt.weekday())
+    return dt
+
+
+def normalize_distribution(distribution):
+    """Map an emotion distribution onto the FER label set"""
+    normalized = {}
+    for emotion, score in distribution.items():
+        name = SER_TO_FER.get(emotion, emotion)
+        normalized[name] = normalized.get(name, 0.0) + float(score)
+    return normalized
+
+
+def analysis_scopes(analysis):
+    scopes = [('user', analysis.user_id)]
+    if analysis.team_id:
+        scopes.append(('team', analysis.team_id))
+    return scopes
+
+
+def _rollup_insert(dialect):
+    """INSERT construct with ON CONFLICT support for the dialect, if it has one"""
+    if dialect == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+    elif dialect == 'sqlite':
+        from sqlalchemy.dialects.sqlite import insert
+    else:
+        return None
+    return insert
+
+
+def apply_analysis(analysis, results, scopes=None, sign=1):
+    """Add (or with sign=-1 remove) an analysis' contribution to the rollups.
+
+    The counters are incremented in the database (an upsert where the
+    dialect supports one), so analyses committed concurrently for the same
+    hour never lose an update. The statements run on the current session
+    so the caller commits them in the same transaction as the analysis.
+    """
+    distribution = results.get('emotion_distribution') if isinstance(results, dict) else None
+    if not distribution:
+        return
+
+    distribution = normalize_distribution(distribution)
+    bucket_start = bucket_floor(analysis.created_at or datetime.utcnow())
+    table = EmotionRollup.__table__
+    insert = _rollup_insert(db.engine.dialect.name)
+
+    for scope, scope_id in (scopes or analysis_scopes(analysis)):
+        rows = [
+            {'scope': scope, 'scope_id': scope_id, 'bucket_start': bucket_start,
+             'emotion': emotion, 'total': sign * score, 'samples': sign}
+            for emotion, score in distribution.items()
+        ]
+        if insert is not None:
+            stmt = insert(table).values(rows)
+            db.session.execute(stmt.on_conflict_do_update(
+                index_elements=['scope', 'scope_id', 'bucket_start', 'emotion'],
+                set_={'total': table.c.total + stmt.excluded.total, 'samples': table.c.samples + stmt.excluded.samples}
+            ))
+            continue
+
+        for row in rows:
+            _increment_rollup(table, row)
+
+
+def _increment_rollup(table, row):
+    """Atomic increment for dialects without ON CONFLICT: update, else insert"""
+    key = (
+        (table.c.scope == row['scope']) & (table.c.scope_id == row['scope_id'])
+        & (table.c.bucket_start == row['bucket_start']) & (table.c.emotion == row['emotion'])
+    )
+    increment = table.update().where(key).values(total=table.c.total + row['total'], samples=table.c.samples + row['samples'])
+    if db.session.execute(increment).rowcount:
+        return
+    try:
+        with db.session.begin_nested():
+            db.session.execute(table.insert().values(**row))
+    except IntegrityError:
+        # Another transaction created the row first
+        db.session.execute(increment)
+
+
+def record_analysis(analysis, results):
+    """Update the rollups for a freshly created analysis"""
+    if analysis.created_at is None:
+        analysis.created_at = datetime.utcnow()
+    apply_analysis(analysis, results)
+
+
+def rebuild_rollups():
+    """Recompute every rollup from the stored analyses"""
+    EmotionRollup.query.delete()
+    for analysis in Analysis.query.yield_per(500):
+        if analysis.results:
+            apply_analysis(analysis, loads(analysis.results))
+            db.session.flush()
+    db.session.commit()
+
+
+def query_rollups(scope, scope_id, start, end, bucket='day'):
+    """Return bucket labels and per-emotion mean scores for a time range.
+
+    Reads only the hourly rollup rows in the range, so the cost depends on
+    the number of buckets and not on the number of analyses.
+    """
+    step = BUCKET_SIZES[bucket]
+    first = bucket_floor(start, bucket)
+    n_buckets = int((end - first) / step) + 1
+    if n_buckets > MAX_BUCKETS:
+        raise ValueError(f'Time range spans more than {MAX_BUCKETS} buckets')
+
+    totals = [dict() for _ in range(n_buckets)]
+    samples = [0] * n_buckets
+
+    rows = EmotionRollup.query.filter(
+        EmotionRollup.scope == scope,
+        EmotionRollup.scope_id == scope_id,
+        EmotionRollup.bucket_start >= first,
+        EmotionRollup.bucket_start <= end
+    ).all()
+
+    # Every emotion of an analysis is written together, so the sample count
+    # of any one emotion is the number of analyses in the hour
+    hourly_samples = {}
+    for row in rows:
+        index = int((bucket_floor(row.bucket_start, bucket) - first) / step)
+        totals[index][row.emotion] = totals[index].get(row.emotion, 0.0) + row.total
+        hourly_samples[row.bucket_start] = max(hourly_samples.get(row.bucket_start, 0), row.samples)
+
+    for hour, count in hourly_samples.items():
+        samples[int((bucket_floor(hour, bucket) - first) / step)] += count
+
+    labels = [(first + i * step).isoformat() for i in range(n_buckets)]
+    values = {
+        emotion: [round(totals[i].get(emotion, 0.0) / samples[i], 4) if samples[i] else 0.0 for i in range(n_buckets)]
+        for emotion in EMOTIONS
+    }
+    return labels, values
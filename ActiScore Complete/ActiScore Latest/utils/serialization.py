@@ -0,0 +1,160 @@
+import json
+from datetime import date, datetime, timezone
+
+import numpy as np
+from flask.json import JSONEncoder as FlaskJSONEncoder
+
+try:
+    import orjson
+except ImportError:  # the stdlib encoder is used instead
+    orjson = None
+
+if orjson is not None:
+    ORJSON_OPTIONS = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+
+# Decimal places kept in API responses and socket events, None keeps all.
+# Set from JSON_FLOAT_PRECISION by init_serialization.
+float_precision = None
+
+
+def round_floats(obj, precision):
+    """Copy of `obj` with every float, including NumPy ones, rounded"""
+    if isinstance(obj, float):
+        return round(obj, precision)
+    if isinstance(obj, dict):
+        return {key: round_floats(value, precision) for key, value in obj.items()}
+    if isinstance(obj, (list, tuple)):
+        return [round_floats(value, precision) for value in obj]
+    if isinstance(obj, np.ndarray) and obj.dtype.kind == 'f':
+        return np.round(obj, precision)
+    if isinstance(obj, np.floating):
+        return round(float(obj), precision)
+    return obj
+
+
+def to_builtin(obj):
+    """`default` hook for encoders without NumPy support"""
+    if isinstance(obj, np.ndarray):
+        return obj.tolist()
+    if isinstance(obj, np.generic):
+        return obj.item()
+    if isinstance(obj, (datetime, date)):
+        return obj.isoformat()
+    raise TypeError(f'Object of type {type(obj).__name__} is not JSON serializable')
+
+
+def dumps_bytes(obj, precision=None):
+    """Encode `obj` as UTF-8 JSON; NumPy arrays and scalars are supported"""
+    if precision is not None:
+        obj = round_floats(obj, precision)
+    if orjson is not None:
+        try:
+            return orjson.dumps(obj, default=to_builtin, option=ORJSON_OPTIONS)
+        except orjson.JSONEncodeError:
+            # e.g. integers beyond 64 bits, which the stdlib still handles
+            pass
+    return json.dumps(obj, default=to_builtin, separators=(',', ':')).encode()
+
+
+def dumps(obj, precision=None):
+    return dumps_bytes(obj, precision).decode()
+
+
+def dumps_payload(obj):
+    """dumps for API responses and events, rounded to JSON_FLOAT_PRECISION"""
+    return dumps(obj, float_precision)
+
+
+def parse_utc(value):
+    """Parse an ISO 8601 timestamp as naive UTC, the way timestamps are stored"""
+    if value.endswith(('Z', 'z')):
+        value = value[:-1] + '+00:00'
+    dt = datetime.fromisoformat(value)
+    if dt.tzinfo is not None:
+        dt = dt.astimezone(timezone.utc).replace(tzinfo=None)
+    return dt
+
+
+def loads(data):
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+class JSONEncoder(FlaskJSONEncoder):
+    """Flask encoder that runs jsonify through orjson.
+
+    Output matches Flask's own encoder (sorted keys, HTTP dates), plus
+    NumPy support and JSON_FLOAT_PRECISION rounding.
+    """
+
+    def default(self, o):
+        if isinstance(o, (np.ndarray, np.generic)):
+            return to_builtin(o)
+        return super().default(o)
+
+    def encode(self, o):
+        if float_precision is not None:
+            o = round_floats(o, float_precision)
+        if orjson is None or self.indent not in (None, 2):
+            return super().encode(o)
+
+        option = ORJSON_OPTIONS | orjson.OPT_PASSTHROUGH_DATETIME
+        if self.sort_keys:
+            option |= orjson.OPT_SORT_KEYS
+        if self.indent:
+            option |= orjson.OPT_INDENT_2
+        try:
+            return orjson.dumps(o, default=self.default, option=option).decode()
+        except orjson.JSONEncodeError:
+            return super().encode(o)
+
+
+class SocketJSON:
+    """JSON module handed to python-socketio to encode event packets"""
+
+    @staticmethod
+    def dumps(obj, *args, **kwargs):
+        return dumps_payload(obj)
+
+    @staticmethod
+    def loads(data, *args, **kwargs):
+        return loads(data)
+
+
+def msgpack_packet_class():
+    """python-socketio MessagePack packets with NumPy support and rounding"""
+    import msgpack
+    from socketio.msgpack_packet import MsgPackPacket
+
+    class ActiScoreMsgPackPacket(MsgPackPacket):
+        def encode(self):
+            data = self._to_dict()
+            if float_precision is not None:
+                data = round_floats(data, float_precision)
+            return msgpack.dumps(data, default=to_builtin)
+
+    return ActiScoreMsgPackPacket
+
+
+def socketio_options(app):
+    """SocketIO keyword arguments for the SOCKETIO_SERIALIZER setting.
+
+    'json' (the default) encodes events with this module; 'msgpack' sends
+    binary MessagePack packets, which browser clients can only read with
+    the socket.io-msgpack-parser.
+    """
+    serializer = app.config.get('SOCKETIO_SERIALIZER') or 'json'
+    if serializer == 'json':
+        return {'json': SocketJSON}
+    if serializer == 'msgpack':
+        return {'serializer': msgpack_packet_class(), 'json': SocketJSON}
+    raise ValueError(f"Unknown SOCKETIO_SERIALIZER '{serializer}', expected 'json' or 'msgpack'")
+
+
+def init_serialization(app):
+    """Use the fast encoder for jsonify and apply JSON_FLOAT_PRECISION"""
+    global float_precision
+    precision = app.config.get('JSON_FLOAT_PRECISION')
+    float_precision = int(precision) if precision not in (None, '') else None
+    app.json_encoder = JSONEncoder
@@ -0,0 +1,193 @@
+import hashlib
+import os
+import re
+import shutil
+import tempfile
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+
+# ab/cd/<sha256>.ext, as returned by content_key
+KEY_PATTERN = re.compile(r'^[0-9a-f]{2}/[0-9a-f]{2}/[0-9a-f]{64}(\.[0-9a-z]+)?$')
+
+
+def content_key(path, chunk_size=1024 * 1024):
+    """Content address of a file: its SHA-256, sharded two levels deep.
+
+    e.g. 'ab/cd/abcd...ef.mp4'. Identical uploads share one key, and no
+    directory grows beyond a few hundred entries.
+    """
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    h = digest.hexdigest()
+    return f'{h[:2]}/{h[2:4]}/{h}{os.path.splitext(path)[1].lower()}'
+
+
+class MediaStore:
+    """Where uploaded media lives once it has been analyzed.
+
+    `put` takes a local file (which it consumes) and returns its content
+    key, the reference stored in Analysis.file_path. Keys are relative to
+    the store, so they stay short and survive moving the media root.
+    `local_path` yields a local copy of a key for reprocessing, and `delete`
+    removes it. `owns` tells content keys apart from legacy upload paths.
+    `put` of content already stored refreshes its `modified` time, so the
+    retention sweeper leaves a blob alone while a new upload reuses it.
+    """
+
+    name = None
+
+    def put(self, path):
+        raise NotImplementedError
+
+    def owns(self, ref):
+        return bool(KEY_PATTERN.match(ref))
+
+    def exists(self, ref):
+        raise NotImplementedError
+
+    def modified(self, ref):
+        """When a key was last stored, as naive UTC, or None if it is missing"""
+        raise NotImplementedError
+
+    @contextmanager
+    def local_path(self, ref):
+        raise NotImplementedError
+
+    def delete(self, ref):
+        raise NotImplementedError
+
+
+class LocalMediaStore(MediaStore):
+    """Content-addressed files under `root`"""
+
+    name = 'local'
+
+    def __init__(self, root):
+        self.root = os.path.abspath(root)
+        os.makedirs(self.root, exist_ok=True)
+
+    def path(self, ref):
+        return os.path.join(self.root, ref)
+
+    def put(self, path):
+        key = content_key(path)
+        target = self.path(key)
+        try:
+            # Same content stored before: mark it as just stored again
+            os.utime(target)
+            os.remove(path)
+        except FileNotFoundError:
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            shutil.move(path, target)
+        return key
+
+    def exists(self, ref):
+        return os.path.exists(self.path(ref))
+
+    def modified(self, ref):
+        try:
+            return datetime.utcfromtimestamp(os.path.getmtime(self.path(ref)))
+        except FileNotFoundError:
+            return None
+
+    @contextmanager
+    def local_path(self, ref):
+        yield self.path(ref)
+
+    def delete(self, ref):
+        path = self.path(ref)
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            return
+        # Prune shard directories left empty
+        parent = os.path.dirname(path)
+        while parent != self.root and not os.listdir(parent):
+            os.rmdir(parent)
+            parent = os.path.dirname(parent)
+
+
+class S3MediaStore(MediaStore):
+    """Content-addressed objects in an S3-compatible bucket, under `prefix`.
+
+    With `endpoint_url`, any S3-compatible server works, such as MinIO or a
+    local moto server for tests.
+    """
+
+    name = 's3'
+
+    def __init__(self, bucket, prefix='media/', endpoint_url=None, client=None):
+        if client is None:
+            import boto3
+            client = boto3.client('s3', endpoint_url=endpoint_url)
+        self.client = client
+        self.bucket = bucket
+        self.prefix = prefix
+
+    def put(self, path):
+        key = content_key(path)
+        if self.exists(key):
+            # Same content stored before: copying it onto itself renews LastModified
+            self.client.copy_object(
+                Bucket=self.bucket, Key=self.prefix + key,
+                CopySource={'Bucket': self.bucket, 'Key': self.prefix + key},
+                MetadataDirective='REPLACE'
+            )
+        else:
+            self.client.upload_file(path, self.bucket, self.prefix + key)
+        os.remove(path)
+        return key
+
+    def _head(self, ref):
+        try:
+            return self.client.head_object(Bucket=self.bucket, Key=self.prefix + ref)
+        except Exception as e:
+            if getattr(e, 'response', {}).get('Error', {}).get('Code') in ('404', 'NoSuchKey', 'NotFound'):
+                return None
+            raise
+
+    def exists(self, ref):
+        return self._head(ref) is not None
+
+    def modified(self, ref):
+        head = self._head(ref)
+        if head is None:
+            return None
+        return head['LastModified'].astimezone(timezone.utc).replace(tzinfo=None)
+
+    @contextmanager
+    def local_path(self, ref):
+        suffix = os.path.splitext(ref)[1]
+        fd, path = tempfile.mkstemp(suffix=suffix)
+        os.close(fd)
+        try:
+            self.client.download_file(self.bucket, self.prefix + ref, path)
+            yield path
+        finally:
+            os.remove(path)
+
+    def delete(self, ref):
+        self.client.delete_object(Bucket=self.bucket, Key=self.prefix + ref)
+
+
+def create_media_store(settings):
+    """Build the MediaStore selected by MEDIA_STORAGE in `settings`.
+
+    'local' keeps media under MEDIA_FOLDER; 's3' uses MEDIA_S3_BUCKET with
+    MEDIA_S3_PREFIX and, for S3-compatible servers, MEDIA_S3_ENDPOINT_URL.
+    """
+    backend = settings.get('MEDIA_STORAGE') or 'local'
+    if backend == 'local':
+        return LocalMediaStore(settings['MEDIA_FOLDER'])
+    if backend == 's3':
+        if not settings.get('MEDIA_S3_BUCKET'):
+            raise ValueError('MEDIA_STORAGE=s3 requires MEDIA_S3_BUCKET')
+        return S3MediaStore(
+            settings['MEDIA_S3_BUCKET'],
+            prefix=settings.get('MEDIA_S3_PREFIX') or 'media/',
+            endpoint_url=settings.get('MEDIA_S3_ENDPOINT_URL')
+        )
+    raise ValueError(f"Unknown MEDIA_STORAGE '{backend}', expected 'local' or 's3'")
@@ -0,0 +1,145 @@
+import threading
+import time
+from collections import deque
+
+import numpy as np
+
+from utils.metrics import metrics
+
+
+class StreamSession:
+    """Latest-wins slot and metrics for one (socket, stream kind) pair"""
+
+    def __init__(self, sid, kind):
+        self.sid = sid
+        self.kind = kind
+        self.pending = None  # (seq, payload, received_at)
+        self.busy = False
+        self.received = 0
+        self.processed = 0
+        self.dropped = 0
+        self.failed = 0
+        self.last_seq = None
+        self.latencies = deque(maxlen=200)  # seconds from receive to result
+
+    def metrics(self):
+        latencies = np.array(self.latencies) * 1000
+        return {
+            'sid': self.sid,
+            'kind': self.kind,
+            'received': self.received,
+            'processed': self.processed,
+            'dropped': self.dropped,
+            'failed': self.failed,
+            'last_seq': self.last_seq,
+            'latency_ms': {
+                'p50': float(np.percentile(latencies, 50)),
+                'p95': float(np.percentile(latencies, 95)),
+                'max': float(latencies.max())
+            } if latencies.size else None
+        }
+
+
+class StreamScheduler:
+    """Processes real-time stream messages without unbounded queueing.
+
+    Each socket keeps at most one waiting message per stream kind. A message
+    arriving while the previous one is still waiting replaces it and counts
+    as dropped, so results always describe the most recent frame. After each
+    result the client receives a `stream_ack` with the processed sequence
+    number, its latency and the drop count, which it can use to adapt its
+    send rate. A message whose handler raises gets a `stream_error` and a
+    failed ack instead of a result.
+    """
+
+    def __init__(self, socketio, inference):
+        self.socketio = socketio
+        self.inference = inference
+        self._lock = threading.Lock()
+        self._sessions = {}
+
+    def submit(self, sid, kind, seq, payload, handler, result_event):
+        """Queue a message and return the ack sent back to the client"""
+        with self._lock:
+            session = self._sessions.get((sid, kind))
+            if session is None:
+                session = self._sessions[(sid, kind)] = StreamSession(sid, kind)
+
+            session.received += 1
+            if session.pending is not None:
+                session.dropped += 1
+            session.pending = (seq, payload, time.perf_counter())
+
+            start = not session.busy
+            session.busy = True
+
+        if start:
+            self.socketio.start_background_task(self._drain, session, handler, result_event)
+
+        return {'seq': seq, 'dropped': session.dropped}
+
+    def _drain(self, session, handler, result_event):
+        try:
+            while True:
+                with self._lock:
+                    if session.pending is None:
+                        session.busy = False
+                        return
+                    seq, payload, received_at = session.pending
+                    session.pending = None
+
+                # A bad message fails on its own; the stream keeps going
+                try:
+                    results = self.inference.run(handler, payload)
+                    error = None
+                except Exception as e:
+                    results = None
+                    error = str(e) or type(e).__name__
+                latency = time.perf_counter() - received_at
+
+                with self._lock:
+                    session.processed += 1
+                    session.last_seq = seq
+                    if error is None:
+                        session.latencies.append(latency)
+                    else:
+                        session.failed += 1
+
+                if error is None:
+                    metrics.observe('actiscore_stream_seconds', latency, kind=session.kind)
+                    if isinstance(results, dict):
+                        results = dict(results, seq=seq)
+                    self.socketio.emit(result_event, results, room=session.sid)
+                else:
+                    self.socketio.emit('stream_error', {'kind': session.kind, 'seq': seq, 'error': error}, room=session.sid)
+                self.socketio.emit('stream_ack', {
+                    'kind': session.kind,
+                    'seq': seq,
+                    'latency_ms': latency * 1000,
+                    'dropped': session.dropped,
+                    'failed': error is not None
+                }, room=session.sid)
+        except BaseException:
+            # Let the next message start a new task instead of queueing forever
+            with self._lock:
+                session.busy = False
+            raise
+
+    def close(self, sid):
+        """Forget a disconnected socket; an in-flight result is discarded"""
+        with self._lock:
+            for key in [key for key in self._sessions if key[0] == sid]:
+                self._sessions.pop(key).pending = None
+
+    def metrics(self):
+        with self._lock:
+            sessions = [session.metrics() for session in self._sessions.values()]
+        return {
+            'sessions': sessions,
+            'totals': {
+                'received': sum(s['received'] for s in sessions),
+                'processed': sum(s['processed'] for s in sessions),
+                'dropped': sum(s['dropped'] for s in sessions),
+                'failed': sum(s['failed'] for s in sessions)
+            }
+        }
@@ -0,0 +1,173 @@
+import json
+import os
+import numpy as np
+
+from utils.tracks import FaceTracker, TRACK_COLUMNS
+
+# Emotion probabilities are quantized to uint8 (1/255 resolution)
+PROB_SCALE = 255.0
+
+TIMELINE_COLUMNS = ('probs', 'boxes', 'face_count', 'frame_index')
+
+
+def timeline_path(folder, analysis_id):
+    """Directory holding the timeline columns of one analysis"""
+    return os.path.join(folder, str(analysis_id))
+
+
+class TimelineBuilder:
+    """Accumulates per-frame face predictions while a video is decoded"""
+
+    def __init__(self, emotions, fps=0.0, tracker=None):
+        self.emotions = list(emotions)
+        self.fps = fps
+        # Frames that come with face embeddings are also linked into tracks
+        self.tracker = tracker or FaceTracker()
+        self._probs = []
+        self._boxes = []
+        self._frame_index = []
+
+    def __len__(self):
+        return len(self._frame_index)
+
+    def add_frame(self, frame_index, probabilities, boxes, embeddings=None):
+        """Record one decoded frame.
+
+        probabilities is an (n_faces, n_emotions) array and boxes an
+        (n_faces, 4) array of x, y, width, height. Frames without faces are
+        recorded too so the timeline keeps a uniform time axis. The optional
+        (n_faces, dim) embeddings feed the face tracks.
+        """
+        probabilities = np.asarray(probabilities, dtype=np.float32).reshape(-1, len(self.emotions))
+        boxes = np.asarray(boxes).reshape(-1, 4)
+
+        self._probs.append(np.rint(np.clip(probabilities, 0.0, 1.0) * PROB_SCALE).astype(np.uint8))
+        self._boxes.append(np.clip(boxes, 0, np.iinfo(np.uint16).max).astype(np.uint16))
+        self._frame_index.append(frame_index)
+        if embeddings is not None:
+            self.tracker.update(frame_index, boxes, probabilities, embeddings)
+
+    def build(self):
+        """Pack the accumulated frames into an EmotionTimeline"""
+        n_frames = len(self._frame_index)
+        face_count = np.array([len(p) for p in self._probs], dtype=np.uint8)
+        max_faces = int(face_count.max()) if n_frames else 0
+
+        probs = np.zeros((n_frames, max_faces, len(self.emotions)), dtype=np.uint8)
+        boxes = np.zeros((n_frames, max_faces, 4), dtype=np.uint16)
+        for i, (frame_probs, frame_boxes) in enumerate(zip(self._probs, self._boxes)):
+            probs[i, :len(frame_probs)] = frame_probs
+            boxes[i, :len(frame_boxes)] = frame_boxes
+
+        return EmotionTimeline(
+            probs=probs,
+            boxes=boxes,
+            face_count=face_count,
+            frame_index=np.asarray(self._frame_index, dtype=np.int32),
+            emotions=self.emotions,
+            fps=self.fps,
+            tracks=self.tracker.finish(self.fps)
+        )
+
+
+class EmotionTimeline:
+    """Columnar per-frame emotion data for a single analysis.
+
+    probs has shape (frames, faces, emotions) and holds uint8-quantized
+    probabilities, boxes has shape (frames, faces, 4). Columns are stored as
+    plain .npy files so they can be memory-mapped and sliced without reading
+    the whole timeline.
+    """
+
+    def __init__(self, probs, boxes, face_count, frame_index, emotions, fps=0.0, tracks=None):
+        self.probs = probs
+        self.boxes = boxes
+        self.face_count = face_count
+        self.frame_index = frame_index
+        self.emotions = list(emotions)
+        self.fps = fps
+        # Per-face track summaries (see utils.tracks), stored in tracks.npz
+        self.tracks = tracks
+
+    def __len__(self):
+        return len(self.frame_index)
+
+    def save(self, path):
+        os.makedirs(path, exist_ok=True)
+        for column in TIMELINE_COLUMNS:
+            np.save(os.path.join(path, f'{column}.npy'), getattr(self, column))
+
+        meta = {
+            'emotions': self.emotions,
+            'fps': self.fps,
+            'frames': len(self),
+            'max_faces': int(self.probs.shape[1])
+        }
+        if self.tracks is not None:
+            np.savez(os.path.join(path, 'tracks.npz'), **self.tracks)
+        with open(os.path.join(path, 'meta.json'), 'w') as f:
+            json.dump(meta, f)
+
+    @classmethod
+    def load(cls, path, mmap=True):
+        with open(os.path.join(path, 'meta.json')) as f:
+            meta = json.load(f)
+
+        mmap_mode = 'r' if mmap else None
+        columns = {
+            column: np.load(os.path.join(path, f'{column}.npy'), mmap_mode=mmap_mode)
+            for column in TIMELINE_COLUMNS
+        }
+        return cls(emotions=meta['emotions'], fps=meta['fps'], **columns)
+
+    @staticmethod
+    def load_tracks(path):
+        """Track columns saved with the timeline, or None"""
+        tracks_file = os.path.join(path, 'tracks.npz')
+        if not os.path.exists(tracks_file):
+            return None
+        with np.load(tracks_file) as data:
+            return {column: data[column] for column in TRACK_COLUMNS}
+
+    @staticmethod
+    def exists(path):
+        return os.path.exists(os.path.join(path, 'meta.json'))
+
+    def seconds(self, frame_index):
+        if self.fps:
+            return frame_index / self.fps
+        return frame_index.astype(np.float64)
+
+    def downsample(self, start=0, end=None, points=100):
+        """Average the frames in [start, end) into at most `points` buckets.
+
+        Only the requested range is read from the memory-mapped columns.
+        Each bucket holds the mean probability over every face detected in
+        its frames; buckets without faces are reported as zeros.
+        """
+        end = len(self) if end is None else max(0, min(end, len(self)))
+        start = max(0, min(start, end))
+        n_frames = end - start
+        if n_frames == 0:
+            return {'timestamps': [], 'face_counts': [], 'values': np.zeros((len(self.emotions), 0))}
+
+        probs = np.asarray(self.probs[start:end], dtype=np.float32)
+        face_count = np.asarray(self.face_count[start:end])
+
+        # Sum of probabilities over the faces actually present in each frame
+        mask = np.arange(probs.shape[1]) < face_count[:, None]
+        frame_sums = (probs * mask[:, :, None]).sum(axis=1)
+
+        points = max(1, min(points, n_frames))
+        edges = np.linspace(0, n_frames, points + 1).astype(np.int64)[:-1]
+        bucket_sums = np.add.reduceat(frame_sums, edges, axis=0)
+        bucket_faces = np.add.reduceat(face_count.astype(np.int64), edges)
+
+        values = bucket_sums / (np.maximum(bucket_faces, 1)[:, None] * PROB_SCALE)
+        timestamps = self.seconds(np.asarray(self.frame_index[start:end])[edges])
+
+        return {
+            'timestamps': timestamps.tolist(),
+            'face_counts': bucket_faces.tolist(),
+            'values': values.T
+        }
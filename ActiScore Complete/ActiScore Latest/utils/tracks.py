@@ -0,0 +1,99 @@
+import numpy as np
+
+TRACK_COLUMNS = ('embeddings', 'probs', 'start_frame', 'end_frame', 'frames', 'start', 'end')
+
+
+def box_iou(a, b):
+    """IoU matrix between (N, 4) and (M, 4) arrays of x, y, width, height boxes"""
+    a = np.asarray(a, dtype=np.float32).reshape(-1, 4)
+    b = np.asarray(b, dtype=np.float32).reshape(-1, 4)
+    x1 = np.maximum(a[:, None, 0], b[None, :, 0])
+    y1 = np.maximum(a[:, None, 1], b[None, :, 1])
+    x2 = np.minimum(a[:, None, 0] + a[:, None, 2], b[None, :, 0] + b[None, :, 2])
+    y2 = np.minimum(a[:, None, 1] + a[:, None, 3], b[None, :, 1] + b[None, :, 3])
+    inter = np.clip(x2 - x1, 0, None) * np.clip(y2 - y1, 0, None)
+    union = (a[:, 2] * a[:, 3])[:, None] + (b[:, 2] * b[:, 3])[None, :] - inter
+    return np.where(union > 0, inter / np.maximum(union, 1e-6), 0.0)
+
+
+class _Track:
+    __slots__ = ('box', 'start', 'last', 'count', 'embedding', 'probs')
+
+    def __init__(self, frame_index, box, probs, embedding):
+        self.box = box
+        self.start = self.last = frame_index
+        self.count = 1
+        self.probs = probs.astype(np.float64)
+        self.embedding = embedding.astype(np.float64)
+
+    def extend(self, frame_index, box, probs, embedding):
+        self.box = box
+        self.last = frame_index
+        self.count += 1
+        self.probs += probs
+        self.embedding += embedding
+
+
+class FaceTracker:
+    """Links per-frame face detections into tracks by box overlap.
+
+    Each detection joins the open track whose last box overlaps it most
+    (IoU above `iou_threshold`), or starts a new one. Tracks not seen for
+    `max_gap` frames are closed. A track is summarized by its mean emotion
+    probabilities and the L2-normalized mean of its face embeddings.
+    """
+
+    def __init__(self, iou_threshold=0.3, max_gap=10, min_frames=3):
+        self.iou_threshold = iou_threshold
+        self.max_gap = max_gap
+        self.min_frames = min_frames
+        self._open = []
+        self._closed = []
+
+    def update(self, frame_index, boxes, probabilities, embeddings):
+        boxes = np.asarray(boxes, dtype=np.float32).reshape(-1, 4)
+
+        # Close tracks that have not been seen for too long
+        still_open = []
+        for track in self._open:
+            (still_open if frame_index - track.last <= self.max_gap else self._closed).append(track)
+        self._open = still_open
+
+        # Greedy matching, best overlap first
+        matched = set()
+        if self._open and len(boxes):
+            iou = box_iou(np.array([t.box for t in self._open]), boxes)
+            while True:
+                t, d = np.unravel_index(np.argmax(iou), iou.shape)
+                if iou[t, d] < self.iou_threshold:
+                    break
+                self._open[t].extend(frame_index, boxes[d], probabilities[d], embeddings[d])
+                matched.add(d)
+                iou[t, :] = -1
+                iou[:, d] = -1
+
+        for d in range(len(boxes)):
+            if d not in matched:
+                self._open.append(_Track(frame_index, boxes[d], probabilities[d], embeddings[d]))
+
+    def finish(self, fps=0.0):
+        """Column arrays of all tracks of at least `min_frames` frames, or None"""
+        tracks = [t for t in self._closed + self._open if t.count >= self.min_frames]
+        if not tracks:
+            return None
+        tracks.sort(key=lambda t: t.start)
+
+        embeddings = np.array([t.embedding / t.count for t in tracks], dtype=np.float32)
+        embeddings /= np.maximum(np.linalg.norm(embeddings, axis=1, keepdims=True), 1e-12)
+        start_frame = np.array([t.start for t in tracks], dtype=np.int32)
+        end_frame = np.array([t.last for t in tracks], dtype=np.int32)
+        return {
+            # float16 halves the size on disk; the index searches in float32
+            'embeddings': embeddings.astype(np.float16),
+            'probs': np.array([t.probs / t.count for t in tracks], dtype=np.float32),
+            'start_frame': start_frame,
+            'end_frame': end_frame,
+            'frames': np.array([t.count for t in tracks], dtype=np.int32),
+            'start': start_frame / fps if fps else start_frame.astype(np.float64),
+            'end': end_frame / fps if fps else end_frame.astype(np.float64)
+        }
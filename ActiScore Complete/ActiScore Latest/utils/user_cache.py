@@ -0,0 +1,116 @@
+import threading
+import time
+from collections import OrderedDict
+
+from flask_login import UserMixin
+from sqlalchemy import event
+
+from database.db import User
+
+
+class CachedUser(UserMixin):
+    """Read-only snapshot of a User row, safe to share between requests.
+
+    It carries the columns request handlers read from current_user, and
+    unlike an ORM instance it is not tied to the session that loaded it.
+    """
+
+    __slots__ = ('id', 'username', 'email', 'created_at')
+
+    def __init__(self, user):
+        self.id = user.id
+        self.username = user.username
+        self.email = user.email
+        self.created_at = user.created_at
+
+    def __repr__(self):
+        return f"CachedUser('{self.username}', '{self.email}')"
+
+
+class UserCache:
+    """Bounded LRU cache of user snapshots for the Flask-Login user loader.
+
+    Entries expire after `ttl` seconds, which bounds how long another
+    worker's profile change stays invisible here; changes made by this
+    process invalidate the entry immediately. Socket.IO connections bind
+    their user once at connect, so their events skip the lookup entirely.
+    """
+
+    def __init__(self, max_size=1024, ttl=60):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # user id -> (snapshot, expires at)
+        self._sockets = {}  # sid -> snapshot
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, user_id):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is not None and entry[1] > now:
+                self._entries.move_to_end(user_id)
+                self.hits += 1
+                return entry[0]
+            self.misses += 1
+
+        user = User.query.get(user_id)
+        snapshot = CachedUser(user) if user is not None else None
+        with self._lock:
+            if snapshot is None:
+                self._entries.pop(user_id, None)
+                return None
+            self._entries[user_id] = (snapshot, now + self.ttl)
+            self._entries.move_to_end(user_id)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+        return snapshot
+
+    def load(self, user_id, sid=None):
+        """User for the session's user id; `sid` binds it to a Socket.IO connection"""
+        if sid is not None:
+            snapshot = self._sockets.get(sid)
+            if snapshot is not None and snapshot.id == user_id:
+                return snapshot
+
+        snapshot = self.get(user_id)
+        if sid is not None and snapshot is not None:
+            with self._lock:
+                self._sockets[sid] = snapshot
+        return snapshot
+
+    def unbind(self, sid):
+        with self._lock:
+            self._sockets.pop(sid, None)
+
+    def invalidate(self, user_id):
+        with self._lock:
+            self._entries.pop(user_id, None)
+            # Bound connections pick up the change on their next event
+            for sid in [sid for sid, snapshot in self._sockets.items() if snapshot.id == user_id]:
+                del self._sockets[sid]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._sockets.clear()
+
+    def stats(self):
+        with self._lock:
+            return {
+                'size': len(self._entries),
+                'max_size': self.max_size,
+                'ttl': self.ttl,
+                'sockets': len(self._sockets),
+                'hits': self.hits,
+                'misses': self.misses
+            }
+
+    def watch(self):
+        """Invalidate entries whenever a User row is updated or deleted"""
+        def invalidate(mapper, connection, user):
+            self.invalidate(user.id)
+        event.listen(User, 'after_update', invalidate)
+        event.listen(User, 'after_delete', invalidate)
+        return self
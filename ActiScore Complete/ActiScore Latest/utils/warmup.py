@@ -0,0 +1,63 @@
+import threading
+import time
+
+from utils.metrics import metrics
+
+metrics.describe('actiscore_warmup_seconds', 'Time to warm up one model at startup')
+
+
+class ModelWarmup:
+    """Runs dummy batches through every model before the worker takes traffic.
+
+    The first predict call of a Keras model traces its graph and sets up
+    kernels, which can take seconds, and it does so again for every new
+    batch size. Warm-up pays that cost at startup for `batch_sizes`.
+    /healthz/ready reports 503 until it has finished.
+    """
+
+    def __init__(self, models, batch_sizes=(1, 2, 4, 8), run=None):
+        self.models = models
+        self.batch_sizes = tuple(batch_sizes)
+        # Wraps each model call, e.g. to keep it off an eventlet hub
+        self.run = run or (lambda fn, *args: fn(*args))
+        self.state = 'pending'
+        self.error = None
+        self.durations = {}
+
+    @property
+    def ready(self):
+        return self.state == 'ready'
+
+    def start(self, mode='background'):
+        """Warm up in a background thread, in the caller ('blocking') or not at all ('off')"""
+        if mode == 'off':
+            self.state = 'ready'
+        elif mode == 'blocking':
+            self.warm_up()
+        elif mode == 'background':
+            threading.Thread(target=self.warm_up, name='model-warmup', daemon=True).start()
+        else:
+            raise ValueError(f"Unknown WARMUP mode '{mode}', expected 'background', 'blocking' or 'off'")
+        return self
+
+    def warm_up(self):
+        self.state = 'warming'
+        try:
+            for name, model in self.models:
+                started = time.perf_counter()
+                self.run(model.warmup, self.batch_sizes)
+                self.durations[name] = time.perf_counter() - started
+                metrics.observe('actiscore_warmup_seconds', self.durations[name], model=name)
+        except Exception as e:
+            self.error = str(e)
+            self.state = 'failed'
+            return
+        self.state = 'ready'
+
+    def status(self):
+        return {
+            'status': self.state,
+            'batch_sizes': list(self.batch_sizes),
+            'durations_ms': {name: round(seconds * 1000, 1) for name, seconds in self.durations.items()},
+            'error': self.error
+        }